@@ -0,0 +1,29 @@
+# backend/core/compression.py
+"""
+GZip for responses above a size threshold. Streamed responses (NDJSON and
+chunked JSON forecasts) are sync-flushed chunk by chunk so compression
+doesn't hold back early points until the stream ends.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+
+
+class _FlushingGZipResponder(GZipResponder):
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if not more_body:
+            return super().apply_compression(body, more_body=more_body)
+        self.gzip_file.write(body)
+        self.gzip_file.flush()
+        body = self.gzip_buffer.getvalue()
+        self.gzip_buffer.seek(0)
+        self.gzip_buffer.truncate()
+        return body
+
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _FlushingGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Point at a local stub (see tests/bench) to run without the real API
+GOOGLE_AQ_BASE_URL = os.getenv("GOOGLE_AQ_BASE_URL", "https://airquality.googleapis.com/v1")
 
 # Firebase Config
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
@@ -17,3 +19,146 @@ FIREBASE_SERVICE_ACCOUNT = os.getenv("FIREBASE_SERVICE_ACCOUNT")
 
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 PROJECT_ID = os.getenv("PROJECT_ID")
+
+# Upstream (Google Air Quality) HTTP client
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.0"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10.0"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_MAX_PER_HOST = int(os.getenv("UPSTREAM_MAX_PER_HOST", "20"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+# Upstream record/replay for offline performance runs: "live", "record"
+# (append Google AQ traffic to per-process logs named after UPSTREAM_CAPTURE_PATH)
+# or "replay" (serve it back)
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live")
+UPSTREAM_CAPTURE_PATH = os.getenv("UPSTREAM_CAPTURE_PATH", "upstream_capture.jsonl.gz")
+# Replayed responses take the recorded latency divided by this; 0 answers at once
+UPSTREAM_REPLAY_SPEED = float(os.getenv("UPSTREAM_REPLAY_SPEED", "1"))
+
+# Logging and request tracing
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+REQUEST_TRACE_ENABLED = os.getenv("REQUEST_TRACE_ENABLED", "false").lower() == "true"
+REQUEST_TRACE_HEADER = os.getenv("REQUEST_TRACE_HEADER", "X-Request-ID")
+
+# Upstream resilience: shared rate limit, daily budgets, retries, circuit breaker
+UPSTREAM_RATE_PER_SECOND = float(os.getenv("UPSTREAM_RATE_PER_SECOND", "50"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "100"))
+# Daily call budgets per endpoint; 0 means unlimited
+UPSTREAM_DAILY_BUDGETS = {
+    "current": int(os.getenv("UPSTREAM_DAILY_BUDGET_CURRENT", "0")),
+    "forecast": int(os.getenv("UPSTREAM_DAILY_BUDGET_FORECAST", "0")),
+}
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "5.0"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "15.0"))
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# How long the last good upstream answer may be served while upstream is down
+UPSTREAM_FALLBACK_TTL = float(os.getenv("UPSTREAM_FALLBACK_TTL", "21600"))
+
+# HTTP response caching and compression
+# Google refreshes current conditions and forecasts on this cadence (seconds);
+# Cache-Control max-age runs to the next refresh
+UPSTREAM_UPDATE_INTERVAL = int(os.getenv("UPSTREAM_UPDATE_INTERVAL", "3600"))
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+
+# Current-conditions cache
+AQI_CACHE_GEOHASH_PRECISION = int(os.getenv("AQI_CACHE_GEOHASH_PRECISION", "6"))
+AQI_CACHE_BUCKET_SECONDS = int(os.getenv("AQI_CACHE_BUCKET_SECONDS", "3600"))
+AQI_CACHE_TTL = float(os.getenv("AQI_CACHE_TTL", "900"))
+AQI_CACHE_MAX_ENTRIES = int(os.getenv("AQI_CACHE_MAX_ENTRIES", "10000"))
+AQI_CACHE_REDIS_URL = os.getenv("AQI_CACHE_REDIS_URL")
+
+# Request coalescing: how long failed upstream lookups are replayed to callers
+SINGLE_FLIGHT_ERROR_TTL = float(os.getenv("SINGLE_FLIGHT_ERROR_TTL", "5"))
+
+# Verified Firebase ID token cache
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "50000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "3600"))
+TOKEN_CERT_REFRESH_INTERVAL = float(os.getenv("TOKEN_CERT_REFRESH_INTERVAL", "3600"))
+# Seconds between revocation checks for a cached token; 0 disables them.
+TOKEN_REVOCATION_CHECK_INTERVAL = float(os.getenv("TOKEN_REVOCATION_CHECK_INTERVAL", "0"))
+
+# Write-behind Firestore writer for AQI history
+HISTORY_WRITER_MAX_QUEUE = int(os.getenv("HISTORY_WRITER_MAX_QUEUE", "10000"))
+HISTORY_WRITER_BATCH_SIZE = int(os.getenv("HISTORY_WRITER_BATCH_SIZE", "500"))
+HISTORY_WRITER_FLUSH_INTERVAL = float(os.getenv("HISTORY_WRITER_FLUSH_INTERVAL", "1.0"))
+# One of: drop_newest, drop_oldest, block (wait up to HISTORY_WRITER_PUT_TIMEOUT, then drop)
+HISTORY_WRITER_DROP_POLICY = os.getenv("HISTORY_WRITER_DROP_POLICY", "block")
+HISTORY_WRITER_PUT_TIMEOUT = float(os.getenv("HISTORY_WRITER_PUT_TIMEOUT", "0.05"))
+HISTORY_WRITER_DRAIN_TIMEOUT = float(os.getenv("HISTORY_WRITER_DRAIN_TIMEOUT", "10"))
+
+# Multi-location batch endpoint
+BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "10"))
+
+# Hourly points requested per forecast:lookup page
+FORECAST_PAGE_SIZE = int(os.getenv("FORECAST_PAGE_SIZE", "24"))
+
+# Online (incremental) per-user forecast model
+ONLINE_MODEL_ALPHA = float(os.getenv("ONLINE_MODEL_ALPHA", "0.5"))
+ONLINE_MODEL_BETA = float(os.getenv("ONLINE_MODEL_BETA", "0.1"))
+ONLINE_MODEL_DAMPING = float(os.getenv("ONLINE_MODEL_DAMPING", "0.9"))
+MODEL_STATE_CACHE_TTL = float(os.getenv("MODEL_STATE_CACHE_TTL", "300"))
+MODEL_STATE_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_STATE_CACHE_MAX_ENTRIES", "50000"))
+
+# Server-push subscriptions (Server-Sent Events)
+SUBSCRIPTION_POLL_INTERVAL = float(os.getenv("SUBSCRIPTION_POLL_INTERVAL", "60"))
+SUBSCRIPTION_HEARTBEAT = float(os.getenv("SUBSCRIPTION_HEARTBEAT", "25"))
+SUBSCRIPTION_MAX_CELLS = int(os.getenv("SUBSCRIPTION_MAX_CELLS", "20"))
+SUBSCRIPTION_MAX_CONNECTIONS = int(os.getenv("SUBSCRIPTION_MAX_CONNECTIONS", "20000"))
+SUBSCRIPTION_CONCURRENCY = int(os.getenv("SUBSCRIPTION_CONCURRENCY", "20"))
+
+# Background ingestion of a city grid
+INGESTION_ENABLED = os.getenv("INGESTION_ENABLED", "false").lower() == "true"
+# min_lat,min_lon,max_lat,max_lon — defaults to greater Pune
+INGESTION_BBOX = os.getenv("INGESTION_BBOX", "18.43,73.73,18.64,74.00")
+INGESTION_PRECISION = int(os.getenv("INGESTION_PRECISION", "5"))
+INGESTION_INTERVAL = float(os.getenv("INGESTION_INTERVAL", "3600"))
+INGESTION_JITTER = float(os.getenv("INGESTION_JITTER", "60"))
+INGESTION_CONCURRENCY = int(os.getenv("INGESTION_CONCURRENCY", "5"))
+INGESTION_RATE_PER_SECOND = float(os.getenv("INGESTION_RATE_PER_SECOND", "5"))
+INGESTION_LEASE_TTL = float(os.getenv("INGESTION_LEASE_TTL", "300"))
+# Snapshots older than this are not served to users
+INGESTION_SNAPSHOT_MAX_AGE = float(os.getenv("INGESTION_SNAPSHOT_MAX_AGE", "5400"))
+# Hours of hourly AQI forecast fetched per cell on each sweep; 0 disables
+INGESTION_FORECAST_HOURS = int(os.getenv("INGESTION_FORECAST_HOURS", "0"))
+
+# Multi-process serving (serve.py): workers read snapshots from a file that
+# one refresher process rewrites; unset means in-process snapshots
+SHARED_SNAPSHOT_PATH = os.getenv("SHARED_SNAPSHOT_PATH")
+SHARED_SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SHARED_SNAPSHOT_CHECK_INTERVAL", "1"))
+
+# Forecast alerts: user rules evaluated per cell against refreshed forecasts
+ALERTS_ENABLED = os.getenv("ALERTS_ENABLED", "false").lower() == "true"
+ALERT_SINK = os.getenv("ALERT_SINK", "log")  # "log" or "memory"
+ALERT_PRECISION = int(os.getenv("ALERT_PRECISION", "5"))
+ALERT_INTERVAL = float(os.getenv("ALERT_INTERVAL", "3600"))
+ALERT_CONCURRENCY = int(os.getenv("ALERT_CONCURRENCY", "5"))
+ALERT_MAX_RULES_PER_USER = int(os.getenv("ALERT_MAX_RULES_PER_USER", "20"))
+# At most ALERT_USER_LIMIT notifications per user in any ALERT_USER_WINDOW seconds
+ALERT_USER_LIMIT = int(os.getenv("ALERT_USER_LIMIT", "3"))
+ALERT_USER_WINDOW = float(os.getenv("ALERT_USER_WINDOW", "21600"))
+
+# Interpolated heatmaps and nearby lookups over ingestion snapshots
+HEATMAP_MAX_CELLS = int(os.getenv("HEATMAP_MAX_CELLS", "10000"))
+HEATMAP_IDW_POWER = float(os.getenv("HEATMAP_IDW_POWER", "2"))
+HEATMAP_NEIGHBOURS = int(os.getenv("HEATMAP_NEIGHBOURS", "8"))
+HEATMAP_MAX_DISTANCE_KM = float(os.getenv("HEATMAP_MAX_DISTANCE_KM", "10"))
+
+# AQI history storage backend: "firestore" or "sqlite"
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "firestore")
+HISTORY_SQLITE_PATH = os.getenv("HISTORY_SQLITE_PATH", "aqi_history.sqlite3")
+# Retention in days per resolution; 0 keeps data forever
+HISTORY_RAW_RETENTION_DAYS = float(os.getenv("HISTORY_RAW_RETENTION_DAYS", "30"))
+HISTORY_HOURLY_RETENTION_DAYS = float(os.getenv("HISTORY_HOURLY_RETENTION_DAYS", "365"))
+HISTORY_DAILY_RETENTION_DAYS = float(os.getenv("HISTORY_DAILY_RETENTION_DAYS", "0"))
+# Firestore keeps raw entries only (no rollups), so deleting them is opt-in.
+# A sweep needs a collection-group index on aqi_history.timestamp.
+HISTORY_FIRESTORE_RETENTION_DAYS = float(os.getenv("HISTORY_FIRESTORE_RETENTION_DAYS", "0"))
+HISTORY_RETENTION_INTERVAL = float(os.getenv("HISTORY_RETENTION_INTERVAL", "3600"))
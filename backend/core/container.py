@@ -0,0 +1,108 @@
+# backend/core/container.py
+"""
+Process-wide dependencies, created once by the API's startup hook.
+
+Importing this module does no I/O: the Firebase app, the Firestore client
+and the services built on it are created by start() and torn down by
+stop(), both called from main's lifespan.
+
+Under serve.py (SHARED_SNAPSHOT_PATH set) a worker doesn't run ingestion:
+it reads the snapshot segment kept up to date by the refresher process.
+"""
+import time
+
+from core.config import (
+    ALERT_PRECISION,
+    ALERTS_ENABLED,
+    HISTORY_BACKEND,
+    INGESTION_ENABLED,
+    INGESTION_FORECAST_HOURS,
+    INGESTION_PRECISION,
+    SHARED_SNAPSHOT_CHECK_INTERVAL,
+    SHARED_SNAPSHOT_PATH,
+)
+from core.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class Container:
+    def __init__(self):
+        self.db = None
+        self.history_repository = None
+        self.history_writer = None
+        self.history_retention = None
+        self.model_states = None
+        self.ingestion = None
+        self.alerts = None
+        self.started = False
+        self.startup_seconds = None
+
+    def build(self):
+        """
+        Creates the Firestore client and the services sharing it. Heavy SDK
+        imports happen here rather than when the app module is imported.
+        """
+        if self.history_repository is not None:
+            return self
+
+        from core.firebase_init import init_firebase
+        from services.alert_engine import AlertEngine
+        from services.history_repository import RetentionTask, create_history_repository
+        from services.history_writer import HistoryWriter
+        from services.ingestion import IngestionScheduler
+        from services.model_state_store import ModelStateStore
+
+        self.db = init_firebase()
+        self.history_repository = create_history_repository(self.db)
+        self.history_writer = HistoryWriter(self.db, repository=self.history_repository)
+        self.history_retention = RetentionTask(self.history_repository)
+        self.model_states = ModelStateStore(self.db, self.history_writer)
+        self.alerts = AlertEngine(self.db)
+        # Alert rules reuse the sweep's forecasts when both use the same cells.
+        share = ALERTS_ENABLED and INGESTION_FORECAST_HOURS > 0 and ALERT_PRECISION == INGESTION_PRECISION
+        self.ingestion = IngestionScheduler(self.db, on_forecast=self.alerts.offer_forecast if share else None)
+        return self
+
+    async def start(self):
+        started = time.perf_counter()
+        self.build()
+        await self.history_writer.start()
+        await self.history_retention.start()
+        if SHARED_SNAPSHOT_PATH:
+            from services.snapshot_segment import SegmentReader
+            from services.snapshot_store import snapshots
+
+            snapshots.attach(SegmentReader(SHARED_SNAPSHOT_PATH, SHARED_SNAPSHOT_CHECK_INTERVAL))
+        elif INGESTION_ENABLED:
+            await self.ingestion.start()
+        if ALERTS_ENABLED:
+            await self.alerts.start()
+        self.started = True
+        self.startup_seconds = round(time.perf_counter() - started, 3)
+        logger.info("Dependencies started", extra={"fields": {"startup_seconds": self.startup_seconds}})
+
+    async def stop(self):
+        self.started = False
+        if self.history_repository is None:
+            return
+        await self.alerts.stop()
+        await self.ingestion.stop()
+        await self.history_retention.stop()
+        await self.history_writer.stop()
+
+    def readiness(self):
+        """
+        Component checks for the readiness probe; `ready` only once startup
+        finished and history storage is reachable.
+        """
+        storage = self.history_repository is not None and (self.db is not None or HISTORY_BACKEND == "sqlite")
+        checks = {
+            "started": self.started,
+            "firestore": self.db is not None,
+            "history_storage": storage,
+        }
+        return {"ready": self.started and storage, "checks": checks, "startup_seconds": self.startup_seconds}
+
+
+container = Container()
@@ -1,18 +1,41 @@
 # backend/core/firebase_init.py
-import firebase_admin
-from firebase_admin import credentials, firestore
-from core.config import FIREBASE_SERVICE_ACCOUNT
 import os
 
-db = None
+from core.config import FIREBASE_SERVICE_ACCOUNT
+from core.log import get_logger
+
+_db = None
+logger = get_logger(__name__)
+
+
+def init_firebase():
+    """
+    Initializes the Admin SDK and creates the process's single Firestore
+    client. Safe to call more than once; returns None when Firestore
+    isn't available.
+    """
+    global _db
+    if _db is not None:
+        return _db
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not firebase_admin._apps:
+        try:
+            cred_path = os.path.join(os.getcwd(), FIREBASE_SERVICE_ACCOUNT)
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+            logger.info("Firebase initialized", extra={"fields": {"project_id": firebase_admin.get_app().project_id}})
+        except Exception as e:
+            logger.warning("Firebase not initialized yet: %s", e)
+
+    try:
+        _db = firestore.client()
+        logger.info("Firestore client ready")
+    except Exception as e:
+        logger.warning("Firestore client unavailable: %s", e)
+    return _db
 
-try:
-    cred_path = os.path.join(os.getcwd(), FIREBASE_SERVICE_ACCOUNT)
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-    print("Firebase initialized with project ID:", firebase_admin.get_app().project_id)
 
-    db = firestore.client()
-    print("Firebase successfully initialized.")
-except Exception as e:
-    print(f"Firebase not initialized yet: {e}")
+def get_db():
+    return _db
@@ -0,0 +1,115 @@
+# backend/core/geo.py
+"""
+Geohash helpers used to snap coordinates onto a shared grid of cells.
+"""
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE_MAP = {c: i for i, c in enumerate(_BASE32)}
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6):
+    """
+    Encodes a coordinate as a geohash of the given length.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    code = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(code) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            code.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(code)
+
+
+def geohash_bbox(code: str):
+    """
+    Returns (min_lat, min_lon, max_lat, max_lon) of a geohash cell.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+
+    for char in code:
+        value = _DECODE_MAP[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+
+def geohash_center(code: str):
+    """
+    Returns the (lat, lon) centre of a geohash cell.
+    """
+    min_lat, min_lon, max_lat, max_lon = geohash_bbox(code)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def is_geohash(code: str):
+    return bool(code) and all(c in _DECODE_MAP for c in code)
+
+
+def geohash_cells_in_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float, precision: int):
+    """
+    All geohash cells of the given precision that overlap the bounding box,
+    in row-major order from the south-west corner.
+    """
+    cell_min_lat, cell_min_lon, cell_max_lat, cell_max_lon = geohash_bbox(geohash_encode(min_lat, min_lon, precision))
+    lat_step = cell_max_lat - cell_min_lat
+    lon_step = cell_max_lon - cell_min_lon
+
+    cells = []
+    seen = set()
+    lat = cell_min_lat + lat_step / 2
+    while lat - lat_step / 2 <= max_lat:
+        lon = cell_min_lon + lon_step / 2
+        while lon - lon_step / 2 <= max_lon:
+            code = geohash_encode(lat, lon, precision)
+            if code not in seen:
+                seen.add(code)
+                cells.append(code)
+            lon += lon_step
+        lat += lat_step
+    return cells
+
+
+def parse_bbox(value: str):
+    """
+    Parses "min_lat,min_lon,max_lat,max_lon" into a tuple of floats.
+    """
+    min_lat, min_lon, max_lat, max_lon = (float(part) for part in value.split(","))
+    return min_lat, min_lon, max_lat, max_lon
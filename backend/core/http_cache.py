@@ -0,0 +1,70 @@
+# backend/core/http_cache.py
+"""
+Conditional GET support: ETags built from what identifies an upstream
+reading (cell and upstream dateTime, or a forecast's content), If-None-Match
+checks and Cache-Control lifetimes that end at Google's next hourly refresh.
+
+ETags are weak: the same tag covers the gzip and identity encodings the
+compression middleware may send, which are equivalent but not byte-equal.
+"""
+import hashlib
+import time
+
+from fastapi.responses import Response
+
+from core.config import UPSTREAM_UPDATE_INTERVAL
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def content_digest(*chunks: bytes):
+    """
+    Short hash of response content, as an ETag part.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _opaque(tag: str):
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def seconds_to_next_update(now: float = None):
+    now = time.time() if now is None else now
+    return max(1, int(UPSTREAM_UPDATE_INTERVAL - now % UPSTREAM_UPDATE_INTERVAL))
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """
+    If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in (_opaque(tag.strip()) for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str = None, max_age: int = None):
+    """
+    Headers for a cacheable response. Responses are per user (token in
+    the query), so shared caches must not store them.
+    """
+    if etag is None:
+        return {"Cache-Control": "no-cache"}
+    max_age = seconds_to_next_update() if max_age is None else max_age
+    return {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+
+
+def not_modified(request, etag: str, max_age: int = None):
+    """
+    Returns a 304 response when the request already holds `etag`, else None.
+    """
+    if etag is None or not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
@@ -0,0 +1,101 @@
+# backend/core/http_client.py
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import (
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_READ_TIMEOUT,
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE,
+    UPSTREAM_MAX_PER_HOST,
+    UPSTREAM_HTTP2,
+)
+from core.upstream_capture import wrap_transport
+
+_client = None
+_host_limits = {}
+
+
+def _http2_available():
+    """
+    httpx only speaks HTTP/2 when the optional `h2` package is installed.
+    """
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _create_client():
+    transport = httpx.AsyncHTTPTransport(
+        http2=UPSTREAM_HTTP2 and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        ),
+    )
+    return httpx.AsyncClient(
+        # Live by default; records or replays Google AQ traffic per UPSTREAM_MODE.
+        transport=wrap_transport(transport),
+        timeout=httpx.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+    )
+
+
+async def start_http_client():
+    """
+    Creates the shared upstream client. Called from the app's startup hook.
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def close_http_client():
+    """
+    Closes pooled connections. Called from the app's shutdown hook.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+def get_http_client():
+    """
+    Returns the shared client, creating it lazily for callers outside the app
+    lifecycle (scripts, tests).
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+def _host_semaphore(url: str):
+    host = urlsplit(url).netloc
+    semaphore = _host_limits.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(UPSTREAM_MAX_PER_HOST)
+        _host_limits[host] = semaphore
+    return semaphore
+
+
+async def request(method: str, url: str, **kwargs):
+    """
+    Sends a request through the shared pool, capping in-flight requests per host.
+    """
+    async with _host_semaphore(url):
+        return await get_http_client().request(method, url, **kwargs)
+
+
+async def post(url: str, **kwargs):
+    return await request("POST", url, **kwargs)
+
+
+async def get(url: str, **kwargs):
+    return await request("GET", url, **kwargs)
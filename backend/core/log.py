@@ -0,0 +1,101 @@
+# backend/core/log.py
+"""
+Leveled, structured logging. Records are handed to a queue on the calling
+thread and formatted/written by a background listener, so request handlers
+never block on stdout.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from core.config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE
+
+trace_id = contextvars.ContextVar("trace_id", default=None)
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg, trace_id and any
+    fields passed as `extra={"fields": {...}}`.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Captures the trace id on the calling task before the record crosses
+    to the listener thread. Drops records instead of blocking when full.
+    """
+
+    def prepare(self, record):
+        record.trace_id = trace_id.get()
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Routes the root logger through a bounded queue to a stdout writer
+    thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers = [_ContextQueueHandler(records)]
+    root.setLevel(level.upper())
+    # httpx logs every request URL at INFO, and Google API keys travel in the query string.
+    for noisy in ("httpx", "httpcore"):
+        logging.getLogger(noisy).setLevel(max(logging.WARNING, root.level))
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str):
+    setup_logging()
+    return logging.getLogger(name)
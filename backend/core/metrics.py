@@ -0,0 +1,76 @@
+# backend/core/metrics.py
+"""
+Stage timers and request metrics, exported in the Prometheus text format
+when `prometheus_client` is installed and silently disabled otherwise.
+"""
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Upstream calls run 50 ms - 5 s; auth and cache work sits well below that.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "whisperingwinds_stage_seconds",
+        "Time spent per processing stage (auth, upstream, parse, firestore_write, ...)",
+        ["stage"],
+        buckets=BUCKETS,
+    )
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        "whisperingwinds_request_seconds",
+        "HTTP request latency by route",
+        ["method", "route", "status"],
+        buckets=BUCKETS,
+    )
+    UPSTREAM_EVENTS = prometheus_client.Counter(
+        "whisperingwinds_upstream_events_total",
+        "Upstream resilience events (retries, rejections, circuit transitions, budget use)",
+        ["upstream", "event"],
+    )
+
+
+def enabled():
+    return prometheus_client is not None
+
+
+def observe(stage: str, seconds: float):
+    if prometheus_client is not None:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def timer(stage: str):
+    """
+    Times the enclosed block into the stage histogram; works in sync and
+    async code alike.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    if prometheus_client is not None:
+        REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+
+
+def count(upstream: str, event: str, amount: int = 1):
+    if prometheus_client is not None:
+        UPSTREAM_EVENTS.labels(upstream, event).inc(amount)
+
+
+def render():
+    """
+    Returns (body, content_type) for the /metrics endpoint, or None when
+    prometheus_client is missing.
+    """
+    if prometheus_client is None:
+        return None
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,290 @@
+# backend/core/resilience.py
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from core import metrics
+from core.config import (
+    UPSTREAM_RATE_PER_SECOND,
+    UPSTREAM_BURST,
+    UPSTREAM_DAILY_BUDGETS,
+    UPSTREAM_RETRIES,
+    UPSTREAM_BACKOFF_BASE,
+    UPSTREAM_BACKOFF_MAX,
+    UPSTREAM_DEADLINE,
+    UPSTREAM_BREAKER_THRESHOLD,
+    UPSTREAM_BREAKER_COOLDOWN,
+)
+from core.log import get_logger
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+logger = get_logger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised instead of calling upstream when the breaker is open, the quota
+    budget is spent or the rate limiter can't admit the call in time.
+    """
+
+    def __init__(self, reason: str, message: str = None):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Admits `rate` calls per second on average with bursts up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, timeout: float = None):
+        """
+        Takes one token, waiting for it if needed. Returns False without
+        taking a token when the wait would exceed `timeout`.
+        """
+        if self.rate <= 0:
+            return True
+        async with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+            # Reserve the token now so callers queue in arrival order.
+            self._tokens -= 1
+        if wait:
+            self.waited += wait
+            await asyncio.sleep(wait)
+        return True
+
+
+class QuotaBudget:
+    """
+    Daily call budget per key (e.g. per upstream endpoint), reset at UTC
+    midnight. A limit of 0 means unlimited.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = dict(limits)
+        self._day = None
+        self._used = {}
+
+    def _roll(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self._day:
+            self._day = today
+            self._used = {}
+
+    def spend(self, key: str):
+        self._roll()
+        limit = self.limits.get(key, 0)
+        used = self._used.get(key, 0)
+        if limit and used >= limit:
+            return False
+        self._used[key] = used + 1
+        return True
+
+    def stats(self):
+        self._roll()
+        return {
+            key: {"used": self._used.get(key, 0), "limit": self.limits.get(key, 0)}
+            for key in sorted(set(self.limits) | set(self._used))
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, rejects calls for
+    `cooldown` seconds, then lets a single probe through (half-open); the
+    probe's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.transitions = {}
+        self._probing = False
+
+    def _move(self, state: str):
+        if state != self.state:
+            key = f"{self.state}->{state}"
+            self.transitions[key] = self.transitions.get(key, 0) + 1
+            logger.warning("Circuit state changed", extra={"fields": {"upstream": self.name, "from": self.state, "to": state}})
+            metrics.count(self.name, f"circuit_{state}")
+            self.state = state
+
+    def allow(self):
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self._move(self.HALF_OPEN)
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self):
+        """
+        Gives back a half-open probe slot that was never used.
+        """
+        self._probing = False
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self._move(self.CLOSED)
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self._move(self.OPEN)
+
+
+class ResilientUpstream:
+    """
+    Wraps calls to one upstream service with a shared token bucket, a daily
+    budget per key, jittered exponential-backoff retries inside an overall
+    deadline, and a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = UPSTREAM_RATE_PER_SECOND,
+        burst: int = UPSTREAM_BURST,
+        budgets: dict = UPSTREAM_DAILY_BUDGETS,
+        retries: int = UPSTREAM_RETRIES,
+        backoff_base: float = UPSTREAM_BACKOFF_BASE,
+        backoff_max: float = UPSTREAM_BACKOFF_MAX,
+        deadline: float = UPSTREAM_DEADLINE,
+        breaker_threshold: int = UPSTREAM_BREAKER_THRESHOLD,
+        breaker_cooldown: float = UPSTREAM_BREAKER_COOLDOWN,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.budget = QuotaBudget(budgets)
+        self.breaker = CircuitBreaker(name, breaker_threshold, breaker_cooldown)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "rejected": {}}
+
+    def _reject(self, reason: str, message: str):
+        self._stats["rejected"][reason] = self._stats["rejected"].get(reason, 0) + 1
+        metrics.count(self.name, f"rejected_{reason}")
+        return UpstreamUnavailable(reason, message)
+
+    def _backoff(self, attempt: int, retry_after: str = None):
+        # Full jitter; a server-supplied Retry-After (in seconds) is a floor.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    async def call(self, key: str, send):
+        """
+        Runs `send()` (a coroutine factory returning an httpx.Response).
+        Retryable statuses (429/5xx) and transport errors are retried; the
+        final response is returned whatever its status, and the last
+        transport error is re-raised. Raises UpstreamUnavailable when the
+        call is refused up front or the deadline runs out.
+        """
+        self._stats["calls"] += 1
+        deadline = time.monotonic() + self.deadline
+
+        if not self.breaker.allow():
+            raise self._reject("circuit_open", f"{self.name} circuit is open")
+        # A half-open probe gets one attempt; retrying it would hammer a sick upstream.
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            return await self._attempts(key, send, deadline, 0 if probe else self.retries)
+        finally:
+            # However the probe ended (including errors not counted as
+            # failures, or cancellation), its slot must not stay taken.
+            if probe:
+                self.breaker.release()
+
+    async def _attempts(self, key: str, send, deadline: float, retries: int):
+        attempt = 0
+        while True:
+            if not self.budget.spend(key):
+                raise self._reject("quota_exhausted", f"Daily {self.name} budget for {key} is spent")
+            if not await self.bucket.acquire(timeout=deadline - time.monotonic()):
+                raise self._reject("rate_limited", f"{self.name} rate limit would exceed the deadline")
+
+            self._stats["attempts"] += 1
+            metrics.count(self.name, f"budget_{key}")
+            response, error = None, None
+            try:
+                with metrics.timer("upstream"):
+                    response = await asyncio.wait_for(send(), timeout=max(0.001, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                error = httpx.TimeoutException(f"{self.name} deadline of {self.deadline}s exceeded")
+            except httpx.TransportError as e:
+                error = e
+
+            if error is None and response.status_code not in RETRYABLE_STATUS:
+                self.breaker.record_success()
+                return response
+
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            delay = self._backoff(attempt, retry_after)
+            if attempt >= retries or time.monotonic() + delay >= deadline:
+                self._stats["failures"] += 1
+                metrics.count(self.name, "failure")
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            self._stats["retries"] += 1
+            metrics.count(self.name, "retry")
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "transitions": dict(self.breaker.transitions),
+            },
+            "budget": self.budget.stats(),
+            "rate_limiter": {
+                "rate": self.bucket.rate,
+                "burst": self.bucket.burst,
+                "waited_seconds": round(self.bucket.waited, 3),
+            },
+            **{key: (dict(value) if isinstance(value, dict) else value) for key, value in self._stats.items()},
+        }
+
+
+google_aq = ResilientUpstream("google_aq")
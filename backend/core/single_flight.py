@@ -0,0 +1,86 @@
+# backend/core/single_flight.py
+import asyncio
+import time
+
+
+def _is_error_result(result):
+    return isinstance(result, dict) and "error" in result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one in-flight task.
+    Failures (raised exceptions or error dicts) are replayed to callers for
+    `error_ttl` seconds so a failing upstream isn't hammered by retries.
+    """
+
+    MAX_FAILURES = 1024
+
+    def __init__(self, error_ttl: float = 0.0, is_error=_is_error_result):
+        self.error_ttl = error_ttl
+        self.is_error = is_error
+        self._inflight = {}
+        self._failures = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.negative_hits = 0
+
+    async def do(self, key, fn):
+        """
+        Runs `fn()` (a coroutine factory) unless a call for `key` is already
+        in flight, in which case its outcome is awaited instead.
+        """
+        failure = self._failures.get(key)
+        if failure is not None:
+            outcome, expires_at = failure
+            if expires_at > time.monotonic():
+                self.negative_hits += 1
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            del self._failures[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+
+        # Shielded so one caller disconnecting doesn't cancel the shared fetch.
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+
+        error = task.exception()
+        if error is not None:
+            outcome = error
+        elif self.is_error(task.result()):
+            outcome = task.result()
+        else:
+            return
+
+        if self.error_ttl > 0:
+            if len(self._failures) >= self.MAX_FAILURES:
+                self._prune()
+            self._failures[key] = (outcome, time.monotonic() + self.error_ttl)
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._failures.items() if expires_at <= now]:
+            del self._failures[key]
+        if len(self._failures) >= self.MAX_FAILURES:
+            self._failures.clear()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "negative_hits": self.negative_hits,
+        }
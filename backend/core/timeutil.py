@@ -0,0 +1,27 @@
+# backend/core/timeutil.py
+from datetime import datetime, timezone
+
+
+def to_epoch(timestamp: str):
+    """
+    RFC 3339 string (as returned by Google, e.g. 2024-05-01T10:00:00Z) to epoch seconds.
+    Naive timestamps, like the ones save_aqi_data writes, are taken as UTC.
+    """
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def to_iso(epoch: float):
+    """
+    Epoch seconds to the naive UTC ISO format used in AQI history records.
+    """
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def to_rfc3339(epoch: float):
+    """
+    Epoch seconds to the RFC 3339 UTC form Google expects, e.g. 2024-05-01T10:00:00Z.
+    """
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,67 @@
+# backend/core/ttl_cache.py
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    In-process LRU cache with a per-entry expiry and a hard size limit.
+    Not thread-safe; callers on the event loop or behind a lock only.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns (value, stored_at) or None when missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, stored_at, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value, stored_at
+
+    def set(self, key, value, ttl: float = None, stored_at: float = None):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        expires_at = now + (self.ttl if ttl is None else ttl)
+
+        self._entries[key] = (value, stored_at, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,275 @@
+# backend/core/upstream_capture.py
+"""
+Record and replay of Google Air Quality traffic, as httpx transports
+under the shared upstream client (see UPSTREAM_MODE).
+
+record  passes requests through and appends each request/response pair
+        with its latency to a per-process log next to UPSTREAM_CAPTURE_PATH
+        (upstream_capture.<pid>.jsonl.gz): gzip'd JSON lines, with the API
+        key stripped from URLs and redacted from bodies. Lines are written
+        by a background thread, off the event loop.
+replay  answers from such logs without touching the network, after the
+        recorded latency divided by UPSTREAM_REPLAY_SPEED. Given the base
+        path, every process's log is read, merged by time.
+
+Replayed requests match a recording with the same endpoint and body
+first; failing that, one for the same location and page token (e.g. a
+forecast window shifted by a day). Repeated matches cycle through the
+recordings in order. Requests to other hosts use the live transport.
+"""
+import asyncio
+import glob
+import gzip
+import heapq
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from core.config import (
+    GOOGLE_API_KEY,
+    GOOGLE_AQ_BASE_URL,
+    UPSTREAM_CAPTURE_PATH,
+    UPSTREAM_MODE,
+    UPSTREAM_REPLAY_SPEED,
+)
+from core.log import get_logger
+
+SECRET_PARAMS = ("key",)
+REDACTED = "REDACTED"
+
+logger = get_logger(__name__)
+
+_active = None
+
+
+def scrub_url(url: str):
+    """
+    The URL without credential query parameters.
+    """
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _redact(text: str):
+    if GOOGLE_API_KEY:
+        return text.replace(GOOGLE_API_KEY, REDACTED)
+    return text
+
+
+def _is_upstream(request: httpx.Request):
+    return str(request.url).startswith(GOOGLE_AQ_BASE_URL)
+
+
+def match_keys(method: str, url: str, body: str):
+    """
+    (exact, loose) replay keys of a request: endpoint plus the canonical
+    JSON body, and endpoint plus location and page token.
+    """
+    path = urlsplit(url).path.rsplit("/", 1)[-1]
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = body
+    exact = (method, path, json.dumps(payload, sort_keys=True))
+    if not isinstance(payload, dict):
+        return exact, exact
+    loose = (method, path, json.dumps(payload.get("location"), sort_keys=True), payload.get("pageToken"))
+    return exact, loose
+
+
+def _split_suffix(path: str):
+    for suffix in (".jsonl.gz", ".gz"):
+        if path.endswith(suffix):
+            return path[:-len(suffix)], suffix
+    return path, ""
+
+
+def process_capture_path(path: str, pid: int = None):
+    """
+    The log one process records to, so workers never share a file.
+    """
+    stem, suffix = _split_suffix(path)
+    return f"{stem}.{os.getpid() if pid is None else pid}{suffix}"
+
+
+def capture_files(path: str):
+    """
+    The logs behind `path`: the file itself if it exists, else the
+    per-process logs recorded under it.
+    """
+    if os.path.exists(path):
+        return [path]
+    stem, suffix = _split_suffix(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.[0-9]*{suffix}"))
+
+
+def _read_log(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_capture(path: str):
+    """
+    Yields the records behind `path` (see capture_files), oldest first.
+    Raises FileNotFoundError when there are none.
+    """
+    files = capture_files(path)
+    if not files:
+        raise FileNotFoundError(f"No upstream capture at {path}")
+    yield from heapq.merge(*(_read_log(f) for f in files), key=lambda record: record["at"])
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Forwards to `inner` and logs every upstream exchange.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: str):
+        self.inner = inner
+        self.path = path
+        self.recorded = 0
+        # Appending starts a new gzip member; readers see one continuous log.
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        # One thread keeps lines in order and compression off the event loop.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upstream-capture")
+
+    async def handle_async_request(self, request: httpx.Request):
+        if not _is_upstream(request):
+            return await self.inner.handle_async_request(request)
+
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        elapsed = time.perf_counter() - started
+
+        record = {
+            "at": round(time.time(), 3),
+            "elapsed": round(elapsed, 4),
+            "method": request.method,
+            "url": scrub_url(str(request.url)),
+            "request": _redact(request.content.decode("utf-8", errors="replace")),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "response": _redact(content.decode("utf-8", errors="replace")),
+        }
+        self._writer.submit(self._file.write, json.dumps(record, separators=(",", ":")) + "\n")
+        self.recorded += 1
+
+        # The body was already decoded, so drop the encoding headers.
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request, extensions=response.extensions)
+
+    def stats(self):
+        return {"mode": "record", "path": self.path, "recorded": self.recorded}
+
+    async def aclose(self):
+        # Waits for queued lines before closing the file.
+        await asyncio.to_thread(self._writer.shutdown)
+        self._file.close()
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves upstream requests from a capture log.
+    """
+
+    def __init__(self, records, inner: httpx.AsyncBaseTransport = None, speed: float = 1.0, path: str = None):
+        self.inner = inner
+        self.speed = speed
+        self.path = path
+        self.records = 0
+        self.hits = 0
+        self.loose_hits = 0
+        self.misses = 0
+        self._exact = {}
+        self._loose = {}
+        for record in records:
+            exact, loose = match_keys(record["method"], record["url"], record["request"])
+            self._exact.setdefault(exact, deque()).append(record)
+            self._loose.setdefault(loose, deque()).append(record)
+            self.records += 1
+
+    @staticmethod
+    def _next(index: dict, key):
+        recordings = index.get(key)
+        if not recordings:
+            return None
+        record = recordings[0]
+        recordings.rotate(-1)
+        return record
+
+    async def handle_async_request(self, request: httpx.Request):
+        if not _is_upstream(request):
+            if self.inner is None:
+                raise httpx.ConnectError("Replay mode has no live transport", request=request)
+            return await self.inner.handle_async_request(request)
+
+        exact, loose = match_keys(request.method, str(request.url), request.content.decode("utf-8", errors="replace"))
+        record = self._next(self._exact, exact)
+        if record is not None:
+            self.hits += 1
+        else:
+            record = self._next(self._loose, loose)
+            if record is not None:
+                self.loose_hits += 1
+        if record is None:
+            self.misses += 1
+            logger.debug("No recorded upstream response", extra={"fields": {"url": scrub_url(str(request.url))}})
+            body = {"error": {"code": 404, "message": "No recorded response for this request", "status": "NOT_FOUND"}}
+            return httpx.Response(404, json=body, request=request)
+
+        if self.speed > 0:
+            await asyncio.sleep(record["elapsed"] / self.speed)
+        headers = {"content-type": record["content_type"]} if record.get("content_type") else None
+        return httpx.Response(record["status"], headers=headers, content=record["response"].encode("utf-8"), request=request)
+
+    def stats(self):
+        return {
+            "mode": "replay",
+            "path": self.path,
+            "speed": self.speed,
+            "records": self.records,
+            "hits": self.hits,
+            "loose_hits": self.loose_hits,
+            "misses": self.misses,
+        }
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+def wrap_transport(inner: httpx.AsyncBaseTransport, mode: str = UPSTREAM_MODE, path: str = UPSTREAM_CAPTURE_PATH,
+                   speed: float = UPSTREAM_REPLAY_SPEED):
+    """
+    The transport for the shared upstream client in the given mode.
+    Raises ValueError for an unknown mode.
+    """
+    global _active
+    if mode == "live":
+        _active = None
+        return inner
+    if mode == "record":
+        _active = RecordingTransport(inner, process_capture_path(path))
+    elif mode == "replay":
+        _active = ReplayTransport(read_capture(path), inner, speed, path)
+    else:
+        raise ValueError(f"Unknown UPSTREAM_MODE {mode!r}, expected 'live', 'record' or 'replay'")
+    logger.info("Upstream capture enabled", extra={"fields": _active.stats()})
+    return _active
+
+
+def capture_stats():
+    return {"mode": "live"} if _active is None else _active.stats()
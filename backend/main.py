@@ -1,17 +1,94 @@
 # Run with: python -m uvicorn main:app --reload
 
-from fastapi import FastAPI, Query, HTTPException
-from services.aqi_fetcher import get_current_aqi
-from services.firestore_service import get_user_aqi_history
-from services.auth_service import verify_token
-from models.forecast_model import simple_aqi_forecast
-from firebase_admin import firestore
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from core import metrics
+from core.compression import StreamingGZipMiddleware
+from core.container import container
+from core.http_cache import cache_headers, content_digest, make_etag, not_modified
+from core.http_client import start_http_client, close_http_client
+from core.log import get_logger, trace_id
+from core.resilience import google_aq
+from core.upstream_capture import capture_stats
+from services.aqi_cache import get_current_aqi_cached, start_cache, close_cache, cache_stats
+from services.firestore_service import get_user_aqi_history, page_user_aqi_history
+from services.auth_service import verify_token, start_token_verifier, stop_token_verifier
+from models.online_model import forecast_state
+from models.aqi_model import AlertRuleRequest, BatchRequest, CurrentAQIResponse, ForecastResponse, SafeWindowRequest
+from core.config import (
+    ALERTS_ENABLED,
+    BATCH_MAX_POINTS,
+    GZIP_COMPRESS_LEVEL,
+    GZIP_MINIMUM_SIZE,
+    INGESTION_ENABLED,
+    REQUEST_TRACE_ENABLED,
+    REQUEST_TRACE_HEADER,
+)
+from core.geo import parse_bbox
 from datetime import datetime
 
-from services.aqi_forecast_fetcher import fetch_aqi_forecast
+from services.aqi_forecast_fetcher import fetch_aqi_forecast, fetch_aqi_forecast_series
+from services.batch_service import fetch_batch
+from services.subscription_hub import hub, event_stream, parse_subscription_cells, SSE_MEDIA_TYPE
+from services.forecast_stream import (
+    stream_forecast_ndjson,
+    stream_forecast_json,
+    NDJSON_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_http_client()
+    await start_cache()
+    await start_token_verifier()
+    await container.start()
+    await hub.start()
+    yield
+    await hub.stop()
+    await container.stop()
+    await stop_token_verifier()
+    await close_cache()
+    await close_http_client()
+
+
+logger = get_logger(__name__)
+app = FastAPI(title="WhisperingWinds API", lifespan=lifespan)
+app.add_middleware(StreamingGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
 
-app = FastAPI(title="WhisperingWinds API")
-db = firestore.client()
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Times every request into the per-route histogram. With request tracing
+    enabled, the incoming trace header (or a fresh id) tags the request's
+    logs and is echoed on the response.
+    """
+    token = None
+    if REQUEST_TRACE_ENABLED:
+        token = trace_id.set((request.headers.get(REQUEST_TRACE_HEADER) or uuid.uuid4().hex)[:128])
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if token is not None:
+            response.headers[REQUEST_TRACE_HEADER] = trace_id.get()
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe_request(request.method, getattr(route, "path", "unmatched"), status, time.perf_counter() - start)
+        if token is not None:
+            trace_id.reset(token)
 
 
 @app.get("/")
@@ -19,6 +96,16 @@ def root():
     return {"message": "🌿 WhisperingWinds API is running!"}
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 503 until startup has created the shared clients and
+    history storage is available.
+    """
+    status = container.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 @app.post("/auth/verify")
 def verify_user_token(token: str = Query(...)):
     uid = verify_token(token)
@@ -27,59 +114,431 @@ def verify_user_token(token: str = Query(...)):
     return {"uid": uid, "message": "Token verified successfully"}
 
 
-@app.get("/aqi/current")
-def current_aqi(lat: float, lon: float, token: str):
+@app.get("/aqi/current", response_model=CurrentAQIResponse)
+async def current_aqi(lat: float, lon: float, token: str, request: Request, response: Response):
     """
     Fetches the current AQI for given coordinates and saves it to Firestore.
+    The ETag follows the cell's upstream reading, so polling clients get a
+    304 until Google publishes the next hour.
     """
-    uid = verify_token(token)
+    uid = await run_in_threadpool(verify_token, token)
     if not uid:
         raise HTTPException(status_code=401, detail="Invalid Firebase token")
 
-    print(f"✅ Token verified for UID: {uid}")
+    logger.debug("Token verified", extra={"fields": {"uid": uid}})
 
     # ✅ FIXED: use correct AQI fetcher
-    data = get_current_aqi(lat, lon)
+    data = await get_current_aqi_cached(lat, lon)
 
     if not data or "aqi" not in data:
         raise HTTPException(status_code=404, detail="No AQI data found")
 
-    save_aqi_data(uid, data)
+    # A stale fallback reading was already recorded when it was fresh.
+    if not data.get("stale"):
+        await save_aqi_data(uid, data)
+
+    etag = None if data.get("stale") else make_etag("current", data.get("cell"), data.get("timestamp"), data.get("location"))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(cache_headers(etag))
     return data
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Stage and request latency histograms plus upstream event counters in
+    the Prometheus text format.
+    """
+    rendered = metrics.render()
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="prometheus_client is not installed")
+    body, content_type = rendered
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/aqi/cache/stats")
+def get_cache_stats():
+    """
+    Hit/miss counters for the current-conditions cache.
+    """
+    return cache_stats()
+
+
+@app.get("/aqi/history/writer/stats")
+def get_history_writer_stats():
+    """
+    Queue depth and throughput of the write-behind history writer.
+    """
+    return container.history_writer.stats()
+
+
+@app.get("/subscriptions/stats")
+def get_subscription_stats():
+    """
+    Open push connections, watched cells and how many frames were fanned out.
+    """
+    return hub.stats()
+
+
+@app.get("/alerts/stats")
+def get_alert_stats():
+    """
+    Alert sweep status: rules and cells watched, rules fired, notifications
+    sent, deduplicated and rate limited.
+    """
+    return {"enabled": ALERTS_ENABLED, **container.alerts.stats()}
+
+
+@app.get("/upstream/stats")
+def get_upstream_stats():
+    """
+    Google Air Quality call health: circuit state and transitions, daily
+    budget use, rate limiter waits, retries and rejected calls, plus the
+    record/replay counters when UPSTREAM_MODE isn't live.
+    """
+    return {**google_aq.stats(), "capture": capture_stats()}
+
+
+@app.get("/ingestion/stats")
+def get_ingestion_stats():
+    """
+    Grid sweep status: leadership, sweep timings and cell success counts.
+    """
+    return {"enabled": INGESTION_ENABLED, **container.ingestion.stats()}
+
+
+@app.get("/aqi/subscribe")
+async def subscribe_aqi(
+    token: str = Query(...),
+    cells: Optional[str] = Query(None, description="Comma-separated geohash cells"),
+    points: Optional[str] = Query(None, description="lat,lon pairs separated by ';'")
+):
+    """
+    Server-Sent Events stream of current conditions for the given cells.
+    The token is verified once per connection; an `aqi` event is pushed
+    whenever a cell's upstream reading changes, with keep-alive comments
+    in between. Each delivered reading is recorded like /aqi/current.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    try:
+        wanted = parse_subscription_cells(cells, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = hub.admit(uid, wanted)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open subscriptions, retry later")
+
+    async def record(uid: str, data: dict):
+        if not data.get("stale"):
+            await save_aqi_data(uid, data)
+
+    return StreamingResponse(
+        event_stream(subscription, on_update=record),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Frees the slot if the stream never started (client gone before the body).
+        background=BackgroundTask(hub.unsubscribe, subscription),
+    )
+
+
 @app.get("/aqi/history")
-def get_aqi_history_route(token: str = Query(...), limit: int = Query(10)):
+def get_aqi_history_route(
+    token: str = Query(...),
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+    start: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    end: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. aqi,timestamp"),
+    aggregate: Optional[str] = Query(None, pattern="^(hourly|daily)$")
+):
     """
-    Retrieve last N AQI records for the authenticated user.
+    Retrieve AQI records for the authenticated user, newest first.
+    Pass `next_cursor` back as `cursor` for the next page. With `aggregate`,
+    records are hourly/daily buckets (count, mean, min, max) instead.
     """
     uid = verify_token(token)
     if not uid:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    history = get_user_aqi_history(uid, limit)
-    return {"user_id": uid, "records": history}
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        page = page_user_aqi_history(uid, start, end, cursor, limit, field_list, aggregate or "raw")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    response = {"user_id": uid, "records": page["records"], "next_cursor": page["next_cursor"]}
+    if aggregate:
+        response["resolution"] = aggregate
+    return response
 
-@app.get("/aqi/forecast")
+
+@app.get("/aqi/predict")
+async def predict_aqi(
+    token: str = Query(...),
+    hours_ahead: int = Query(6, ge=1, le=72),
+    history_limit: int = Query(168, ge=2, le=1000)
+):
+    """
+    Forecasts the next hours for the user. Reads the user's online model
+    state (one small document); falls back to refitting from Firestore
+    history for users who have no state yet.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    # NumPy-backed route helpers are imported on first use so importing the
+    # app stays cheap; tests/test_import_time.py holds that line.
+    from models.forecast_model import simple_aqi_forecast
+
+    try:
+        state = await container.model_states.get(uid)
+    except Exception as e:
+        logger.warning("Could not load model state: %s", e, extra={"fields": {"uid": uid}})
+        state = None
+    result = forecast_state(state, hours_ahead)
+    if "error" not in result:
+        return {"user_id": uid, "source": "online_state", "observations": state["n"], **result}
+
+    history = await run_in_threadpool(get_user_aqi_history, uid, history_limit)
+    result = simple_aqi_forecast(history, hours_ahead)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return {"user_id": uid, "source": "history", "observations": len(history), **result}
+
+
+@app.get("/aqi/forecast", response_model=ForecastResponse)
 async def get_forecast(
     lat: float,
     lon: float,
     start_time: str,
     end_time: str,
-    token: str
+    token: str,
+    request: Request,
+    response: Response,
+    stream: bool = False,
+    format: Optional[str] = Query(None, pattern="^(ndjson|json|columnar)$")
 ):
-    uid = verify_token(token)
+    """
+    Forecast series for a point. With stream=true the series is sent as it is
+    paged in from upstream, either as NDJSON or as a chunked JSON document.
+    format=columnar returns parallel arrays with a shared pollutant header.
+    Non-streamed answers carry an ETag computed from the forecast itself; a
+    matching If-None-Match is answered with 304 and no body.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if stream:
+        if format == "columnar":
+            raise HTTPException(status_code=400, detail="The columnar format can't be streamed")
+        if format == "json":
+            return StreamingResponse(stream_forecast_json(lat, lon, start_time, end_time), media_type=JSON_MEDIA_TYPE)
+        return StreamingResponse(stream_forecast_ndjson(lat, lon, start_time, end_time), media_type=NDJSON_MEDIA_TYPE)
+
+    if format == "columnar":
+        result = await fetch_aqi_forecast_series(lat, lon, start_time, end_time)
+        if "error" in result:
+            return result
+        series = result["series"]
+        etag = None
+        if result["count"] and not result.get("stale"):
+            etag = forecast_etag(lat, lon, start_time, end_time, "columnar", series.timestamps[0], series.timestamps[-1],
+                                 content_digest(series.aqi.tobytes(), series.pollutants.tobytes(), "|".join(series.codes).encode()))
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        if etag is not None:
+            response.headers.update(cache_headers(etag))
+        return {
+            "status": "ok" if result["count"] else "empty",
+            "format": "columnar",
+            "lat": lat,
+            "lon": lon,
+            "start_time": start_time,
+            "end_time": end_time,
+            "count": result["count"],
+            "regionCode": result["regionCode"],
+            "series": series.to_columnar(),
+        }
+
+    result = await fetch_aqi_forecast(lat, lon, start_time, end_time)
+    if result.get("status") == "ok" and not result.get("stale"):
+        points = result["forecast_series"]
+        etag = forecast_etag(lat, lon, start_time, end_time, "json", points[0]["timestamp"], points[-1]["timestamp"],
+                             content_digest(json.dumps(points, separators=(",", ":")).encode()))
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        response.headers.update(cache_headers(etag))
+    return result
+
+
+def forecast_etag(lat, lon, start_time, end_time, format, first, last, digest):
+    """
+    Identifies a forecast answer by its window, format, the upstream hours it
+    covers and a hash of its content, so it changes exactly when upstream
+    publishes a new forecast.
+    """
+    return make_etag("forecast", lat, lon, start_time, end_time, format, first, last, digest)
+
+
+@app.post("/aqi/batch")
+async def batch_aqi(request: BatchRequest, token: str = Query(...)):
+    """
+    Current conditions or forecast windows for many points in one call.
+    The token is verified once; results come back in input order.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if not request.points:
+        raise HTTPException(status_code=400, detail="No points supplied")
+    if len(request.points) > BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POINTS} points per batch")
+    for point in request.points:
+        if bool(point.start_time) != bool(point.end_time):
+            raise HTTPException(status_code=400, detail="start_time and end_time must be given together")
+
+    results = await fetch_batch(request.points)
+    return {"count": len(results), "results": results}
+
+
+@app.post("/aqi/safe-windows")
+async def safe_windows(request: SafeWindowRequest, token: str = Query(...)):
+    """
+    Ranks the best contiguous activity windows across the forecasts of
+    several locations, e.g. the cleanest 45-minute slot among nearby parks.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if not request.locations:
+        raise HTTPException(status_code=400, detail="No locations supplied")
+    if len(request.locations) > BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POINTS} locations per request")
+
+    from services.safe_window_service import find_safe_windows
+
+    try:
+        return await find_safe_windows(
+            request.locations,
+            request.start_time,
+            request.end_time,
+            request.duration_minutes,
+            request.profile,
+            request.min_aqi,
+            request.max_pollutants,
+            request.top_k,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/aqi/heatmap")
+async def get_heatmap(
+    bbox: str = Query(..., description="min_lat,min_lon,max_lat,max_lon"),
+    resolution: float = Query(0.5, gt=0, description="Grid spacing in km"),
+    hours_ahead: int = Query(0, ge=0, le=96, description="Hours from now; 0 is current conditions"),
+    token: str = Query(...)
+):
+    """
+    Interpolated AQI raster over a bounding box, served from the latest
+    ingestion snapshots (or their cached forecasts) without calling Google.
+    """
+    uid = await run_in_threadpool(verify_token, token)
     if not uid:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    result = fetch_aqi_forecast(lat, lon, start_time, end_time)
+    try:
+        box = parse_bbox(bbox)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lat,min_lon,max_lat,max_lon")
+
+    from services.heatmap_service import heatmap
+
+    result = heatmap(*box, resolution, hours_ahead)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    if not result["samples"]:
+        raise HTTPException(status_code=404, detail="No snapshot data for this area")
     return result
 
 
-def save_aqi_data(uid: str, data: dict):
+@app.get("/aqi/nearby")
+async def get_nearby(
+    lat: float,
+    lon: float,
+    token: str,
+    k: int = Query(5, ge=1, le=50),
+    max_km: Optional[float] = Query(None, gt=0)
+):
+    """
+    Nearest sampled cells to a point with their latest conditions,
+    closest first.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    from services.heatmap_service import nearby
+
+    return {"lat": lat, "lon": lon, "results": nearby(lat, lon, k, max_km)}
+
+
+@app.post("/alerts/rules")
+async def create_alert_rule(rule: AlertRuleRequest, token: str = Query(...)):
     """
-    Save AQI data to Firestore under user's history.
+    Adds a forecast alert for a location: notify when the Universal AQI is
+    forecast to drop below `threshold` (or a pollutant to rise above it)
+    within `lead_hours`.
+    """
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    try:
+        return await container.alerts.add_rule(
+            uid, rule.lat, rule.lon, rule.threshold, rule.pollutant, rule.lead_hours, rule.name,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/alerts/rules")
+async def list_alert_rules(token: str = Query(...)):
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    rules = await container.alerts.list_rules(uid)
+    return {"user_id": uid, "count": len(rules), "rules": rules}
+
+
+@app.delete("/alerts/rules/{rule_id}")
+async def delete_alert_rule(rule_id: str, token: str = Query(...)):
+    uid = await run_in_threadpool(verify_token, token)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if not await container.alerts.remove_rule(uid, rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return {"deleted": rule_id}
+
+
+async def save_aqi_data(uid: str, data: dict):
+    """
+    Queue AQI data for the user's Firestore history and fold it into the
+    user's online model state. The writes happen in the background so the
+    response doesn't wait on Firestore.
     """
     try:
         entry = {
@@ -92,12 +551,15 @@ def save_aqi_data(uid: str, data: dict):
         }
 
         if entry["aqi"] in [None, "N/A"]:
-            print("⚠️ No AQI value found, skipping save.")
+            logger.info("No AQI value found, skipping save")
+            return
+
+        if not await container.history_writer.put(uid, entry):
+            logger.warning("History queue full, dropped AQI entry", extra={"fields": {"uid": uid}})
             return
 
-        db.collection("users").document(uid).collection("aqi_history").add(entry)
-        print(f"✅ AQI data saved for user {uid}: {entry}")
+        await container.model_states.record(uid, entry)
 
     except Exception as e:
-        print(f"🔥 Error saving AQI data for {uid}: {e}")
+        logger.error("Error saving AQI data: %s", e, extra={"fields": {"uid": uid}})
 
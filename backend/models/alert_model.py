@@ -0,0 +1,47 @@
+import numpy as np
+
+# Metric name for Universal AQI rules; pollutant rules use the upstream code.
+AQI_METRIC = "uaqi"
+
+
+def metric_table(series):
+    """
+    Stacks a ForecastSeries into a (1 + P, T) float64 table: row 0 is the
+    Universal AQI, then one row per pollutant. Returns (table, row index by
+    metric name). The extra last row is all-NaN, for rules whose pollutant
+    the forecast doesn't report.
+    """
+    table = np.full((len(series.codes) + 2, len(series)), np.nan)
+    table[0] = series.aqi
+    if series.codes:
+        table[1:-1] = series.pollutants.T
+    rows = {AQI_METRIC: 0, **{code: i + 1 for i, code in enumerate(series.codes)}}
+    return table, rows
+
+
+def first_breaches(times, table, metric_rows, thresholds, below, horizons, now: float):
+    """
+    Evaluates every rule of a cell in one pass.
+
+    times        (T,) epoch seconds of the forecast hours
+    table        (M, T) metric values (see metric_table)
+    metric_rows  (R,) row of `table` each rule watches
+    thresholds   (R,) rule thresholds
+    below        (R,) True where the rule fires when the value drops below
+                 the threshold (Universal AQI), False when it rises above
+    horizons     (R,) latest epoch second each rule looks ahead to
+
+    Returns (fired, first): fired (R,) bool and, for fired rules, the
+    column of the first breaching hour.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = table[np.asarray(metric_rows, dtype=np.intp)]
+    thresholds = np.asarray(thresholds, dtype=np.float64)[:, None]
+
+    with np.errstate(invalid="ignore"):
+        breach = np.where(np.asarray(below)[:, None], values < thresholds, values > thresholds)
+    # NaN compares False either way, so missing values never fire.
+    breach &= (times[None, :] >= now) & (times[None, :] <= np.asarray(horizons, dtype=np.float64)[:, None])
+
+    fired = breach.any(axis=1)
+    return fired, breach.argmax(axis=1)
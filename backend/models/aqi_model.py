@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+from typing_extensions import TypedDict
+
+
+class BatchPoint(BaseModel):
+    """
+    One location in a batch request. Supplying both start_time and end_time
+    (RFC 3339) asks for a forecast window instead of current conditions.
+    """
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    points: List[BatchPoint]
+
+
+class SafeWindowLocation(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    name: Optional[str] = None
+
+
+class SafeWindowRequest(BaseModel):
+    """
+    Search for the cleanest contiguous slots of `duration_minutes` across
+    several locations' forecasts. `profile` supplies default thresholds;
+    `min_aqi` (Universal AQI floor, higher is cleaner) and `max_pollutants`
+    (concentration ceilings by pollutant code) override it.
+    """
+    locations: List[SafeWindowLocation]
+    start_time: str
+    end_time: str
+    duration_minutes: float = Field(..., gt=0, le=24 * 60)
+    profile: str = "general"
+    min_aqi: Optional[float] = Field(None, ge=0, le=100)
+    max_pollutants: Optional[Dict[str, float]] = None
+    top_k: int = Field(5, ge=1, le=50)
+
+
+class AlertRuleRequest(BaseModel):
+    """
+    Notify when the forecast for (lat, lon) crosses `threshold` within the
+    next `lead_hours`. Without `pollutant` the rule watches the Universal
+    AQI and fires when it falls below the threshold (higher is cleaner);
+    with a pollutant code (e.g. "pm25") it fires when the concentration
+    rises above it.
+    """
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    threshold: float = Field(..., ge=0)
+    pollutant: Optional[str] = Field(None, pattern="^[a-z0-9]+$")
+    lead_hours: int = Field(6, ge=1, le=96)
+    name: Optional[str] = Field(None, max_length=100)
+
+
+# Response models. TypedDicts with optional keys: FastAPI validates and
+# serializes the services' dicts through pydantic-core (instead of the
+# generic jsonable_encoder) and the JSON keeps exactly the keys returned.
+
+class PollutantReading(TypedDict, total=False):
+    value: Optional[float]
+    units: Optional[str]
+
+
+class CurrentAQIResponse(TypedDict, total=False):
+    location: str
+    aqi: Union[int, str, None]
+    category: Optional[str]
+    dominant_pollutant: Optional[str]
+    pollutants: Dict[str, PollutantReading]
+    timestamp: Optional[str]
+    regionCode: Optional[str]
+    cell: str
+    cache_age: float
+    stale: bool
+    upstream_error: str
+
+
+class ForecastPollutant(TypedDict, total=False):
+    code: Optional[str]
+    displayName: Optional[str]
+    value: Optional[float]
+    units: Optional[str]
+
+
+class ForecastPoint(TypedDict, total=False):
+    timestamp: Optional[str]
+    aqi: Optional[int]
+    category: Optional[str]
+    dominant_pollutant: Optional[str]
+    pollutants: List[ForecastPollutant]
+
+
+class ColumnarPollutants(TypedDict):
+    codes: List[str]
+    display_names: List[Optional[str]]
+    units: List[Optional[str]]
+    values: List[List[Optional[float]]]
+
+
+class ColumnarSeries(TypedDict):
+    timestamps: List[int]
+    aqi: List[Optional[float]]
+    category: List[Optional[str]]
+    dominant_pollutant: List[Optional[str]]
+    pollutants: ColumnarPollutants
+
+
+class ForecastResponse(TypedDict, total=False):
+    """
+    /aqi/forecast body: `forecast_series` points, or `series` columns with
+    format=columnar. Upstream failures come back with `error` (and
+    `details`/`reason`) set instead.
+    """
+    status: str
+    format: str
+    lat: float
+    lon: float
+    start_time: str
+    end_time: str
+    count: int
+    regionCode: Optional[str]
+    forecast_series: List[ForecastPoint]
+    series: ColumnarSeries
+    message: str
+    raw: Optional[Dict[str, Any]]
+    stale: bool
+    stale_age: float
+    upstream_error: str
+    error: str
+    details: str
+    reason: str
@@ -1,34 +1,162 @@
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+
+from core.timeutil import to_epoch
+
+HOUR = 3600.0
+
+
+def _design(hours_rel, hours_abs, season_hours: float, harmonics: int):
+    """
+    Feature tensor (..., 2 + 2*harmonics): intercept, linear trend (hours
+    relative to each series' anchor) and daily-seasonal sin/cos terms on
+    absolute time so every series shares the same phase.
+    """
+    features = [np.ones_like(hours_rel), hours_rel]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * hours_abs / season_hours
+        features.append(np.sin(angle))
+        features.append(np.cos(angle))
+    return np.stack(features, axis=-1)
+
+
+def batch_forecast(
+    times,
+    values,
+    hours_ahead: int = 6,
+    step_hours: float = 1.0,
+    start=None,
+    season_hours: float = 24.0,
+    harmonics: int = 2,
+    ridge: float = 1e-2,
+):
+    """
+    Fits trend + seasonal models for every series in one vectorized pass.
+
+    times   (S, T) epoch seconds; rows may be ragged, padded with NaN
+    values  (S, T) AQI readings, NaN where missing
+    start   optional (S,) or scalar epoch seconds the horizon begins after;
+            defaults to each series' latest reading
+
+    Returns a dict of arrays: timestamps (S, H) int64, predicted (S, H)
+    float64 (NaN for series with no readings) and observations (S,).
+    Seasonal terms are only fitted once a series has enough readings to
+    support them; otherwise the model falls back to a plain linear trend.
+    The trend is held flat beyond the span covered by the readings.
+    """
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    mask = ~(np.isnan(times) | np.isnan(values))
+    weights = mask.astype(np.float64)
+    observations = mask.sum(axis=1)
+
+    anchor = np.where(mask, times, -np.inf).max(axis=1)
+    anchor = np.where(np.isfinite(anchor), anchor, 0.0)
+    first = np.where(mask, times, np.inf).min(axis=1)
+    span_hours = np.where(np.isfinite(first), (anchor - first) / HOUR, 0.0)
+    safe_times = np.where(mask, times, anchor[:, None])
+
+    hours_abs = safe_times / HOUR
+    hours_rel = (safe_times - anchor[:, None]) / HOUR
+    X = _design(hours_rel, hours_abs, season_hours, harmonics)
+    y = np.where(mask, values, 0.0)
+
+    # Weighted normal equations per series: (X'WX + L) b = X'Wy
+    XtX = np.einsum("st,stk,stl->skl", weights, X, X)
+    Xty = np.einsum("st,stk,st->sk", weights, X, y)
+
+    n_features = X.shape[-1]
+    penalty = np.full((len(observations), n_features), ridge)
+    penalty[:, 0] = 0.0
+    # Too few readings for a trend or for the seasonal terms: pin them to zero.
+    penalty[observations < 2, 1] = 1e12
+    penalty[observations < n_features + 2, 2:] = 1e12
+    penalty[observations == 0, 0] = 1.0
+    XtX[:, np.arange(n_features), np.arange(n_features)] += penalty
+
+    coefficients = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+
+    if start is None:
+        start = anchor
+    start = np.broadcast_to(np.asarray(start, dtype=np.float64), anchor.shape)
+    steps = np.arange(1, hours_ahead + 1) * step_hours * HOUR
+    future = start[:, None] + steps[None, :]
+    # Never run the trend further past the last reading than the data spans.
+    lead = np.minimum((future - anchor[:, None]) / HOUR, np.maximum(span_hours, step_hours)[:, None])
+    F = _design(lead, future / HOUR, season_hours, harmonics)
+
+    predicted = np.einsum("shk,sk->sh", F, coefficients)
+    predicted = np.maximum(0, np.round(predicted, 2))
+    predicted[observations == 0] = np.nan
+
+    return {
+        "timestamps": future.astype(np.int64),
+        "predicted": predicted,
+        "observations": observations,
+    }
+
+
+def stack_histories(histories: list):
+    """
+    Stacks several lists of {"timestamp", "aqi"} records into NaN-padded
+    (series x time) matrices for batch_forecast.
+    """
+    width = max((len(records) for records in histories), default=0)
+    times = np.full((len(histories), max(width, 1)), np.nan)
+    values = np.full_like(times, np.nan)
+
+    for i, records in enumerate(histories):
+        for j, record in enumerate(records):
+            aqi = record.get("aqi")
+            timestamp = record.get("timestamp")
+            if timestamp is None or aqi in (None, "N/A"):
+                continue
+            try:
+                times[i, j] = to_epoch(timestamp)
+                values[i, j] = float(aqi)
+            except (TypeError, ValueError):
+                continue
+    return times, values
+
+
+def stack_series(series_list: list):
+    """
+    Stacks ForecastSeries objects into NaN-padded (series x time) matrices.
+    """
+    width = max((len(series) for series in series_list), default=0)
+    times = np.full((len(series_list), max(width, 1)), np.nan)
+    values = np.full_like(times, np.nan)
+
+    for i, series in enumerate(series_list):
+        times[i, :len(series)] = series.timestamps
+        values[i, :len(series)] = series.aqi
+    return times, values
+
+
+def _as_forecast(timestamps, predicted):
+    return [
+        {
+            "hour": i + 1,
+            "timestamp": datetime.utcfromtimestamp(int(ts)).isoformat(),
+            "predicted_aqi": float(value)
+        }
+        for i, (ts, value) in enumerate(zip(timestamps, predicted))
+    ]
+
 
 def simple_aqi_forecast(aqi_history: list, hours_ahead: int = 6):
     """
-    Predicts future AQI values based on last N historical readings
-    using a simple linear trend extrapolation.
+    Predicts future AQI values for the next hours from a user's history
+    records, using the batched trend + seasonal engine on real timestamps.
     """
     if not aqi_history:
         return {"error": "No AQI history available for forecasting."}
 
-    # Sort by timestamp
-    sorted_data = sorted(aqi_history, key=lambda x: x["timestamp"])
-    values = np.array([x["aqi"] for x in sorted_data])
-    timestamps = np.array([i for i in range(len(values))])
-
-    # Fit simple linear model (y = mx + b)
-    try:
-        m, b = np.polyfit(timestamps, values, 1)
-    except Exception:
+    times, values = stack_histories([aqi_history])
+    if np.count_nonzero(~np.isnan(values)) < 2:
         return {"error": "Not enough data for forecasting."}
 
-    # Predict next N hours
-    forecast = []
-    for i in range(1, hours_ahead + 1):
-        next_value = float(m * (len(values) + i) + b)
-        next_time = datetime.utcnow() + timedelta(hours=i)
-        forecast.append({
-            "hour": i,
-            "timestamp": next_time.isoformat(),
-            "predicted_aqi": max(0, round(next_value, 2))
-        })
-
-    return {"forecast": forecast}
+    now = datetime.now(timezone.utc).timestamp()
+    result = batch_forecast(times, values, hours_ahead=hours_ahead, start=now)
+    return {"forecast": _as_forecast(result["timestamps"][0], result["predicted"][0])}
+
@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+
+from core.timeutil import to_epoch
+
+
+def _nullable(values):
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+class ForecastSeries:
+    """
+    Array-backed forecast series.
+
+    timestamps  int64 epoch seconds, shape (n,)
+    aqi         float32 Universal AQI, NaN where missing, shape (n,)
+    pollutants  float32 concentrations, shape (n, len(codes)), NaN where missing
+    codes/units/display_names describe the pollutant columns once, instead of per point.
+    """
+
+    def __init__(self, timestamps, aqi, pollutants, codes, units, display_names, categories, dominant_pollutants):
+        self.timestamps = timestamps
+        self.aqi = aqi
+        self.pollutants = pollutants
+        self.codes = codes
+        self.units = units
+        self.display_names = display_names
+        self.categories = categories
+        self.dominant_pollutants = dominant_pollutants
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def pollutant(self, code: str):
+        """
+        Concentration column for one pollutant code, or None if absent.
+        """
+        try:
+            return self.pollutants[:, self.codes.index(code)]
+        except ValueError:
+            return None
+
+    def to_columnar(self):
+        """
+        JSON-ready columnar payload (NaN becomes null).
+        """
+        return {
+            "timestamps": self.timestamps.tolist(),
+            "aqi": _nullable(self.aqi),
+            "category": self.categories,
+            "dominant_pollutant": self.dominant_pollutants,
+            "pollutants": {
+                "codes": self.codes,
+                "display_names": self.display_names,
+                "units": self.units,
+                "values": [_nullable(column) for column in self.pollutants.T],
+            },
+        }
+
+
+class ForecastSeriesBuilder:
+    """
+    Accumulates raw upstream `forecasts` entries (page by page) into a
+    ForecastSeries without building per-point dicts.
+    """
+
+    def __init__(self):
+        self._timestamps = []
+        self._aqi = []
+        self._categories = []
+        self._dominant = []
+        self._columns = {}
+        self._rows = []
+        self.codes = []
+        self.units = []
+        self.display_names = []
+
+    def _column(self, pollutant: dict):
+        code = pollutant.get("code")
+        index = self._columns.get(code)
+        if index is None:
+            index = len(self.codes)
+            self._columns[code] = index
+            self.codes.append(code)
+            self.units.append(pollutant.get("concentration", {}).get("units"))
+            self.display_names.append(pollutant.get("displayName"))
+        return index
+
+    def extend(self, forecasts: list):
+        for f in forecasts:
+            aqi_info = None
+            for idx in f.get("indexes", []):
+                if idx.get("code") == "uaqi":
+                    aqi_info = idx
+                    break
+
+            self._timestamps.append(to_epoch(f["dateTime"]) if f.get("dateTime") else 0)
+            aqi = aqi_info.get("aqi") if aqi_info else None
+            self._aqi.append(float("nan") if aqi is None else aqi)
+            self._categories.append(aqi_info.get("category") if aqi_info else None)
+            self._dominant.append(aqi_info.get("dominantPollutant") if aqi_info else None)
+
+            row = {}
+            for p in f.get("pollutants", []):
+                value = p.get("concentration", {}).get("value")
+                if value is not None:
+                    row[self._column(p)] = value
+            self._rows.append(row)
+        return self
+
+    def build(self):
+        matrix = np.full((len(self._rows), len(self.codes)), np.nan, dtype=np.float32)
+        for i, row in enumerate(self._rows):
+            for j, value in row.items():
+                matrix[i, j] = value
+
+        return ForecastSeries(
+            timestamps=np.asarray(self._timestamps, dtype=np.int64),
+            aqi=np.asarray(self._aqi, dtype=np.float32),
+            pollutants=matrix,
+            codes=self.codes,
+            units=self.units,
+            display_names=self.display_names,
+            categories=self._categories,
+            dominant_pollutants=self._dominant,
+        )
+
@@ -0,0 +1,73 @@
+"""
+Schemas of the Google Air Quality payloads we consume, decoded straight
+from the response bytes in one pass by pydantic-core. They are TypedDicts,
+so decoding yields plain dicts the parsers (and ForecastSeriesBuilder)
+walk as before; fields we don't declare (colors, aqiDisplay, fullName,
+health recommendations) are skipped instead of materialized. All keys are
+optional, as upstream omits them freely.
+"""
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+
+class Concentration(TypedDict, total=False):
+    value: Optional[float]
+    units: Optional[str]
+
+
+class Pollutant(TypedDict, total=False):
+    code: str
+    displayName: Optional[str]
+    concentration: Concentration
+
+
+class AirQualityIndex(TypedDict, total=False):
+    code: str
+    aqi: Optional[int]
+    category: Optional[str]
+    dominantPollutant: Optional[str]
+
+
+class CurrentConditions(TypedDict, total=False):
+    """
+    currentConditions:lookup response.
+    """
+    dateTime: str
+    regionCode: Optional[str]
+    indexes: List[AirQualityIndex]
+    pollutants: List[Pollutant]
+
+
+class HourlyForecast(TypedDict, total=False):
+    dateTime: str
+    indexes: List[AirQualityIndex]
+    pollutants: List[Pollutant]
+
+
+class ForecastPage(TypedDict, total=False):
+    """
+    One page of a forecast:lookup response.
+    """
+    forecasts: List[HourlyForecast]
+    regionCode: Optional[str]
+    nextPageToken: Optional[str]
+
+
+_current_conditions = TypeAdapter(CurrentConditions)
+_forecast_page = TypeAdapter(ForecastPage)
+
+
+def decode_current_conditions(body: bytes):
+    """
+    Raises pydantic.ValidationError when the body isn't a valid payload.
+    """
+    return _current_conditions.validate_json(body)
+
+
+def decode_forecast_page(body: bytes):
+    """
+    Raises pydantic.ValidationError when the body isn't a valid payload.
+    """
+    return _forecast_page.validate_json(body)
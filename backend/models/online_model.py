@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+from core.config import ONLINE_MODEL_ALPHA, ONLINE_MODEL_BETA, ONLINE_MODEL_DAMPING
+
+HOUR = 3600.0
+
+
+def update_state(state: dict, timestamp: float, value: float,
+                 alpha: float = ONLINE_MODEL_ALPHA, beta: float = ONLINE_MODEL_BETA):
+    """
+    Folds one reading into a Holt (level + trend) state in O(1).
+    Smoothing factors are scaled by the gap since the previous reading, so
+    irregular sampling is handled without resampling the history.
+    Returns a new state dict: level, trend (AQI per hour), last_ts, n.
+    """
+    if not state or not state.get("n"):
+        return {"level": value, "trend": 0.0, "last_ts": timestamp, "n": 1}
+
+    level, trend = state["level"], state["trend"]
+    gap = (timestamp - state["last_ts"]) / HOUR
+
+    if gap <= 0:
+        # Duplicate or out-of-order reading: nudge the level, keep the clock.
+        return {**state, "level": alpha * value + (1 - alpha) * level, "n": state["n"] + 1}
+
+    a = 1 - (1 - alpha) ** gap
+    b = 1 - (1 - beta) ** gap
+    new_level = a * value + (1 - a) * (level + trend * gap)
+    new_trend = b * (new_level - level) / gap + (1 - b) * trend
+
+    return {"level": new_level, "trend": new_trend, "last_ts": timestamp, "n": state["n"] + 1}
+
+
+def forecast_state(state: dict, hours_ahead: int = 6, start: float = None,
+                   damping: float = ONLINE_MODEL_DAMPING):
+    """
+    Damped-trend forecast straight from a state, in the same
+    {"forecast": [...]} shape as simple_aqi_forecast.
+    """
+    if not state or state.get("n", 0) < 2:
+        return {"error": "Not enough data for forecasting."}
+
+    start = datetime.now(timezone.utc).timestamp() if start is None else start
+    lead_start = max(0.0, (start - state["last_ts"]) / HOUR)
+
+    forecast = []
+    for i in range(1, hours_ahead + 1):
+        lead = lead_start + i
+        # Sum of damping^k for k = 1..lead, so the trend flattens out.
+        damped = damping * (1 - damping ** lead) / (1 - damping) if damping < 1 else lead
+        value = state["level"] + state["trend"] * damped
+        forecast.append({
+            "hour": i,
+            "timestamp": datetime.utcfromtimestamp(int(start + i * HOUR)).isoformat(),
+            "predicted_aqi": max(0, round(value, 2))
+        })
+
+    return {"forecast": forecast}
@@ -0,0 +1,103 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+HOUR = 3600.0
+
+# Universal AQI runs 0 (poor) to 100 (excellent), so profiles set a floor on
+# it; pollutant limits are ceilings on concentration in the upstream units
+# (PM in µg/m³, gases in ppb).
+SAFETY_PROFILES = {
+    "general": {"min_aqi": 40, "max_pollutants": {}},
+    "sensitive": {"min_aqi": 60, "max_pollutants": {"pm25": 35}},
+    "respiratory": {"min_aqi": 70, "max_pollutants": {"pm25": 15, "o3": 50}},
+}
+
+
+def _window_sums(matrix, window: int):
+    """
+    Sliding-window sums along the time axis via prefix sums: (S, T) -> (S, T - window + 1).
+    """
+    prefix = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=prefix[:, 1:])
+    return prefix[:, window:] - prefix[:, :-window]
+
+
+def window_scores(times, aqi, window: int, min_aqi: float = None, limits: list = None, step: float = HOUR):
+    """
+    Scores every `window`-step slot of every series in one pass.
+
+    times   (S, T) epoch seconds, NaN-padded
+    aqi     (S, T) Universal AQI, NaN where missing
+    limits  optional list of ((S, T) concentrations, ceiling) pairs; a
+            step fails when a limited concentration or the AQI is missing,
+            as it can't be shown to be safe
+
+    Returns (mean, worst): (S, T - window + 1) arrays holding the window's
+    mean and lowest AQI, with mean = -inf for windows that are not entirely
+    safe or not contiguous in time.
+    """
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    aqi = np.atleast_2d(np.asarray(aqi, dtype=np.float64))
+    if window < 1 or window > aqi.shape[1]:
+        empty = np.empty((aqi.shape[0], 0))
+        return empty, empty
+
+    safe = ~np.isnan(aqi)
+    if min_aqi is not None:
+        safe &= np.nan_to_num(aqi, nan=-np.inf) >= min_aqi
+    for values, ceiling in limits or []:
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        # NaN compares False, so unknown concentrations fail the limit.
+        safe &= values <= ceiling
+
+    safe_counts = _window_sums(safe.astype(np.float64), window)
+    mean = _window_sums(np.where(np.isnan(aqi), 0.0, aqi), window) / window
+    worst = sliding_window_view(np.nan_to_num(aqi, nan=-np.inf), window, axis=1).min(axis=-1)
+
+    # Consecutive readings only: the window must span exactly window - 1 steps.
+    span = times[:, window - 1:] - times[:, :times.shape[1] - window + 1]
+    contiguous = np.abs(span - (window - 1) * step) < step / 2
+
+    valid = (safe_counts == window) & contiguous
+    return np.where(valid, mean, -np.inf), worst
+
+
+def best_windows(times, aqi, duration_seconds: float, min_aqi: float = None, limits: list = None, top_k: int = 5):
+    """
+    Ranks the best non-overlapping safe windows across all series, cleanest
+    (highest mean AQI) first. Each result is {series, start, end, steps,
+    mean_aqi, min_aqi} with start/end in epoch seconds.
+    """
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    diffs = np.diff(times, axis=1)
+    step = float(np.nanmedian(diffs)) if np.any(~np.isnan(diffs)) else HOUR
+    window = max(1, int(np.ceil(duration_seconds / step - 1e-9)))
+
+    mean, worst = window_scores(times, aqi, window, min_aqi, limits, step)
+    if mean.size == 0:
+        return []
+
+    flat = mean.ravel()
+    candidates = np.flatnonzero(np.isfinite(flat))
+    order = candidates[np.argsort(-flat[candidates], kind="stable")]
+
+    results = []
+    taken = {}
+    for position in order.tolist():
+        series, offset = divmod(position, mean.shape[1])
+        start = times[series, offset]
+        # Skip windows that overlap one already picked for the same series.
+        if any(abs(start - other) < window * step for other in taken.get(series, [])):
+            continue
+        taken.setdefault(series, []).append(start)
+        results.append({
+            "series": series,
+            "start": int(start),
+            "end": int(times[series, offset + window - 1] + step),
+            "steps": window,
+            "mean_aqi": round(float(mean[series, offset]), 2),
+            "min_aqi": round(float(worst[series, offset]), 2),
+        })
+        if len(results) >= top_k:
+            break
+    return results
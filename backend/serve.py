@@ -0,0 +1,53 @@
+# Production entry point: python serve.py --workers 4
+"""
+Runs the API as N uvicorn worker processes plus one refresher process.
+
+The refresher is the only process that sweeps the ingestion grid upstream;
+it rewrites a snapshot segment (under /dev/shm when available) that every
+worker maps read-only, so adding workers adds neither snapshot memory nor
+Google calls. Each worker still opens its own Firestore client: gRPC
+channels can't be shared across processes.
+
+Only the ingestion grid is shared. Per-location forecast routes are fetched
+by whichever worker serves them, under that worker's own rate limit and
+daily budget.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+
+def default_segment_path():
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"whisperingwinds-snapshots-{os.getpid()}.bin")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--segment", default=None, help="Snapshot segment file (default: under /dev/shm)")
+    args = parser.parse_args()
+
+    path = args.segment or default_segment_path()
+    # Read by core.config in the refresher and in every worker.
+    os.environ["SHARED_SNAPSHOT_PATH"] = path
+
+    import uvicorn
+    from services.snapshot_refresher import run
+
+    refresher = multiprocessing.get_context("spawn").Process(target=run, args=(path,), name="snapshot-refresher", daemon=True)
+    refresher.start()
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        refresher.terminate()
+        refresher.join(5)
+        if not args.segment and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+# backend/services/alert_engine.py
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from core.config import (
+    ALERT_CONCURRENCY,
+    ALERT_INTERVAL,
+    ALERT_MAX_RULES_PER_USER,
+    ALERT_PRECISION,
+    ALERT_SINK,
+    ALERT_USER_LIMIT,
+    ALERT_USER_WINDOW,
+    INGESTION_JITTER,
+)
+from core.geo import geohash_center, geohash_encode
+from core.log import get_logger
+from core.timeutil import to_rfc3339
+from models.alert_model import AQI_METRIC, first_breaches, metric_table
+from services.aqi_forecast_fetcher import fetch_aqi_forecast_series
+from services.ingestion import claim_lease
+
+RULE_COLLECTION = "alert_rules"
+USER_RULES = "users/{uid}/alert_rules"
+RULE_DOCUMENT = USER_RULES + "/{rule_id}"
+LEASE_DOCUMENT = "_system/alert_leader"
+HOUR = 3600
+
+logger = get_logger(__name__)
+
+
+class LogAlertSink:
+    """
+    Writes notifications to the log; stands in until a push channel is wired.
+    """
+
+    async def send(self, notifications: list):
+        for notification in notifications:
+            logger.info("AQI alert", extra={"fields": notification})
+
+
+class MemoryAlertSink:
+    """
+    Keeps every notification in `sent`, for tests and local runs.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, notifications: list):
+        self.sent.extend(notifications)
+
+
+def create_alert_sink(name: str = ALERT_SINK):
+    if name == "log":
+        return LogAlertSink()
+    if name == "memory":
+        return MemoryAlertSink()
+    raise ValueError(f"Unknown ALERT_SINK {name!r}, expected 'log' or 'memory'")
+
+
+class AlertRuleIndex:
+    """
+    Rules grouped by forecast cell, with per-cell column arrays compiled on
+    first evaluation after a change.
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._compiled = {}
+        self._by_user = {}
+
+    def add(self, rule: dict):
+        self.remove(rule["uid"], rule["id"])
+        self._cells.setdefault(rule["cell"], {})[rule["id"]] = rule
+        self._by_user.setdefault(rule["uid"], {})[rule["id"]] = rule
+        self._compiled.pop(rule["cell"], None)
+
+    def remove(self, uid: str, rule_id: str):
+        rule = self._by_user.get(uid, {}).pop(rule_id, None)
+        if rule is None:
+            return None
+        rules = self._cells.get(rule["cell"], {})
+        rules.pop(rule_id, None)
+        if not rules:
+            self._cells.pop(rule["cell"], None)
+        self._compiled.pop(rule["cell"], None)
+        return rule
+
+    def replace(self, rules: list):
+        self._cells, self._compiled, self._by_user = {}, {}, {}
+        for rule in rules:
+            self.add(rule)
+
+    def for_user(self, uid: str):
+        return list(self._by_user.get(uid, {}).values())
+
+    def cells(self):
+        return list(self._cells)
+
+    def compiled(self, cell: str):
+        """
+        Column view of a cell's rules: ids, uids, metric names, thresholds,
+        below flags and lead seconds.
+        """
+        compiled = self._compiled.get(cell)
+        if compiled is None:
+            rules = list(self._cells.get(cell, {}).values())
+            metrics = [rule["pollutant"] or AQI_METRIC for rule in rules]
+            compiled = {
+                "rules": rules,
+                "metrics": metrics,
+                "thresholds": np.array([rule["threshold"] for rule in rules], dtype=np.float64),
+                "below": np.array([metric == AQI_METRIC for metric in metrics]),
+                "leads": np.array([rule["lead_hours"] * HOUR for rule in rules], dtype=np.float64),
+            }
+            self._compiled[cell] = compiled
+        return compiled
+
+    def __contains__(self, cell: str):
+        return cell in self._cells
+
+    def __len__(self):
+        return sum(len(rules) for rules in self._cells.values())
+
+
+class AlertEngine:
+    """
+    Evaluates users' forecast alert rules per cell instead of per user:
+    each sweep fetches one forecast per cell that has rules and checks all
+    of that cell's rules against it in a single vectorized pass.
+
+    A rule notifies once per predicted episode (again only after a sweep
+    where it no longer fires) and each user gets at most ALERT_USER_LIMIT
+    notifications per ALERT_USER_WINDOW. With several replicas only the
+    holder of a Firestore lease sweeps, reloading rules from Firestore first.
+
+    Forecasts the ingestion sweep already fetched are handed over through
+    offer_forecast: the cell's rules are evaluated right away and the next
+    sweep reuses the series instead of asking upstream again.
+    """
+
+    def __init__(
+        self,
+        db,
+        sink=None,
+        precision: int = ALERT_PRECISION,
+        interval: float = ALERT_INTERVAL,
+        concurrency: int = ALERT_CONCURRENCY,
+        user_limit: int = ALERT_USER_LIMIT,
+        user_window: float = ALERT_USER_WINDOW,
+        jitter: float = INGESTION_JITTER,
+        fetch=fetch_aqi_forecast_series,
+    ):
+        self.db = db
+        self.sink = sink or create_alert_sink()
+        self.precision = precision
+        self.interval = interval
+        self.concurrency = concurrency
+        self.user_limit = user_limit
+        self.user_window = user_window
+        self.jitter = jitter
+        self.fetch = fetch
+        self.rules = AlertRuleIndex()
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+        self._task = None
+        self._active = set()
+        self._recent = {}
+        self._forecasts = {}
+        self._stats = {
+            "sweeps": 0, "cells_evaluated": 0, "cells_failed": 0, "rules_evaluated": 0, "missing_metric": 0,
+            "fired": 0, "notified": 0, "deduplicated": 0, "rate_limited": 0, "offered": 0, "reused": 0,
+            "last_sweep_seconds": None,
+        }
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            started = time.monotonic()
+            try:
+                self.is_leader = self.db is None or await asyncio.to_thread(self._acquire_lease)
+                if self.is_leader:
+                    if self.db is not None:
+                        await asyncio.to_thread(self._load_rules)
+                    await self.sweep()
+            except Exception as e:
+                logger.exception("Alert sweep failed: %s", e)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _acquire_lease(self):
+        ref = self.db.document(LEASE_DOCUMENT)
+        return claim_lease(self.db.transaction(), ref, self.holder, max(self.interval + self.jitter, 300))
+
+    def _load_rules(self):
+        self.rules.replace([doc.to_dict() for doc in self.db.collection_group(RULE_COLLECTION).stream()])
+
+    async def add_rule(self, uid: str, lat: float, lon: float, threshold: float, pollutant: str = None,
+                       lead_hours: int = 6, name: str = None):
+        """
+        Stores a rule and indexes it under its forecast cell.
+        Raises ValueError when the user already has ALERT_MAX_RULES_PER_USER rules.
+        """
+        if len(await self.list_rules(uid)) >= ALERT_MAX_RULES_PER_USER:
+            raise ValueError(f"At most {ALERT_MAX_RULES_PER_USER} alert rules per user")
+        rule = {
+            "id": uuid.uuid4().hex[:12],
+            "uid": uid,
+            "cell": geohash_encode(lat, lon, self.precision),
+            "lat": lat,
+            "lon": lon,
+            "threshold": threshold,
+            "pollutant": pollutant,
+            "lead_hours": lead_hours,
+            "name": name,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        if self.db is not None:
+            await asyncio.to_thread(self.db.document(RULE_DOCUMENT.format(uid=uid, rule_id=rule["id"])).set, rule)
+        self.rules.add(rule)
+        return rule
+
+    async def remove_rule(self, uid: str, rule_id: str):
+        """
+        Deletes one of the user's rules; returns False if it didn't exist.
+        """
+        removed = self.rules.remove(uid, rule_id) is not None
+        if self.db is not None:
+            ref = self.db.document(RULE_DOCUMENT.format(uid=uid, rule_id=rule_id))
+            snapshot = await asyncio.to_thread(ref.get)
+            if snapshot.exists:
+                await asyncio.to_thread(ref.delete)
+                removed = True
+        self._active.discard(rule_id)
+        return removed
+
+    async def list_rules(self, uid: str):
+        """
+        The user's rules, oldest first. Read from Firestore when available,
+        since rules may have been added through another replica.
+        """
+        if self.db is None:
+            rules = self.rules.for_user(uid)
+        else:
+            docs = await asyncio.to_thread(lambda: list(self.db.collection(USER_RULES.format(uid=uid)).stream()))
+            rules = [doc.to_dict() for doc in docs]
+        return sorted(rules, key=lambda rule: rule["created_at"])
+
+    def evaluate(self, cell: str, series, now: float = None):
+        """
+        Checks every rule of `cell` against its forecast series and returns
+        the notifications that survive deduplication and rate limiting.
+        """
+        now = time.time() if now is None else now
+        compiled = self.rules.compiled(cell)
+        rules = compiled["rules"]
+        if not rules or not len(series):
+            return []
+
+        table, rows = metric_table(series)
+        missing = table.shape[0] - 1
+        metric_rows = [rows.get(metric, missing) for metric in compiled["metrics"]]
+        # Rules on a pollutant the forecast doesn't report can't fire.
+        self._stats["missing_metric"] += metric_rows.count(missing)
+        fired, first = first_breaches(
+            series.timestamps, table, metric_rows, compiled["thresholds"], compiled["below"], now + compiled["leads"], now,
+        )
+        self._stats["rules_evaluated"] += len(rules)
+
+        notifications = []
+        for i in np.flatnonzero(~fired):
+            self._active.discard(rules[i]["id"])
+        for i in np.flatnonzero(fired):
+            rule = rules[i]
+            self._stats["fired"] += 1
+            if rule["id"] in self._active:
+                self._stats["deduplicated"] += 1
+                continue
+            if not self._allow(rule["uid"], now):
+                self._stats["rate_limited"] += 1
+                continue
+            self._active.add(rule["id"])
+            at = float(series.timestamps[first[i]])
+            notifications.append({
+                "uid": rule["uid"],
+                "rule_id": rule["id"],
+                "name": rule["name"],
+                "cell": cell,
+                "metric": compiled["metrics"][i],
+                "threshold": rule["threshold"],
+                "value": round(float(table[metric_rows[i], first[i]]), 2),
+                "at": to_rfc3339(at),
+                "hours_ahead": round((at - now) / HOUR, 1),
+            })
+        return notifications
+
+    def _allow(self, uid: str, now: float):
+        recent = self._recent.setdefault(uid, deque())
+        while recent and recent[0] <= now - self.user_window:
+            recent.popleft()
+        if len(recent) >= self.user_limit:
+            return False
+        recent.append(now)
+        return True
+
+    async def offer_forecast(self, cell: str, series, fetched_at: float = None):
+        """
+        Takes a cell's forecast fetched elsewhere (the ingestion sweep). When
+        the cell has rules they are evaluated now, on the lease holder, and
+        the series is kept for the next sweep.
+        """
+        if cell not in self.rules:
+            return
+        now = time.time() if fetched_at is None else fetched_at
+        self._forecasts[cell] = (now, series)
+        self._stats["offered"] += 1
+        if self.is_leader:
+            notifications = self.evaluate(cell, series, now)
+            if notifications:
+                self._stats["notified"] += len(notifications)
+                await self.sink.send(notifications)
+
+    def _cached_forecast(self, cell: str, horizon: float, now: float):
+        entry = self._forecasts.get(cell)
+        if entry is None:
+            return None
+        fetched_at, series = entry
+        if now - fetched_at > self.interval or not len(series) or series.timestamps[-1] < horizon:
+            self._forecasts.pop(cell, None)
+            return None
+        return series
+
+    async def sweep(self, now: float = None):
+        """
+        Fetches one forecast per cell with rules (bounded concurrency),
+        unless a fresh one covering the rules' lead was offered, evaluates
+        the cells and hands all notifications to the sink at once.
+        """
+        started = time.monotonic()
+        now = time.time() if now is None else now
+        start = (int(now) // HOUR) * HOUR
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        notifications, failed = [], 0
+
+        async def visit(cell):
+            nonlocal failed
+            lead = float(self.rules.compiled(cell)["leads"].max(initial=0))
+            series = self._cached_forecast(cell, start + lead, now)
+            if series is not None:
+                self._stats["reused"] += 1
+            else:
+                lat, lon = geohash_center(cell)
+                async with semaphore:
+                    result = await self.fetch(lat, lon, to_rfc3339(start), to_rfc3339(start + lead + HOUR))
+                if "error" in result:
+                    failed += 1
+                    return
+                series = result["series"]
+            notifications.extend(self.evaluate(cell, series, now))
+
+        cells = self.rules.cells()
+        await asyncio.gather(*(visit(cell) for cell in cells))
+        if notifications:
+            await self.sink.send(notifications)
+
+        self._stats["sweeps"] += 1
+        self._stats["cells_evaluated"] += len(cells) - failed
+        self._stats["cells_failed"] += failed
+        self._stats["notified"] += len(notifications)
+        self._stats["last_sweep_seconds"] = round(time.monotonic() - started, 3)
+        return notifications
+
+    def stats(self):
+        return {
+            **self._stats,
+            "holder": self.holder,
+            "is_leader": self.is_leader,
+            "rules": len(self.rules),
+            "cells": len(self.rules.cells()),
+            "sink": type(self.sink).__name__,
+        }
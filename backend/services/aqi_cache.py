@@ -0,0 +1,199 @@
+# backend/services/aqi_cache.py
+import json
+import time
+
+from core.config import (
+    AQI_CACHE_GEOHASH_PRECISION,
+    AQI_CACHE_BUCKET_SECONDS,
+    AQI_CACHE_TTL,
+    AQI_CACHE_MAX_ENTRIES,
+    AQI_CACHE_REDIS_URL,
+    SINGLE_FLIGHT_ERROR_TTL,
+    INGESTION_PRECISION,
+    INGESTION_SNAPSHOT_MAX_AGE,
+    UPSTREAM_FALLBACK_TTL,
+)
+from core.geo import geohash_center, geohash_encode
+from core.log import get_logger
+from core.single_flight import SingleFlight
+from core.ttl_cache import TTLCache
+from services.aqi_fetcher import get_current_aqi
+from services.snapshot_store import snapshots
+
+logger = get_logger(__name__)
+
+_local = TTLCache(AQI_CACHE_MAX_ENTRIES, AQI_CACHE_TTL)
+_shared = None
+_stats = {"shared_hits": 0, "snapshot_hits": 0, "upstream_fetches": 0, "stale_served": 0}
+_fills = SingleFlight(error_ttl=SINGLE_FLIGHT_ERROR_TTL)
+# Last good reading per cell, outliving the time bucket, for upstream outages.
+_last_good = TTLCache(AQI_CACHE_MAX_ENTRIES, UPSTREAM_FALLBACK_TTL)
+
+
+class RedisTier:
+    """
+    Optional shared tier so several workers reuse each other's lookups.
+    Requires the `redis` package; values are stored as JSON.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str):
+        raw = await self._redis.get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["value"], entry["stored_at"]
+
+    async def set(self, key: str, value: dict, stored_at: float, ttl: float):
+        payload = json.dumps({"value": value, "stored_at": stored_at})
+        await self._redis.set(key, payload, ex=max(1, int(ttl)))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+async def start_cache():
+    global _shared
+    if AQI_CACHE_REDIS_URL and _shared is None:
+        try:
+            _shared = RedisTier(AQI_CACHE_REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed; shared AQI cache tier disabled")
+
+
+async def close_cache():
+    global _shared
+    if _shared is not None:
+        await _shared.close()
+        _shared = None
+
+
+def cache_key(lat: float, lon: float, now: float = None):
+    """
+    Snaps a coordinate to its geohash cell and the current time bucket.
+    Returns (key, cell).
+    """
+    now = time.time() if now is None else now
+    cell = geohash_encode(lat, lon, AQI_CACHE_GEOHASH_PRECISION)
+    bucket = int(now // AQI_CACHE_BUCKET_SECONDS)
+    return f"aqi:current:{cell}:{bucket}", cell
+
+
+def _ttl_for(now: float):
+    # Never let an entry outlive the time bucket it was stored under.
+    bucket_end = (now // AQI_CACHE_BUCKET_SECONDS + 1) * AQI_CACHE_BUCKET_SECONDS
+    return min(AQI_CACHE_TTL, bucket_end - now)
+
+
+def with_location(data: dict, lat: float, lon: float):
+    """
+    A copy of a cell's reading reporting the caller's own coordinates:
+    entries are shared by everyone in the cell and fetched at its centre.
+    """
+    result = dict(data)
+    result["location"] = f"{lat},{lon}"
+    return result
+
+
+def _with_age(data: dict, cell: str, age: float, lat: float, lon: float):
+    result = with_location(data, lat, lon)
+    result["cell"] = cell
+    result["cache_age"] = round(max(0.0, age), 1)
+    return result
+
+
+async def get_current_aqi_cached(lat: float, lon: float):
+    """
+    Returns current conditions for the cell containing (lat, lon), going to
+    Google only when neither cache tier nor the latest ingestion sweep has
+    a fresh entry.
+    """
+    now = time.time()
+    key, cell = cache_key(lat, lon, now)
+
+    entry = _local.get(key)
+    if entry is None and _shared is not None:
+        try:
+            entry = await _shared.get(key)
+        except Exception as e:
+            logger.warning("Shared AQI cache unavailable: %s", e)
+            entry = None
+        if entry is not None:
+            _stats["shared_hits"] += 1
+            _local.set(key, entry[0], ttl=_ttl_for(now), stored_at=entry[1])
+
+    if entry is not None:
+        value, stored_at = entry
+        return _with_age(value, cell, now - stored_at, lat, lon)
+
+    if len(snapshots):
+        snapshot = snapshots.get(geohash_encode(lat, lon, INGESTION_PRECISION), max_age=INGESTION_SNAPSHOT_MAX_AGE)
+        if snapshot is not None:
+            _stats["snapshot_hits"] += 1
+            return _with_age(snapshot["data"], cell, now - snapshot["fetched_at"], lat, lon)
+
+    # Everyone who misses on the same cell waits for a single fill.
+    data = await _fills.do(key, lambda: _fill(key, cell, now))
+    if not data or "error" in data or "aqi" not in data:
+        return _fallback(cell, lat, lon, now, data)
+    return _with_age(data, cell, 0, lat, lon)
+
+
+def _fallback(cell: str, lat: float, lon: float, now: float, failure: dict):
+    """
+    While upstream is failing (circuit open, quota spent, errors), serves
+    the last good reading for the cell, or an older sweep snapshot, marked
+    stale. Returns the original failure when there is nothing to fall back on.
+    """
+    if not failure or "error" not in failure:
+        return failure
+
+    entry = _last_good.get(cell)
+    if entry is None and len(snapshots):
+        snapshot = snapshots.get(geohash_encode(lat, lon, INGESTION_PRECISION), max_age=UPSTREAM_FALLBACK_TTL)
+        if snapshot is not None:
+            entry = snapshot["data"], snapshot["fetched_at"]
+    if entry is None:
+        return failure
+
+    _stats["stale_served"] += 1
+    value, stored_at = entry
+    result = _with_age(value, cell, now - stored_at, lat, lon)
+    result["stale"] = True
+    result["upstream_error"] = failure["error"]
+    return result
+
+
+async def _fill(key: str, cell: str, now: float):
+    _stats["upstream_fetches"] += 1
+    # Fetched at the cell centre, not the first caller's position.
+    data = await get_current_aqi(*geohash_center(cell))
+    if not data or "error" in data or "aqi" not in data:
+        return data
+
+    ttl = _ttl_for(now)
+    _local.set(key, data, ttl=ttl, stored_at=now)
+    _last_good.set(cell, data, stored_at=now)
+    if _shared is not None:
+        try:
+            await _shared.set(key, data, now, ttl)
+        except Exception as e:
+            logger.warning("Could not write shared AQI cache: %s", e)
+    return data
+
+
+def cache_stats():
+    local = _local.stats()
+    return {
+        "hits": local["hits"] + _stats["shared_hits"] + _stats["snapshot_hits"],
+        "misses": _stats["upstream_fetches"],
+        "local": local,
+        "shared_enabled": _shared is not None,
+        "shared_hits": _stats["shared_hits"],
+        "snapshot_hits": _stats["snapshot_hits"],
+        "stale_served": _stats["stale_served"],
+        "coalescing": _fills.stats(),
+    }
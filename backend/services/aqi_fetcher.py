@@ -1,13 +1,27 @@
-import requests
-import json
-from core.config import GOOGLE_API_KEY
+import httpx
+from pydantic import ValidationError
+from core import http_client
+from core.config import GOOGLE_API_KEY, GOOGLE_AQ_BASE_URL, SINGLE_FLIGHT_ERROR_TTL
+from core.metrics import timer
+from core.resilience import google_aq, UpstreamUnavailable
+from core.single_flight import SingleFlight
+from models.google_aq_model import decode_current_conditions
 
-BASE_URL = "https://airquality.googleapis.com/v1/currentConditions:lookup"
+BASE_URL = f"{GOOGLE_AQ_BASE_URL}/currentConditions:lookup"
 
-def get_current_aqi(lat: float, lon: float):
+_flights = SingleFlight(error_ttl=SINGLE_FLIGHT_ERROR_TTL)
+
+
+async def get_current_aqi(lat: float, lon: float):
     """
     Fetches AQI and pollutant data using Google Air Quality API.
+    Concurrent calls for the same coordinates share one upstream request.
     """
+    key = (round(lat, 5), round(lon, 5))
+    return await _flights.do(key, lambda: _lookup_current_aqi(lat, lon))
+
+
+async def _lookup_current_aqi(lat: float, lon: float):
     if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_API_KEY":
         return {"error": "Missing or invalid Google API key in .env"}
 
@@ -20,43 +34,57 @@ def get_current_aqi(lat: float, lon: float):
     }
 
     try:
-        response = requests.post(f"{BASE_URL}?key={GOOGLE_API_KEY}", headers=headers, data=json.dumps(payload))
+        response = await google_aq.call(
+            "current",
+            lambda: http_client.post(f"{BASE_URL}?key={GOOGLE_API_KEY}", headers=headers, json=payload),
+        )
 
         if response.status_code != 200:
             return {"error": f"API returned {response.status_code}", "details": response.text}
 
-        data = response.json()
-
-        # Extract the main AQI info
-        indexes = data.get("indexes", [])
-        if not indexes:
-            return {"error": "No AQI index data available", "raw": data}
-
-        main_index = indexes[0]
-        aqi_value = main_index.get("aqi", "N/A")
-        category = main_index.get("category", "Unknown")
-        dominant_pollutant = main_index.get("dominantPollutant", "Unknown")
-
-        # Extract pollutant concentrations
-        pollutants_data = data.get("pollutants", [])
-        pollutants = {}
-        for pollutant in pollutants_data:
-            code = pollutant.get("code", "").upper()
-            concentration = pollutant.get("concentration", {})
-            value = concentration.get("value")
-            units = concentration.get("units")
-            if code and value is not None:
-                pollutants[code] = {"value": value, "units": units}
-
-        return {
-            "location": f"{lat},{lon}",
-            "aqi": aqi_value,
-            "category": category,
-            "dominant_pollutant": dominant_pollutant,
-            "pollutants": pollutants,
-            "timestamp": data.get("dateTime", "N/A"),
-            "regionCode": data.get("regionCode", "N/A")
-        }
-
-    except requests.exceptions.RequestException as e:
+        with timer("parse"):
+            return parse_current_conditions(lat, lon, decode_current_conditions(response.content))
+
+    except ValidationError as e:
+        return {"error": "Malformed upstream response", "details": str(e)}
+    except UpstreamUnavailable as e:
+        return {"error": f"Upstream unavailable: {e}", "reason": e.reason}
+    except httpx.HTTPError as e:
         return {"error": f"Connection failed: {e}"}
+
+
+def parse_current_conditions(lat: float, lon: float, data: dict):
+    """
+    Flattens a decoded currentConditions:lookup response (see
+    models.google_aq_model) into our current-AQI shape.
+    """
+    # Extract the main AQI info
+    indexes = data.get("indexes", [])
+    if not indexes:
+        return {"error": "No AQI index data available", "raw": data}
+
+    main_index = indexes[0]
+    aqi_value = main_index.get("aqi", "N/A")
+    category = main_index.get("category", "Unknown")
+    dominant_pollutant = main_index.get("dominantPollutant", "Unknown")
+
+    # Extract pollutant concentrations
+    pollutants_data = data.get("pollutants", [])
+    pollutants = {}
+    for pollutant in pollutants_data:
+        code = pollutant.get("code", "").upper()
+        concentration = pollutant.get("concentration", {})
+        value = concentration.get("value")
+        units = concentration.get("units")
+        if code and value is not None:
+            pollutants[code] = {"value": value, "units": units}
+
+    return {
+        "location": f"{lat},{lon}",
+        "aqi": aqi_value,
+        "category": category,
+        "dominant_pollutant": dominant_pollutant,
+        "pollutants": pollutants,
+        "timestamp": data.get("dateTime", "N/A"),
+        "regionCode": data.get("regionCode", "N/A")
+    }
@@ -1,24 +1,133 @@
-import requests
-import json
+import time
+
+import httpx
 from datetime import datetime, timezone
-from core.config import GOOGLE_API_KEY
+from pydantic import ValidationError
+from core import http_client
+from core.config import (
+    GOOGLE_API_KEY,
+    GOOGLE_AQ_BASE_URL,
+    SINGLE_FLIGHT_ERROR_TTL,
+    FORECAST_PAGE_SIZE,
+    AQI_CACHE_MAX_ENTRIES,
+    UPSTREAM_FALLBACK_TTL,
+)
+from core.log import get_logger
+from core.metrics import timer
+from core.resilience import google_aq, UpstreamUnavailable
+from core.single_flight import SingleFlight
+from core.ttl_cache import TTLCache
+from models.google_aq_model import decode_forecast_page
+
+BASE_URL = f"{GOOGLE_AQ_BASE_URL}/forecast:lookup"
+
+logger = get_logger(__name__)
 
-BASE_URL = "https://airquality.googleapis.com/v1/forecast:lookup"
+_flights = SingleFlight(error_ttl=SINGLE_FLIGHT_ERROR_TTL)
+# Last good answer per request, served while upstream is failing.
+_last_good = TTLCache(AQI_CACHE_MAX_ENTRIES, UPSTREAM_FALLBACK_TTL)
 
-def fetch_aqi_forecast(lat: float, lon: float, start_time: str, end_time: str):
+
+async def fetch_aqi_forecast(lat: float, lon: float, start_time: str, end_time: str):
     """
     Fetches the AQI forecast series between start_time and end_time for given coordinates.
     This uses the Google Air Quality API forecast:lookup endpoint.
+    Concurrent calls for the same point and window share one upstream request.
+    If upstream fails, the last good answer for the same request is returned
+    with "stale": true.
+    """
+    key = (round(lat, 5), round(lon, 5), start_time, end_time)
+    result = await _flights.do(key, lambda: _lookup_forecast(lat, lon, start_time, end_time))
+    return _with_fallback(key, result)
+
+
+def _with_fallback(key, result: dict):
+    """
+    Remembers successful results; swaps a failure for the last good result
+    of the same request while one is held.
     """
+    if "error" not in result:
+        _last_good.set(key, result)
+        return result
+
+    fallback = _last_good.get(key)
+    if fallback is None:
+        return result
+    value, stored_at = fallback
+    return {**value, "stale": True, "stale_age": round(time.time() - stored_at, 1), "upstream_error": result["error"]}
+
 
+async def _lookup_forecast(lat: float, lon: float, start_time: str, end_time: str):
     if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_API_KEY":
         return {"error": "Missing or invalid Google API key in .env"}
 
-    print("🌍 Fetching Air Quality Forecast Series:")
-    print(f"   → Latitude: {lat}")
-    print(f"   → Longitude: {lon}")
-    print(f"   → Start Time: {start_time}")
-    print(f"   → End Time: {end_time}")
+    logger.debug("Fetching forecast series", extra={"fields": {"lat": lat, "lon": lon, "start": start_time, "end": end_time}})
+
+    meta = {}
+    parsed_results = [point async for point in iter_forecast_points(lat, lon, start_time, end_time, meta)]
+
+    if "error" in meta:
+        return {key: meta[key] for key in ("error", "details", "reason") if key in meta}
+
+    if not parsed_results:
+        logger.info("No forecast data returned")
+        return {"status": "empty", "message": "No forecast data returned", "raw": meta.get("raw")}
+
+    logger.debug("Retrieved forecast points", extra={"fields": {"count": len(parsed_results)}})
+    return {
+        "status": "ok",
+        "lat": lat,
+        "lon": lon,
+        "start_time": start_time,
+        "end_time": end_time,
+        "count": len(parsed_results),
+        "forecast_series": parsed_results,
+        "regionCode": meta.get("regionCode")
+    }
+
+
+def parse_forecast_point(f: dict):
+    """
+    Flattens one upstream hourly forecast into our point shape.
+    """
+    # Extract AQI index data (usually under "indexes")
+    aqi_info = None
+    for idx in f.get("indexes", []):
+        if idx.get("code") == "uaqi":
+            aqi_info = idx
+            break
+
+    pollutants = [
+        {
+            "code": p.get("code"),
+            "displayName": p.get("displayName"),
+            "value": p.get("concentration", {}).get("value"),
+            "units": p.get("concentration", {}).get("units")
+        }
+        for p in f.get("pollutants", [])
+    ]
+
+    return {
+        "timestamp": f.get("dateTime"),
+        "aqi": aqi_info.get("aqi") if aqi_info else None,
+        "category": aqi_info.get("category") if aqi_info else None,
+        "dominant_pollutant": aqi_info.get("dominantPollutant") if aqi_info else None,
+        "pollutants": pollutants
+    }
+
+
+async def iter_forecast_pages(lat: float, lon: float, start_time: str, end_time: str, meta: dict = None):
+    """
+    Yields the decoded `forecasts` list of each page, following
+    nextPageToken, so only one upstream page is held in memory at a time.
+    `meta` is filled with regionCode and count, or error/details on failure.
+    """
+    meta = {} if meta is None else meta
+    meta["count"] = 0
+
+    if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_API_KEY":
+        meta["error"] = "Missing or invalid Google API key in .env"
+        return
 
     # ✅ API URL and Headers
     url = f"{BASE_URL}?key={GOOGLE_API_KEY}"
@@ -30,6 +139,8 @@ def fetch_aqi_forecast(lat: float, lon: float, start_time: str, end_time: str):
     # ✅ Request payload (same structure as your standalone test script)
     payload = {
         "universalAqi": True,
+        # Without it Google omits pollutants, leaving only the AQI.
+        "extraComputations": ["POLLUTANT_CONCENTRATION"],
         "location": {
             "latitude": lat,
             "longitude": lon
@@ -38,71 +149,91 @@ def fetch_aqi_forecast(lat: float, lon: float, start_time: str, end_time: str):
             "startTime": start_time,  # RFC 3339 format
             "endTime": end_time
         },
-        "languageCode": "en"
+        "languageCode": "en",
+        "pageSize": FORECAST_PAGE_SIZE
     }
 
-    try:
-        print("--- Sending Forecast Request ---")
-        response = requests.post(url, headers=headers, json=payload)
+    while True:
+        try:
+            response = await google_aq.call("forecast", lambda: http_client.post(url, headers=headers, json=payload))
+        except UpstreamUnavailable as e:
+            logger.warning("Forecast request not sent: %s", e)
+            meta["error"] = f"Upstream unavailable: {e}"
+            meta["reason"] = e.reason
+            return
+        except httpx.HTTPError as e:
+            logger.error("Network error during forecast request: %s", e)
+            meta["error"] = str(e)
+            return
 
         if response.status_code != 200:
-            print(f"❌ Google API Error {response.status_code}: {response.text}")
-            return {"error": f"Google API error {response.status_code}", "details": response.text}
+            logger.error("Google API error", extra={"fields": {"status": response.status_code, "body": response.text[:500]}})
+            meta["error"] = f"Google API error {response.status_code}"
+            meta["details"] = response.text
+            return
 
-        data = response.json()
+        try:
+            with timer("parse"):
+                data = decode_forecast_page(response.content)
+        except ValidationError as e:
+            logger.error("Malformed forecast page: %s", e)
+            meta["error"] = "Malformed upstream response"
+            meta["details"] = str(e)
+            return
+        meta.setdefault("regionCode", data.get("regionCode"))
         forecasts = data.get("forecasts", [])
-        if not forecasts:
-            print("⚠️ No forecast data returned.")
-            return {"status": "empty", "message": "No forecast data returned", "raw": data}
-
-        print(f"✅ Retrieved {len(forecasts)} forecast points.")
-        parsed_results = []
-
-        for f in forecasts:
-            # Extract AQI index data (usually under "indexes")
-            aqi_info = None
-            for idx in f.get("indexes", []):
-                if idx.get("code") == "uaqi":
-                    aqi_info = idx
-                    break
-
-            pollutants = [
-                {
-                    "code": p.get("code"),
-                    "displayName": p.get("displayName"),
-                    "value": p.get("concentration", {}).get("value"),
-                    "units": p.get("concentration", {}).get("units")
-                }
-                for p in f.get("pollutants", [])
-            ]
-
-            parsed_results.append({
-                "timestamp": f.get("dateTime"),
-                "aqi": aqi_info.get("aqi") if aqi_info else None,
-                "category": aqi_info.get("category") if aqi_info else None,
-                "dominant_pollutant": aqi_info.get("dominantPollutant") if aqi_info else None,
-                "pollutants": pollutants
-            })
-
-        result = {
-            "status": "ok",
-            "lat": lat,
-            "lon": lon,
-            "start_time": start_time,
-            "end_time": end_time,
-            "count": len(parsed_results),
-            "forecast_series": parsed_results,
-            "regionCode": data.get("regionCode")
-        }
+        if not forecasts and meta["count"] == 0:
+            meta["raw"] = data
+
+        meta["count"] += len(forecasts)
+        if forecasts:
+            yield forecasts
+
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return
+        payload["pageToken"] = page_token
+
+
+async def iter_forecast_points(lat: float, lon: float, start_time: str, end_time: str, meta: dict = None):
+    """
+    Yields parsed forecast points as upstream pages arrive.
+    """
+    async for forecasts in iter_forecast_pages(lat, lon, start_time, end_time, meta):
+        with timer("parse"):
+            points = [parse_forecast_point(f) for f in forecasts]
+        for point in points:
+            yield point
+
+
+async def fetch_aqi_forecast_series(lat: float, lon: float, start_time: str, end_time: str):
+    """
+    Same lookup as fetch_aqi_forecast, decoded straight into a columnar
+    ForecastSeries. Returns {"series", "regionCode", "count"} or an error dict.
+    """
+    key = (round(lat, 5), round(lon, 5), start_time, end_time, "columnar")
+    result = await _flights.do(
+        key,
+        lambda: _lookup_forecast_series(lat, lon, start_time, end_time),
+    )
+    return _with_fallback(key, result)
+
+
+async def _lookup_forecast_series(lat: float, lon: float, start_time: str, end_time: str):
+    # NumPy-backed; imported on first use so the API module loads without it.
+    from models.forecast_series import ForecastSeriesBuilder
+
+    meta = {}
+    builder = ForecastSeriesBuilder()
+    async for forecasts in iter_forecast_pages(lat, lon, start_time, end_time, meta):
+        with timer("parse"):
+            builder.extend(forecasts)
+
+    if "error" in meta:
+        return {key: meta[key] for key in ("error", "details", "reason") if key in meta}
+    return {"series": builder.build(), "regionCode": meta.get("regionCode"), "count": meta["count"]}
 
-        print("--- Forecast Data Received ---")
-        print(json.dumps(result, indent=2))
-        return result
 
-    except requests.exceptions.RequestException as e:
-        print(f"🔥 Network error during forecast request: {e}")
-        return {"error": str(e)}
-    
 # def fetch_aqi_forecast(lat: float, lon: float, target_time: str):
 #     """
 #     Fetch AQI forecast for a given lat/lon and UTC time using Google Air Quality API.
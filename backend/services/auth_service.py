@@ -1,22 +1,162 @@
-import firebase_admin
-from firebase_admin import auth
+import asyncio
+import hashlib
+import re
+import threading
+import time
+
+from core import http_client
+from core.config import (
+    FIREBASE_PROJECT_ID,
+    TOKEN_CACHE_MAX_ENTRIES,
+    TOKEN_CACHE_TTL,
+    TOKEN_CERT_REFRESH_INTERVAL,
+    TOKEN_REVOCATION_CHECK_INTERVAL,
+)
+from core.log import get_logger
+from core.metrics import timer
+from core.ttl_cache import TTLCache
+
+# Public keys Firebase uses to sign ID tokens.
+CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+# verify_token runs in the threadpool, so the cache is guarded by a lock.
+_cache = TTLCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL)
+_lock = threading.Lock()
+_certs = {"keys": None, "expires_at": 0.0}
+_refresher = None
+logger = get_logger(__name__)
+
 
 def verify_token(id_token: str):
     """
     Verify Firebase ID token from frontend.
-    Returns the user's UID if valid.
+    Returns the user's UID if valid. Verified tokens are cached by hash until
+    their `exp` claim, so repeat calls skip signature verification.
     """
+    with timer("auth"):
+        return _verify(id_token)
+
+
+def _verify(id_token: str):
+    # The Admin SDK is imported on first use to keep app import cheap.
+    from firebase_admin import auth
+
+    key = hashlib.sha256(id_token.encode()).hexdigest()
+    now = time.time()
+
+    with _lock:
+        entry = _cache.get(key)
+    check_revoked = False
+    if entry is not None:
+        cached, _ = entry
+        if TOKEN_REVOCATION_CHECK_INTERVAL <= 0 or now - cached["checked_at"] < TOKEN_REVOCATION_CHECK_INTERVAL:
+            return cached["uid"]
+        check_revoked = True
+
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = _decode(id_token, check_revoked)
         uid = decoded_token.get("uid")
-        print(f"✅ Token verified for UID: {uid}")
+        ttl = min(TOKEN_CACHE_TTL, decoded_token.get("exp", 0) - now)
+        if uid and ttl > 0:
+            with _lock:
+                _cache.set(key, {"uid": uid, "checked_at": now}, ttl=ttl)
         return uid
     except auth.InvalidIdTokenError:
-        print("❌ Invalid ID token (malformed or expired)")
+        logger.info("Invalid ID token (malformed or expired)")
     except auth.ExpiredIdTokenError:
-        print("❌ Token expired")
+        logger.info("Token expired")
     except auth.RevokedIdTokenError:
-        print("❌ Token revoked")
+        logger.info("Token revoked")
     except Exception as e:
-        print(f"❌ General token verification error: {e}")
+        logger.warning("Token verification error: %s", e)
+
+    with _lock:
+        _cache.pop(key)
     return None
+
+
+def _project_id():
+    if FIREBASE_PROJECT_ID:
+        return FIREBASE_PROJECT_ID
+    import firebase_admin
+
+    try:
+        return firebase_admin.get_app().project_id
+    except ValueError:
+        return None
+
+
+def _decode(id_token: str, check_revoked: bool):
+    """
+    Verifies locally against the pre-fetched signing certificates, falling
+    back to the Admin SDK when they are unavailable or a revocation check
+    is due.
+    """
+    from firebase_admin import auth
+    from google.auth import jwt
+
+    certs = _certs["keys"] if _certs["expires_at"] > time.time() else None
+    project_id = _project_id()
+    if check_revoked or not certs or not project_id:
+        return auth.verify_id_token(id_token, check_revoked=check_revoked)
+
+    try:
+        claims = jwt.decode(id_token, certs=certs, audience=project_id)
+    except ValueError as e:
+        raise auth.InvalidIdTokenError(str(e))
+
+    if claims.get("iss") != f"https://securetoken.google.com/{project_id}" or not claims.get("sub"):
+        raise auth.InvalidIdTokenError("Token has an unexpected issuer or subject.")
+    claims["uid"] = claims["sub"]
+    return claims
+
+
+def _max_age(cache_control: str):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else TOKEN_CERT_REFRESH_INTERVAL
+
+
+async def refresh_signing_certs():
+    """
+    Fetches Google's token signing certificates and returns how long they
+    may be cached for.
+    """
+    response = await http_client.get(CERTS_URL)
+    response.raise_for_status()
+    max_age = _max_age(response.headers.get("cache-control"))
+    _certs["keys"] = response.json()
+    _certs["expires_at"] = time.time() + max_age
+    return max_age
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            max_age = await refresh_signing_certs()
+            delay = min(max_age / 2, TOKEN_CERT_REFRESH_INTERVAL)
+        except Exception as e:
+            logger.warning("Could not refresh token signing certificates: %s", e)
+            delay = 60
+        await asyncio.sleep(max(delay, 60))
+
+
+async def start_token_verifier():
+    global _refresher
+    if _refresher is None:
+        _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_token_verifier():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
+
+
+def token_cache_stats():
+    with _lock:
+        return _cache.stats()
@@ -0,0 +1,55 @@
+# backend/services/batch_service.py
+import asyncio
+
+from core.config import AQI_CACHE_GEOHASH_PRECISION, BATCH_CONCURRENCY
+from core.geo import geohash_encode
+from services.aqi_cache import get_current_aqi_cached, with_location
+from services.aqi_forecast_fetcher import fetch_aqi_forecast
+
+
+def _is_error(result):
+    return not result or "error" in result
+
+
+async def fetch_batch(points, concurrency: int = BATCH_CONCURRENCY):
+    """
+    Resolves a list of BatchPoints concurrently. Points that share a cell and
+    forecast window are fetched once. Results keep the input order and each
+    item carries its own status, so one failure doesn't sink the batch.
+    """
+    groups = {}
+    for index, point in enumerate(points):
+        cell = geohash_encode(point.lat, point.lon, AQI_CACHE_GEOHASH_PRECISION)
+        groups.setdefault((cell, point.start_time, point.end_time), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(key, point):
+        async with semaphore:
+            _, start_time, end_time = key
+            if start_time and end_time:
+                return await fetch_aqi_forecast(point.lat, point.lon, start_time, end_time)
+            return await get_current_aqi_cached(point.lat, point.lon)
+
+    keys = list(groups)
+    outcomes = await asyncio.gather(
+        *(resolve(key, points[groups[key][0]]) for key in keys),
+        return_exceptions=True,
+    )
+
+    results = [None] * len(points)
+    for key, outcome in zip(keys, outcomes):
+        for index in groups[key]:
+            point = points[index]
+            item = {"index": index, "lat": point.lat, "lon": point.lon, "cell": key[0]}
+            if isinstance(outcome, Exception):
+                item.update({"status": "error", "error": f"Lookup failed: {outcome}"})
+            elif _is_error(outcome):
+                item.update({"status": "error", "error": (outcome or {}).get("error", "No AQI data found")})
+            elif "location" in outcome:
+                item.update({"status": "ok", "data": with_location(outcome, point.lat, point.lon)})
+            else:
+                item.update({"status": "ok", "data": outcome})
+            results[index] = item
+
+    return results
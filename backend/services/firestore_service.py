@@ -1,43 +1,62 @@
 # backend/services/firestore_service.py
-from core.firebase_init import db
 from datetime import datetime
 
-from google.cloud import firestore
+from core.container import container
+from core.log import get_logger
 
-db = firestore.Client()
+logger = get_logger(__name__)
 
 def save_aqi_data(data: dict):
     """
     Save AQI data to Firestore.
     Stores data under collection 'aqi_data', document ID = timestamp.
     """
+    db = container.db
     if not db:
-        print("Firestore not available — skipping save.")
+        logger.warning("Firestore not available, skipping save")
         return
     
     try:
         timestamp = datetime.utcnow().isoformat()
         doc_ref = db.collection("aqi_data").document(timestamp)
         doc_ref.set(data)
-        print(f"AQI data saved to Firestore: {timestamp}")
+        logger.debug("AQI data saved to Firestore", extra={"fields": {"document": timestamp}})
     except Exception as e:
-        print(f"Error saving AQI data: {e}")
+        logger.error("Error saving AQI data: %s", e)
 
 def get_user_aqi_history(user_id: str, limit: int = 10):
     """
-    Fetches the user's recent AQI readings (latest first)
+    Fetches the user's recent AQI readings (latest first) from the
+    configured history backend.
     """
     try:
-        records_ref = (
-            db.collection("users")
-            .document(user_id)
-            .collection("aqi_records")
-            .order_by("timestamp", direction=firestore.Query.DESCENDING)
-            .limit(limit)
-        )
-        docs = records_ref.stream()
-        history = [doc.to_dict() for doc in docs]
-        return history
+        return container.history_repository.get_history(user_id, limit)
     except Exception as e:
-        print(f"Error fetching AQI history: {e}")
-        return []
\ No newline at end of file
+        logger.error("Error fetching AQI history: %s", e)
+        return []
+
+
+def query_user_aqi_history(user_id: str, start: str = None, end: str = None, resolution: str = "raw", limit: int = None):
+    """
+    Range query over the user's history, raw or rolled up hourly/daily.
+    """
+    try:
+        return container.history_repository.query_range(user_id, start, end, resolution, limit)
+    except Exception as e:
+        logger.error("Error querying AQI history: %s", e)
+        return []
+
+def page_user_aqi_history(user_id: str, start: str = None, end: str = None, cursor: str = None,
+                          limit: int = 10, fields: list = None, resolution: str = "raw"):
+    """
+    One cursor-paginated page of the user's history (newest first), with
+    optional field projection or hourly/daily aggregation.
+    Raises ValueError for a bad cursor or unknown field.
+    """
+    try:
+        return container.history_repository.query_page(user_id, start, end, cursor, limit, fields, resolution)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error("Error paging AQI history: %s", e)
+        return {"records": [], "next_cursor": None}
@@ -0,0 +1,46 @@
+# backend/services/forecast_stream.py
+import json
+
+from services.aqi_forecast_fetcher import iter_forecast_points
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _summary(meta: dict):
+    if "error" in meta:
+        return {"status": "error", "error": meta["error"], "details": meta.get("details"), "count": meta["count"]}
+    status = "ok" if meta["count"] else "empty"
+    return {"status": status, "count": meta["count"], "regionCode": meta.get("regionCode")}
+
+
+async def stream_forecast_ndjson(lat: float, lon: float, start_time: str, end_time: str):
+    """
+    One JSON point per line as pages arrive, then a summary line carrying
+    status, count and regionCode (or the upstream error).
+    """
+    meta = {}
+    async for point in iter_forecast_points(lat, lon, start_time, end_time, meta):
+        yield _dumps(point) + "\n"
+    yield _dumps(_summary(meta)) + "\n"
+
+
+async def stream_forecast_json(lat: float, lon: float, start_time: str, end_time: str):
+    """
+    The same document shape as fetch_aqi_forecast, written incrementally as a
+    chunked JSON object whose forecast_series array grows page by page.
+    """
+    meta = {}
+    head = {"lat": lat, "lon": lon, "start_time": start_time, "end_time": end_time}
+    yield _dumps(head)[:-1] + ',"forecast_series":['
+
+    first = True
+    async for point in iter_forecast_points(lat, lon, start_time, end_time, meta):
+        yield ("" if first else ",") + _dumps(point)
+        first = False
+
+    yield "]," + _dumps(_summary(meta))[1:]
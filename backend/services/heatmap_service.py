@@ -0,0 +1,126 @@
+# backend/services/heatmap_service.py
+import math
+import time
+
+import numpy as np
+
+from core.config import (
+    INGESTION_SNAPSHOT_MAX_AGE,
+    HEATMAP_MAX_CELLS,
+    HEATMAP_IDW_POWER,
+    HEATMAP_NEIGHBOURS,
+    HEATMAP_MAX_DISTANCE_KM,
+)
+from models.spatial_model import SpatialIndex, idw_grid, KM_PER_DEG_LAT, KM_PER_DEG_LON
+from services.snapshot_store import snapshots
+
+HOUR = 3600
+_built = {}
+
+
+def current_index(hours_ahead: int = 0):
+    """
+    Spatial index over the fresh snapshot cells, rebuilt only when the
+    snapshot store has changed or entries may have aged out. With
+    hours_ahead > 0 the values are the cells' forecast AQI for that hour.
+    Returns (index, cells) where cells[i] is the geohash behind point i.
+    """
+    now = time.time()
+    target = (int(now) // HOUR + hours_ahead) * HOUR
+    built = _built.get(hours_ahead)
+    stale = built is None or now - built["at"] > INGESTION_SNAPSHOT_MAX_AGE / 10
+    if stale or built["version"] != snapshots.version or built["target"] != target:
+        # Column arrays: views into the shared segment in serve.py workers.
+        columns = snapshots.arrays()
+        fresh = now - columns["fetched_at"] <= INGESTION_SNAPSHOT_MAX_AGE
+        values = columns["aqi"]
+        if hours_ahead:
+            forecast = columns["forecast"]
+            slots = (target - columns["forecast_start"]) // HOUR
+            inside = (slots >= 0) & (slots < forecast.shape[1])
+            values = np.full(len(slots), np.nan)
+            rows = np.flatnonzero(inside)
+            values[rows] = forecast[rows, slots[rows].astype(np.intp)]
+            fresh &= ~np.isnan(values)
+        built = {
+            "index": SpatialIndex(columns["lat"][fresh], columns["lon"][fresh], values[fresh]),
+            "cells": [cell.decode() for cell in columns["cell"][fresh]],
+            "version": snapshots.version,
+            "target": target,
+            "at": now,
+        }
+        _built[hours_ahead] = built
+    return built["index"], built["cells"]
+
+
+def nearby(lat: float, lon: float, k: int = 5, max_km: float = None):
+    """
+    The k sampled cells nearest a point with their latest conditions.
+    """
+    index, cells = current_index()
+    ids, distances = index.nearest(lat, lon, k, max_km)
+    results = []
+    for i, d in zip(ids.tolist(), distances.tolist()):
+        snapshot = snapshots.get(cells[i])
+        if snapshot is None:
+            continue
+        results.append({
+            "cell": snapshot["cell"],
+            "lat": snapshot["lat"],
+            "lon": snapshot["lon"],
+            "distance_km": round(float(d), 3),
+            "aqi": snapshot["data"].get("aqi"),
+            "category": snapshot["data"].get("category"),
+            "dominant_pollutant": snapshot["data"].get("dominant_pollutant"),
+            "age": round(time.time() - snapshot["fetched_at"], 1),
+        })
+    return results
+
+
+def heatmap(min_lat: float, min_lon: float, max_lat: float, max_lon: float, resolution_km: float, hours_ahead: int = 0):
+    """
+    Interpolated AQI raster over a bounding box, built entirely from cached
+    snapshots (or, hours_ahead hours out, from the cells' cached forecasts).
+    Rows run south to north, columns west to east; cells with no sample
+    within HEATMAP_MAX_DISTANCE_KM are null.
+    """
+    if min_lat >= max_lat or min_lon >= max_lon:
+        return {"error": "Bounding box must be min_lat,min_lon,max_lat,max_lon"}
+    if resolution_km <= 0:
+        return {"error": "Resolution must be positive"}
+
+    lat_step = resolution_km / KM_PER_DEG_LAT
+    lon_step = resolution_km / (math.cos(math.radians((min_lat + max_lat) / 2)) * KM_PER_DEG_LON)
+    rows = int((max_lat - min_lat) / lat_step) + 1
+    cols = int((max_lon - min_lon) / lon_step) + 1
+    if rows * cols > HEATMAP_MAX_CELLS:
+        return {"error": f"Raster of {rows}x{cols} exceeds {HEATMAP_MAX_CELLS} cells, use a coarser resolution"}
+
+    index, _ = current_index(hours_ahead)
+    # Samples just outside the box still shape the edges.
+    pad_lat = HEATMAP_MAX_DISTANCE_KM / KM_PER_DEG_LAT
+    pad_lon = HEATMAP_MAX_DISTANCE_KM / (max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-6) * KM_PER_DEG_LON)
+    ids = index.within(min_lat - pad_lat, min_lon - pad_lon, max_lat + pad_lat, max_lon + pad_lon)
+
+    lats = min_lat + np.arange(rows) * lat_step
+    lons = min_lon + np.arange(cols) * lon_step
+    grid = idw_grid(
+        index.lats[ids], index.lons[ids], index.values[ids], lats, lons,
+        power=HEATMAP_IDW_POWER,
+        neighbours=HEATMAP_NEIGHBOURS,
+        max_km=HEATMAP_MAX_DISTANCE_KM,
+    )
+    grid = np.round(grid, 1)
+
+    return {
+        "bbox": [min_lat, min_lon, max_lat, max_lon],
+        "resolution_km": resolution_km,
+        "hours_ahead": hours_ahead,
+        "rows": rows,
+        "cols": cols,
+        "lats": np.round(lats, 6).tolist(),
+        "lons": np.round(lons, 6).tolist(),
+        "aqi": [[None if math.isnan(v) else v for v in row] for row in grid.tolist()],
+        "samples": int(len(ids)),
+        "snapshot_version": snapshots.version,
+    }
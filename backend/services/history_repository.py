@@ -0,0 +1,523 @@
+# backend/services/history_repository.py
+import asyncio
+import base64
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from google.cloud import firestore
+
+from core.config import (
+    AQI_CACHE_GEOHASH_PRECISION,
+    HISTORY_BACKEND,
+    HISTORY_SQLITE_PATH,
+    HISTORY_RAW_RETENTION_DAYS,
+    HISTORY_HOURLY_RETENTION_DAYS,
+    HISTORY_DAILY_RETENTION_DAYS,
+    HISTORY_FIRESTORE_RETENTION_DAYS,
+    HISTORY_RETENTION_INTERVAL,
+)
+from core.geo import geohash_encode
+from core.log import get_logger
+from core.timeutil import to_epoch, to_iso
+
+HISTORY_COLLECTION = "aqi_history"
+RESOLUTIONS = {"hourly": 3600, "daily": 86400}
+DAY = 86400
+FIRESTORE_MAX_BATCH = 500
+RETENTION_LEASE_DOCUMENT = "_system/history_retention_leader"
+RECORD_FIELDS = ("aqi", "category", "dominant_pollutant", "lat", "lon", "timestamp")
+BUCKET_FIELDS = ("count", "mean", "min", "max")
+
+logger = get_logger(__name__)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_cursor(position: dict):
+    """
+    Opaque, URL-safe page cursor.
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+NUMBER = (int, float)
+# Cursor shapes per backend and resolution; anything else is rejected.
+FIRESTORE_RAW_CURSOR = {"ts": str}
+SQLITE_RAW_CURSOR = {"ts": NUMBER, "id": int}
+BUCKET_CURSOR = {"bucket": NUMBER}
+
+
+def decode_cursor(cursor: str, shape: dict):
+    """
+    Inverse of encode_cursor for a position of the given shape (key ->
+    type); raises ValueError on anything else, e.g. a cursor issued by the
+    other backend or for another resolution.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict) or set(position) != set(shape):
+        raise ValueError("Invalid cursor")
+    for key, kind in shape.items():
+        value = position[key]
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError("Invalid cursor")
+    return position
+
+
+def _projection(fields, allowed: tuple, always: str):
+    """
+    Validates requested fields; the ordering key is always included so
+    the page can be resumed.
+    """
+    if not fields:
+        return None
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}, expected any of {list(allowed)}")
+    return [always] + [f for f in allowed if f in fields and f != always]
+
+
+def _project(record: dict, fields):
+    if fields is None:
+        return record
+    return {f: record.get(f) for f in fields}
+
+
+def _aggregate(rows, resolution: str):
+    """
+    Buckets (epoch, aqi) pairs into {bucket, count, mean, min, max} rows.
+    """
+    width = RESOLUTIONS[resolution]
+    buckets = {}
+    for ts, aqi in rows:
+        if aqi is None:
+            continue
+        bucket = int(ts // width * width)
+        count, total, low, high = buckets.get(bucket, (0, 0.0, aqi, aqi))
+        buckets[bucket] = (count + 1, total + aqi, min(low, aqi), max(high, aqi))
+    return [
+        {"bucket": to_iso(bucket), "count": count, "mean": round(total / count, 2), "min": low, "max": high}
+        for bucket, (count, total, low, high) in sorted(buckets.items())
+    ]
+
+
+class HistoryRepository:
+    """
+    Storage interface for per-user AQI history. Entries are the dicts built
+    by save_aqi_data (aqi, category, dominant_pollutant, lat, lon, timestamp).
+    """
+
+    def write_batch(self, items: list):
+        """
+        Persists a list of (uid, entry) pairs.
+        """
+        raise NotImplementedError
+
+    def get_history(self, uid: str, limit: int = 10):
+        """
+        Latest `limit` raw entries, newest first.
+        """
+        raise NotImplementedError
+
+    def query_range(self, uid: str, start: str = None, end: str = None, resolution: str = "raw", limit: int = None):
+        """
+        Entries (raw) or {bucket, count, mean, min, max} rows (hourly/daily)
+        between two ISO timestamps, oldest first, answered with one read.
+        """
+        raise NotImplementedError
+
+    def query_page(
+        self,
+        uid: str,
+        start: str = None,
+        end: str = None,
+        cursor: str = None,
+        limit: int = 10,
+        fields: list = None,
+        resolution: str = "raw",
+    ):
+        """
+        One page of history, newest first: {"records", "next_cursor"}.
+
+        Raw pages hold at most `limit` entries restricted to `fields`; rolled
+        up pages (hourly/daily) hold bucket rows for at most `limit` buckets.
+        Pass next_cursor back to continue; it is None on the last page.
+        """
+        raise NotImplementedError
+
+    def apply_retention(self):
+        """
+        Drops data older than the configured retention per resolution.
+        """
+        raise NotImplementedError
+
+
+class FirestoreHistoryRepository(HistoryRepository):
+    """
+    users/{uid}/aqi_history subcollections. Rollups are computed from a
+    projected range query since Firestore has no server-side grouping.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._holder = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _collection(self, uid: str):
+        return self.db.collection("users").document(uid).collection(HISTORY_COLLECTION)
+
+    def write_batch(self, items: list):
+        for start in range(0, len(items), FIRESTORE_MAX_BATCH):
+            batch = self.db.batch()
+            for uid, entry in items[start:start + FIRESTORE_MAX_BATCH]:
+                batch.set(self._collection(uid).document(), entry)
+            batch.commit()
+
+    def get_history(self, uid: str, limit: int = 10):
+        query = (
+            self._collection(uid)
+            .order_by("timestamp", direction=firestore.Query.DESCENDING)
+            .limit(limit)
+        )
+        return [doc.to_dict() for doc in query.stream()]
+
+    def _range_query(self, uid: str, start: str = None, end: str = None):
+        query = self._collection(uid)
+        if start:
+            query = query.where(filter=firestore.FieldFilter("timestamp", ">=", start))
+        if end:
+            query = query.where(filter=firestore.FieldFilter("timestamp", "<", end))
+        return query.order_by("timestamp")
+
+    def query_range(self, uid: str, start: str = None, end: str = None, resolution: str = "raw", limit: int = None):
+        query = self._range_query(uid, start, end)
+        if resolution == "raw":
+            if limit:
+                query = query.limit(limit)
+            return [doc.to_dict() for doc in query.stream()]
+
+        docs = query.select(["aqi", "timestamp"]).stream()
+        rows = []
+        for doc in docs:
+            record = doc.to_dict()
+            rows.append((to_epoch(record["timestamp"]), _to_float(record.get("aqi"))))
+        buckets = _aggregate(rows, resolution)
+        return buckets[:limit] if limit else buckets
+
+    def query_page(self, uid, start=None, end=None, cursor=None, limit=10, fields=None, resolution="raw"):
+        shape = FIRESTORE_RAW_CURSOR if resolution == "raw" else BUCKET_CURSOR
+        position = decode_cursor(cursor, shape) if cursor else None
+        if resolution != "raw":
+            return self._bucket_page(uid, start, end, position, limit, fields, resolution)
+
+        projection = _projection(fields, RECORD_FIELDS, "timestamp")
+        query = self._collection(uid)
+        if start:
+            query = query.where(filter=firestore.FieldFilter("timestamp", ">=", start))
+        if end:
+            query = query.where(filter=firestore.FieldFilter("timestamp", "<", end))
+        query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+        if projection:
+            query = query.select(projection)
+        if position:
+            query = query.start_after({"timestamp": position["ts"]})
+
+        # One extra document tells us whether another page exists.
+        records = [_project(doc.to_dict(), projection) for doc in query.limit(limit + 1).stream()]
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_cursor({"ts": records[-1]["timestamp"]})
+        return {"records": records, "next_cursor": next_cursor}
+
+    def _bucket_page(self, uid, start, end, position, limit, fields, resolution):
+        # No server-side grouping in Firestore: read only the projected
+        # (aqi, timestamp) pairs of the time window covering `limit` buckets.
+        projection = _projection(fields, BUCKET_FIELDS, "bucket")
+        width = RESOLUTIONS[resolution]
+        low = to_epoch(start) if start else None
+        high = to_epoch(end) if end else time.time()
+        upper = position["bucket"] if position else math.ceil(high / width) * width
+        window = upper - limit * width
+        lower = max(window, low) if low is not None else window
+
+        query = (
+            self._range_query(uid, to_iso(lower), to_iso(min(upper, high)))
+            .select(["aqi", "timestamp"])
+        )
+        rows = []
+        for doc in query.stream():
+            record = doc.to_dict()
+            rows.append((to_epoch(record["timestamp"]), _to_float(record.get("aqi"))))
+        buckets = [_project(b, projection) for b in reversed(_aggregate(rows, resolution))]
+
+        next_cursor = None
+        if low is None or window > low:
+            older = self._range_query(uid, to_iso(low) if low is not None else None, to_iso(window))
+            if list(older.select(["timestamp"]).limit(1).stream()):
+                next_cursor = encode_cursor({"bucket": window})
+        return {"records": buckets, "next_cursor": next_cursor}
+
+    def apply_retention(self):
+        # Firestore only holds raw entries, with no rollups to fall back on,
+        # so the sweep is opt-in and only one replica runs it per interval.
+        if HISTORY_FIRESTORE_RETENTION_DAYS <= 0 or not self._claim_retention_lease():
+            return 0
+        cutoff = to_iso(time.time() - HISTORY_FIRESTORE_RETENTION_DAYS * DAY)
+        query = (
+            self.db.collection_group(HISTORY_COLLECTION)
+            .where(filter=firestore.FieldFilter("timestamp", "<", cutoff))
+            .limit(FIRESTORE_MAX_BATCH)
+        )
+        deleted = 0
+        while True:
+            docs = list(query.stream())
+            if not docs:
+                return deleted
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            deleted += len(docs)
+
+    def _claim_retention_lease(self):
+        # Imported here: the ingestion module pulls in the upstream fetchers.
+        from services.ingestion import claim_lease
+
+        ref = self.db.document(RETENTION_LEASE_DOCUMENT)
+        return claim_lease(self.db.transaction(), ref, self._holder, HISTORY_RETENTION_INTERVAL)
+
+
+class SQLiteHistoryRepository(HistoryRepository):
+    """
+    Local time-series store. Raw readings are appended compactly (integer
+    epoch, REAL aqi, geohash cell) and folded into hourly and daily rollups
+    on write, so range and aggregate queries are a single indexed read.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS readings (
+            uid TEXT NOT NULL,
+            cell TEXT,
+            ts INTEGER NOT NULL,
+            aqi REAL,
+            category TEXT,
+            dominant_pollutant TEXT,
+            lat REAL,
+            lon REAL
+        );
+        CREATE INDEX IF NOT EXISTS readings_uid_ts ON readings (uid, ts);
+        CREATE INDEX IF NOT EXISTS readings_cell_ts ON readings (cell, ts);
+        CREATE TABLE IF NOT EXISTS rollups (
+            uid TEXT NOT NULL,
+            cell TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            total REAL NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            PRIMARY KEY (uid, resolution, bucket, cell)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str = HISTORY_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def write_batch(self, items: list):
+        readings = []
+        rollups = []
+        for uid, entry in items:
+            ts = to_epoch(entry["timestamp"])
+            aqi = _to_float(entry.get("aqi"))
+            lat, lon = _to_float(entry.get("lat")), _to_float(entry.get("lon"))
+            cell = geohash_encode(lat, lon, AQI_CACHE_GEOHASH_PRECISION) if lat is not None and lon is not None else ""
+            readings.append((uid, cell, ts, aqi, entry.get("category"), entry.get("dominant_pollutant"), lat, lon))
+            if aqi is not None:
+                for resolution, width in RESOLUTIONS.items():
+                    rollups.append((uid, cell, resolution, ts // width * width, aqi, aqi, aqi))
+
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO readings VALUES (?, ?, ?, ?, ?, ?, ?, ?)", readings)
+            self._conn.executemany(
+                """
+                INSERT INTO rollups (uid, cell, resolution, bucket, count, total, min, max)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT (uid, resolution, bucket, cell) DO UPDATE SET
+                    count = count + 1,
+                    total = total + excluded.total,
+                    min = MIN(min, excluded.min),
+                    max = MAX(max, excluded.max)
+                """,
+                rollups,
+            )
+
+    @staticmethod
+    def _entry(row, fields=RECORD_FIELDS):
+        return {f: to_iso(row["ts"]) if f == "timestamp" else row[f] for f in fields}
+
+    @staticmethod
+    def _bucket(row):
+        return {
+            "bucket": to_iso(row["bucket"]),
+            "count": row["count"],
+            "mean": round(row["total"] / row["count"], 2),
+            "min": row["min"],
+            "max": row["max"],
+        }
+
+    def get_history(self, uid: str, limit: int = 10):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM readings WHERE uid = ? ORDER BY ts DESC LIMIT ?", (uid, limit)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def query_range(self, uid: str, start: str = None, end: str = None, resolution: str = "raw", limit: int = None):
+        low = to_epoch(start) if start else 0
+        high = to_epoch(end) if end else 2 ** 62
+        limit = limit or -1
+
+        with self._lock:
+            if resolution == "raw":
+                rows = self._conn.execute(
+                    "SELECT * FROM readings WHERE uid = ? AND ts >= ? AND ts < ? ORDER BY ts LIMIT ?",
+                    (uid, low, high, limit),
+                ).fetchall()
+                return [self._entry(row) for row in rows]
+
+            width = RESOLUTIONS[resolution]
+            rows = self._conn.execute(
+                """
+                SELECT bucket, SUM(count) AS count, SUM(total) AS total, MIN(min) AS min, MAX(max) AS max
+                FROM rollups
+                WHERE uid = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+                GROUP BY bucket ORDER BY bucket LIMIT ?
+                """,
+                (uid, resolution, low // width * width, high, limit),
+            ).fetchall()
+        return [self._bucket(row) for row in rows]
+
+    def query_page(self, uid, start=None, end=None, cursor=None, limit=10, fields=None, resolution="raw"):
+        shape = SQLITE_RAW_CURSOR if resolution == "raw" else BUCKET_CURSOR
+        position = decode_cursor(cursor, shape) if cursor else None
+        low = to_epoch(start) if start else 0
+        high = to_epoch(end) if end else 2 ** 62
+
+        if resolution == "raw":
+            projection = _projection(fields, RECORD_FIELDS, "timestamp")
+            columns = ", ".join("ts" if f == "timestamp" else f for f in projection or RECORD_FIELDS)
+            # (ts, rowid) keeps the order total when readings share a second.
+            ts, rowid = (position["ts"], position["id"]) if position else (high, 0)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"""
+                    SELECT rowid, {columns} FROM readings
+                    WHERE uid = ? AND ts >= ? AND ts < ? AND (ts < ? OR (ts = ? AND rowid < ?))
+                    ORDER BY ts DESC, rowid DESC LIMIT ?
+                    """,
+                    (uid, low, high, ts, ts, rowid, limit + 1),
+                ).fetchall()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor({"ts": rows[-1]["ts"], "id": rows[-1]["rowid"]})
+            return {"records": [self._entry(row, projection or RECORD_FIELDS) for row in rows], "next_cursor": next_cursor}
+
+        projection = _projection(fields, BUCKET_FIELDS, "bucket")
+        width = RESOLUTIONS[resolution]
+        upper = position["bucket"] if position else high
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT bucket, SUM(count) AS count, SUM(total) AS total, MIN(min) AS min, MAX(max) AS max
+                FROM rollups
+                WHERE uid = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+                GROUP BY bucket ORDER BY bucket DESC LIMIT ?
+                """,
+                (uid, resolution, low // width * width, min(upper, high), limit + 1),
+            ).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({"bucket": rows[-1]["bucket"]})
+        return {"records": [_project(self._bucket(row), projection) for row in rows], "next_cursor": next_cursor}
+
+    def apply_retention(self):
+        now = time.time()
+        deleted = 0
+        with self._lock, self._conn:
+            if HISTORY_RAW_RETENTION_DAYS > 0:
+                deleted += self._conn.execute(
+                    "DELETE FROM readings WHERE ts < ?", (now - HISTORY_RAW_RETENTION_DAYS * DAY,)
+                ).rowcount
+            for resolution, days in (("hourly", HISTORY_HOURLY_RETENTION_DAYS), ("daily", HISTORY_DAILY_RETENTION_DAYS)):
+                if days > 0:
+                    deleted += self._conn.execute(
+                        "DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (resolution, now - days * DAY)
+                    ).rowcount
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_history_repository(db, backend: str = HISTORY_BACKEND):
+    if backend == "sqlite":
+        return SQLiteHistoryRepository()
+    if backend == "firestore":
+        return FirestoreHistoryRepository(db)
+    raise ValueError(f"Unknown HISTORY_BACKEND {backend!r}, expected 'firestore' or 'sqlite'")
+
+
+class RetentionTask:
+    """
+    Applies the repository's retention policy every HISTORY_RETENTION_INTERVAL.
+    """
+
+    def __init__(self, repository, interval: float = HISTORY_RETENTION_INTERVAL):
+        self.repository = repository
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self.repository.apply_retention)
+                if deleted:
+                    logger.info("History retention removed rows", extra={"fields": {"deleted": deleted}})
+            except Exception as e:
+                logger.warning("History retention failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
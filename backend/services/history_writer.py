@@ -0,0 +1,192 @@
+# backend/services/history_writer.py
+import asyncio
+
+from core.config import (
+    HISTORY_WRITER_MAX_QUEUE,
+    HISTORY_WRITER_BATCH_SIZE,
+    HISTORY_WRITER_FLUSH_INTERVAL,
+    HISTORY_WRITER_DROP_POLICY,
+    HISTORY_WRITER_PUT_TIMEOUT,
+    HISTORY_WRITER_DRAIN_TIMEOUT,
+)
+from core.log import get_logger
+from core.metrics import timer
+from services.history_repository import FirestoreHistoryRepository
+
+# Firestore rejects batched writes with more than 500 operations.
+FIRESTORE_MAX_BATCH = 500
+DROP_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+logger = get_logger(__name__)
+
+
+class HistoryWriter:
+    """
+    Write-behind pipeline for users/{uid}/aqi_history entries.
+    Requests enqueue entries; a background task commits them to Firestore in
+    batches once `batch_size` entries are waiting or `flush_interval` passes.
+    Whole documents at a fixed path (e.g. model state) can ride along via
+    put_document; only the latest write per path in a batch is kept.
+    `db` is any Firestore client (real, emulator or a local fake); history
+    entries go to `repository` (a HistoryRepository), defaulting to Firestore.
+    """
+
+    def __init__(
+        self,
+        db,
+        repository=None,
+        max_queue: int = HISTORY_WRITER_MAX_QUEUE,
+        batch_size: int = HISTORY_WRITER_BATCH_SIZE,
+        flush_interval: float = HISTORY_WRITER_FLUSH_INTERVAL,
+        drop_policy: str = HISTORY_WRITER_DROP_POLICY,
+        put_timeout: float = HISTORY_WRITER_PUT_TIMEOUT,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {drop_policy!r}, expected one of {DROP_POLICIES}")
+        self.db = db
+        self.repository = repository if repository is not None else FirestoreHistoryRepository(db)
+        self.max_queue = max_queue
+        self.batch_size = max(1, min(batch_size, FIRESTORE_MAX_BATCH))
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.put_timeout = put_timeout
+
+        self._queue = None
+        self._task = None
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = HISTORY_WRITER_DRAIN_TIMEOUT):
+        """
+        Stops accepting entries and flushes whatever is still queued.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("History writer drain timed out", extra={"fields": {"queued": self._queue.qsize()}})
+        self._task = None
+
+    async def put(self, uid: str, entry: dict):
+        """
+        Queues one history entry. Returns False if it was dropped.
+        """
+        return await self._put(("history", uid, entry))
+
+    async def put_document(self, path: str, data: dict):
+        """
+        Queues a full overwrite of the document at `path`.
+        """
+        return await self._put(("document", path, data))
+
+    async def _put(self, item):
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.drop_policy == "drop_newest":
+                self.dropped += 1
+                return False
+            if self.drop_policy == "drop_oldest":
+                self._queue.get_nowait()
+                self._queue.put_nowait(item)
+                self.dropped += 1
+            else:
+                # Backpressure: hold the caller briefly, then give up on the entry.
+                try:
+                    await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    return False
+
+        self.enqueued += 1
+        return True
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+            elif self._stopping:
+                return
+
+    async def _collect(self):
+        batch = []
+        if self._stopping:
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            return batch
+
+        try:
+            batch.append(await asyncio.wait_for(self._queue.get(), self.flush_interval))
+        except asyncio.TimeoutError:
+            return batch
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch):
+        try:
+            with timer("firestore_write"):
+                await asyncio.to_thread(self._commit, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Error committing AQI history batch: %s", e, extra={"fields": {"entries": len(batch)}})
+
+    def _commit(self, batch):
+        history = []
+        documents = {}
+        for kind, key, data in batch:
+            if kind == "history":
+                history.append((key, data))
+            else:
+                documents[key] = data
+
+        if history:
+            self.repository.write_batch(history)
+        if documents and self.db is not None:
+            write = self.db.batch()
+            for path, data in documents.items():
+                write.set(self.db.document(path), data)
+            write.commit()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "drop_policy": self.drop_policy,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
@@ -0,0 +1,253 @@
+# backend/services/ingestion.py
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+
+import numpy as np
+from google.cloud import firestore
+
+from core.config import (
+    INGESTION_BBOX,
+    INGESTION_PRECISION,
+    INGESTION_INTERVAL,
+    INGESTION_JITTER,
+    INGESTION_CONCURRENCY,
+    INGESTION_RATE_PER_SECOND,
+    INGESTION_LEASE_TTL,
+    INGESTION_FORECAST_HOURS,
+)
+from core.geo import geohash_cells_in_bbox, geohash_center, parse_bbox
+from core.log import get_logger
+from core.timeutil import to_rfc3339
+from services.aqi_fetcher import get_current_aqi
+from services.aqi_forecast_fetcher import fetch_aqi_forecast_series
+from services.snapshot_store import snapshots, SNAPSHOT_COLLECTION
+
+LEASE_DOCUMENT = "_system/ingestion_leader"
+FIRESTORE_MAX_BATCH = 500
+HOUR = 3600
+
+logger = get_logger(__name__)
+
+
+@firestore.transactional
+def claim_lease(transaction, ref, holder: str, ttl: float):
+    snapshot = ref.get(transaction=transaction)
+    lease = snapshot.to_dict() if snapshot.exists else None
+    now = time.time()
+    if lease and lease.get("holder") != holder and lease.get("expires_at", 0) > now:
+        return False
+    transaction.set(ref, {"holder": holder, "expires_at": now + ttl})
+    return True
+
+
+class _Pacer:
+    """
+    Spaces request starts at least 1/rate seconds apart.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class IngestionScheduler:
+    """
+    Periodically sweeps a grid of geohash cells and stores each cell's
+    current conditions in the snapshot store, so user requests are served
+    from the latest sweep instead of going upstream.
+
+    With several replicas, only the holder of a Firestore lease sweeps; it
+    persists snapshots (with their hourly AQI forecasts) to Firestore and
+    the other replicas load them.
+    Without Firestore (db None) the scheduler always sweeps.
+
+    With forecast_hours > 0 each cell's hourly AQI forecast for that many
+    hours is fetched too and kept alongside its snapshot; `on_forecast(cell,
+    series)`, when given, receives each fetched ForecastSeries (the alert
+    engine evaluates its rules on it).
+    """
+
+    def __init__(
+        self,
+        db,
+        store=snapshots,
+        bbox: str = INGESTION_BBOX,
+        precision: int = INGESTION_PRECISION,
+        interval: float = INGESTION_INTERVAL,
+        jitter: float = INGESTION_JITTER,
+        concurrency: int = INGESTION_CONCURRENCY,
+        rate: float = INGESTION_RATE_PER_SECOND,
+        lease_ttl: float = INGESTION_LEASE_TTL,
+        forecast_hours: int = INGESTION_FORECAST_HOURS,
+        fetch=get_current_aqi,
+        fetch_forecast=fetch_aqi_forecast_series,
+        on_forecast=None,
+    ):
+        self.db = db
+        self.store = store
+        self.cells = geohash_cells_in_bbox(*parse_bbox(bbox), precision)
+        self.precision = precision
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.rate = rate
+        self.lease_ttl = max(lease_ttl, interval + jitter)
+        self.forecast_hours = forecast_hours
+        self.fetch = fetch
+        self.fetch_forecast = fetch_forecast
+        self.on_forecast = on_forecast
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._task = None
+        self.is_leader = False
+        self.sweeps = 0
+        self.last_sweep_started = None
+        self.last_sweep_duration = None
+        self.total_sweep_seconds = 0.0
+        self.cells_ok = 0
+        self.cells_failed = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # Jitter keeps replicas from stampeding the lease and upstream together.
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            started = time.monotonic()
+            try:
+                await self.cycle()
+            except Exception as e:
+                logger.exception("Ingestion cycle failed: %s", e)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def cycle(self):
+        """
+        One round: sweep when holding the lease, otherwise load the leader's
+        snapshots from Firestore.
+        """
+        self.is_leader = self.db is None or await asyncio.to_thread(self._acquire_lease)
+        if self.is_leader:
+            await self.sweep()
+        else:
+            await asyncio.to_thread(self._load_snapshots)
+
+    def _acquire_lease(self):
+        ref = self.db.document(LEASE_DOCUMENT)
+        return claim_lease(self.db.transaction(), ref, self.holder, self.lease_ttl)
+
+    def _load_snapshots(self):
+        docs = self.db.collection(SNAPSHOT_COLLECTION).stream()
+        self.store.load([doc.to_dict() for doc in docs])
+
+    def _persist(self, fetched: list):
+        for start in range(0, len(fetched), FIRESTORE_MAX_BATCH):
+            batch = self.db.batch()
+            for snapshot in fetched[start:start + FIRESTORE_MAX_BATCH]:
+                document = dict(snapshot)
+                # Followers load the forecast with the snapshot instead of fetching it.
+                forecast = self.store.forecast(snapshot["cell"])
+                if forecast is not None:
+                    document["forecast_start"] = forecast[0]
+                    document["forecast"] = [None if np.isnan(v) else float(v) for v in forecast[1].tolist()]
+                batch.set(self.db.collection(SNAPSHOT_COLLECTION).document(snapshot["cell"]), document)
+            batch.commit()
+
+    async def sweep(self):
+        """
+        Fetches every cell once, rate limited and with bounded concurrency.
+        """
+        started = time.monotonic()
+        self.last_sweep_started = time.time()
+        pacer = _Pacer(self.rate)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        ok, failed = [], 0
+
+        async def visit(cell):
+            nonlocal failed
+            lat, lon = geohash_center(cell)
+            async with semaphore:
+                await pacer.wait()
+                data = await self.fetch(lat, lon)
+            if not data or "error" in data or "aqi" not in data:
+                failed += 1
+                return
+            self.store.put(cell, data, lat, lon)
+            ok.append(self.store.get(cell))
+            if self.forecast_hours:
+                async with semaphore:
+                    await pacer.wait()
+                    await self._visit_forecast(cell, lat, lon)
+
+        await asyncio.gather(*(visit(cell) for cell in self.cells))
+
+        if ok and self.db is not None:
+            await asyncio.to_thread(self._persist, ok)
+
+        self.sweeps += 1
+        self.cells_ok = len(ok)
+        self.cells_failed = failed
+        self.last_sweep_duration = time.monotonic() - started
+        self.total_sweep_seconds += self.last_sweep_duration
+        logger.info(
+            "Ingestion sweep finished",
+            extra={"fields": {"cells_ok": len(ok), "cells_failed": failed, "seconds": round(self.last_sweep_duration, 3)}},
+        )
+
+    async def _visit_forecast(self, cell: str, lat: float, lon: float):
+        start = (int(time.time()) // HOUR + 1) * HOUR
+        end = start + self.forecast_hours * HOUR
+        result = await self.fetch_forecast(lat, lon, to_rfc3339(start), to_rfc3339(end))
+        if "error" in result:
+            return
+        # Place each point on the hourly grid, so gaps stay NaN.
+        series = result["series"]
+        values = np.full(self.forecast_hours, np.nan, dtype=np.float32)
+        slots = (np.asarray(series.timestamps, dtype=np.int64) - start) // HOUR
+        inside = (slots >= 0) & (slots < self.forecast_hours)
+        values[slots[inside]] = series.aqi[inside]
+        self.store.put_forecast(cell, start, values)
+        if self.on_forecast is not None:
+            try:
+                await self.on_forecast(cell, series)
+            except Exception as e:
+                logger.warning("Forecast hook failed: %s", e, extra={"fields": {"cell": cell}})
+
+    def stats(self):
+        return {
+            "holder": self.holder,
+            "is_leader": self.is_leader,
+            "cells": len(self.cells),
+            "precision": self.precision,
+            "snapshots": len(self.store),
+            "sweeps": self.sweeps,
+            "last_sweep_started": self.last_sweep_started,
+            "last_sweep_duration": self.last_sweep_duration,
+            "avg_sweep_duration": self.total_sweep_seconds / self.sweeps if self.sweeps else None,
+            "cells_ok": self.cells_ok,
+            "cells_failed": self.cells_failed,
+            "forecast_hours": self.forecast_hours,
+        }
@@ -0,0 +1,85 @@
+# backend/services/model_state_store.py
+import asyncio
+
+from core.config import MODEL_STATE_CACHE_TTL, MODEL_STATE_CACHE_MAX_ENTRIES
+from core.log import get_logger
+from core.single_flight import SingleFlight
+from core.ttl_cache import TTLCache
+from core.timeutil import to_epoch
+from models.online_model import update_state
+
+STATE_DOCUMENT = "users/{uid}/model_state/aqi"
+
+logger = get_logger(__name__)
+
+
+class ModelStateStore:
+    """
+    Keeps one small online-model document per user. Readings update a cached
+    copy in O(1) and the new state is written back through the history
+    writer's batches; forecasts read a single document instead of history.
+    States are cached for MODEL_STATE_CACHE_TTL so several workers converge.
+    Records for the same user are applied one at a time, so concurrent
+    readings can't fold into the same old state and drop each other.
+    Without Firestore (db None, e.g. HISTORY_BACKEND=sqlite) states live only
+    in that cache.
+    """
+
+    def __init__(self, db, writer):
+        self.db = db
+        self.writer = writer
+        self._cache = TTLCache(MODEL_STATE_CACHE_MAX_ENTRIES, MODEL_STATE_CACHE_TTL)
+        self._loads = SingleFlight()
+        self._locks = {}
+
+    def _read(self, uid: str):
+        if self.db is None:
+            return None
+        snapshot = self.db.document(STATE_DOCUMENT.format(uid=uid)).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def get(self, uid: str):
+        entry = self._cache.get(uid)
+        if entry is not None:
+            return entry[0]
+
+        async def load():
+            state = await asyncio.to_thread(self._read, uid)
+            self._cache.set(uid, state)
+            return state
+
+        return await self._loads.do(uid, load)
+
+    async def record(self, uid: str, entry: dict):
+        """
+        Folds a saved history entry into the user's state.
+        """
+        try:
+            timestamp = to_epoch(entry["timestamp"])
+            value = float(entry["aqi"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        # [lock, holders]; dropped once nobody holds or waits for it.
+        slot = self._locks.setdefault(uid, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                return await self._record(uid, timestamp, value)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._locks[uid]
+
+    async def _record(self, uid: str, timestamp: float, value: float):
+        try:
+            state = await self.get(uid)
+        except Exception as e:
+            logger.warning("Could not load model state: %s", e, extra={"fields": {"uid": uid}})
+            return None
+
+        state = update_state(state, timestamp, value)
+        self._cache.set(uid, state)
+        if self.db is not None:
+            await self.writer.put_document(STATE_DOCUMENT.format(uid=uid), state)
+        return state
@@ -0,0 +1,116 @@
+# backend/services/safe_window_service.py
+import asyncio
+
+import numpy as np
+
+from core.config import AQI_CACHE_GEOHASH_PRECISION, BATCH_CONCURRENCY
+from core.geo import geohash_encode
+from core.timeutil import to_iso
+from models.forecast_model import stack_series
+from models.safe_window_model import SAFETY_PROFILES, best_windows
+from services.aqi_forecast_fetcher import fetch_aqi_forecast_series
+
+
+def resolve_thresholds(profile: str = "general", min_aqi: float = None, max_pollutants: dict = None):
+    """
+    Starts from a named profile and applies any explicit overrides.
+    Returns (min_aqi, max_pollutants) or raises ValueError for an unknown profile.
+    """
+    if profile not in SAFETY_PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of {sorted(SAFETY_PROFILES)}")
+    base = SAFETY_PROFILES[profile]
+    limits = dict(base["max_pollutants"])
+    limits.update(max_pollutants or {})
+    return (base["min_aqi"] if min_aqi is None else min_aqi), limits
+
+
+def _pollutant_matrix(series_list: list, code: str, width: int):
+    matrix = np.full((len(series_list), width), np.nan)
+    for i, series in enumerate(series_list):
+        column = series.pollutant(code)
+        if column is not None:
+            matrix[i, :len(series)] = column
+    return matrix
+
+
+async def find_safe_windows(
+    locations: list,
+    start_time: str,
+    end_time: str,
+    duration_minutes: float,
+    profile: str = "general",
+    min_aqi: float = None,
+    max_pollutants: dict = None,
+    top_k: int = 5,
+    concurrency: int = BATCH_CONCURRENCY,
+):
+    """
+    Best contiguous windows of `duration_minutes` across the forecast series
+    of several locations, ranked cleanest first. Locations sharing a cell
+    share one forecast fetch. Locations whose forecast failed, or lacks a
+    pollutant the thresholds limit, are listed under "errors".
+    """
+    threshold, limits = resolve_thresholds(profile, min_aqi, max_pollutants)
+
+    cells = {}
+    for index, location in enumerate(locations):
+        cells.setdefault(geohash_encode(location.lat, location.lon, AQI_CACHE_GEOHASH_PRECISION), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(index):
+        async with semaphore:
+            location = locations[index]
+            return await fetch_aqi_forecast_series(location.lat, location.lon, start_time, end_time)
+
+    keys = list(cells)
+    outcomes = await asyncio.gather(*(fetch(cells[key][0]) for key in keys), return_exceptions=True)
+
+    series_list, owners, errors = [], [], []
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception) or "error" in outcome:
+            message = str(outcome) if isinstance(outcome, Exception) else outcome["error"]
+            errors.extend({"index": index, "error": message} for index in cells[key])
+            continue
+        if not outcome["count"]:
+            continue
+        # Steps without a limited pollutant count as unsafe; say why.
+        missing = [code for code in limits if outcome["series"].pollutant(code) is None]
+        if missing:
+            message = f"Forecast has no concentrations for {', '.join(missing)}"
+            errors.extend({"index": index, "error": message} for index in cells[key])
+        series_list.append(outcome["series"])
+        owners.append(key)
+
+    windows = []
+    if series_list:
+        times, aqi = stack_series(series_list)
+        pollutant_limits = [
+            (_pollutant_matrix(series_list, code, times.shape[1]), ceiling)
+            for code, ceiling in limits.items()
+        ]
+        windows = best_windows(times, aqi, duration_minutes * 60, threshold, pollutant_limits, top_k)
+
+    results = []
+    for rank, window in enumerate(windows, start=1):
+        indexes = cells[owners[window["series"]]]
+        results.append({
+            "rank": rank,
+            "locations": indexes,
+            "name": locations[indexes[0]].name,
+            "lat": locations[indexes[0]].lat,
+            "lon": locations[indexes[0]].lon,
+            "start": to_iso(window["start"]),
+            "end": to_iso(window["end"]),
+            "mean_aqi": window["mean_aqi"],
+            "min_aqi": window["min_aqi"],
+        })
+
+    return {
+        "profile": profile,
+        "min_aqi": threshold,
+        "max_pollutants": limits,
+        "duration_minutes": duration_minutes,
+        "windows": results,
+        "errors": errors,
+    }
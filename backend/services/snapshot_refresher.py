@@ -0,0 +1,52 @@
+# backend/services/snapshot_refresher.py
+"""
+The refresher process started by serve.py: the only process that sweeps
+the ingestion grid (and forecasts) upstream. After every cycle it
+republishes its snapshot store as the shared segment the API workers read.
+"""
+import asyncio
+import random
+import time
+
+from core.config import INGESTION_FORECAST_HOURS
+from core.firebase_init import init_firebase
+from core.http_client import close_http_client, start_http_client
+from core.log import get_logger
+from services.ingestion import IngestionScheduler
+from services.snapshot_segment import write_segment
+from services.snapshot_store import SnapshotStore
+
+logger = get_logger(__name__)
+
+
+async def refresh_forever(path: str):
+    await start_http_client()
+    try:
+        scheduler = IngestionScheduler(init_firebase(), store=SnapshotStore())
+        # Publish an empty generation right away so workers can map the file.
+        write_segment(path, scheduler.store, INGESTION_FORECAST_HOURS)
+        while True:
+            await asyncio.sleep(random.uniform(0, scheduler.jitter))
+            started = time.monotonic()
+            try:
+                await scheduler.cycle()
+                await asyncio.to_thread(write_segment, path, scheduler.store, INGESTION_FORECAST_HOURS)
+                logger.info(
+                    "Snapshot segment published",
+                    extra={"fields": {"path": path, "cells": len(scheduler.store), "is_leader": scheduler.is_leader}},
+                )
+            except Exception as e:
+                logger.exception("Snapshot refresh failed: %s", e)
+            await asyncio.sleep(max(0.0, scheduler.interval - (time.monotonic() - started)))
+    finally:
+        await close_http_client()
+
+
+def run(path: str):
+    """
+    Process entry point.
+    """
+    try:
+        asyncio.run(refresh_forever(path))
+    except KeyboardInterrupt:
+        pass
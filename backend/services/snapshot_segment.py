@@ -0,0 +1,175 @@
+# backend/services/snapshot_segment.py
+"""
+File-backed snapshot segment shared by the worker processes of serve.py.
+
+One refresher process writes every generation to a new file and renames
+it over the segment path; workers mmap the current file read-only and see
+the numeric columns (and forecast matrix) as NumPy views, without copying.
+A published file is never modified, so readers can't observe a torn write:
+they keep using the generation they mapped until they notice a new one.
+
+Layout: a fixed header, a cell-sorted record array, then a blob with each
+snapshot's `data` dict as JSON (decoded only when that cell is read).
+"""
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"WWSNAP01"
+# magic, record count, forecast hours, written_at, records offset, blob offset
+HEADER = struct.Struct("<8sIIdQQ")
+CELL_BYTES = 12
+
+
+def record_dtype(forecast_hours: int):
+    return np.dtype([
+        ("cell", f"S{CELL_BYTES}"),
+        ("lat", "<f8"),
+        ("lon", "<f8"),
+        ("fetched_at", "<f8"),
+        ("aqi", "<f4"),
+        ("data_offset", "<u4"),
+        ("data_length", "<u4"),
+        ("forecast_start", "<f8"),
+        ("forecast", "<f4", (max(forecast_hours, 1),)),
+    ])
+
+
+def write_segment(path: str, store, forecast_hours: int = 0):
+    """
+    Publishes the store's snapshots (and up to `forecast_hours` of each
+    cell's hourly forecast) as a new generation at `path`.
+    """
+    columns = store.arrays()
+    order = np.argsort(columns["cell"], kind="stable")
+    records = np.zeros(len(order), dtype=record_dtype(forecast_hours))
+    for name in ("cell", "lat", "lon", "fetched_at", "aqi", "forecast_start"):
+        records[name] = columns[name][order]
+    records["forecast"] = np.nan
+    hours = min(forecast_hours, columns["forecast"].shape[1])
+    if hours:
+        records["forecast"][:, :hours] = columns["forecast"][order, :hours]
+
+    blobs, offset = [], 0
+    for i, cell in enumerate(records["cell"]):
+        blob = json.dumps(store.get(cell.decode())["data"], separators=(",", ":")).encode()
+        records[i]["data_offset"] = offset
+        records[i]["data_length"] = len(blob)
+        blobs.append(blob)
+        offset += len(blob)
+
+    records_offset = HEADER.size
+    blob_offset = records_offset + records.nbytes
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), forecast_hours, time.time(), records_offset, blob_offset))
+        f.write(records.tobytes())
+        f.write(b"".join(blobs))
+    os.replace(tmp, path)
+
+
+class SegmentReader:
+    """
+    Read side of the segment. Checks for a newer generation at most every
+    `check_interval` seconds (one stat call) and remaps when it changed.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.generation = 0
+        self._identity = None
+        self._checked_at = 0.0
+        self._map = None
+        self._records = np.zeros(0, dtype=record_dtype(0))
+        self._cells = self._records["cell"]
+        self.forecast_hours = 0
+        self.written_at = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, forecast_hours, written_at, records_offset, _ = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            return
+        # Views into the mapping; the previous generation's mapping is released
+        # once nothing references its arrays any more.
+        self._records = np.frombuffer(mapped, dtype=record_dtype(forecast_hours), count=count, offset=records_offset)
+        self._cells = self._records["cell"]
+        self._map = mapped
+        self._blob_offset = records_offset + self._records.nbytes
+        self._identity = identity
+        self.forecast_hours = forecast_hours
+        self.written_at = written_at
+        self.generation += 1
+
+    def records(self):
+        self._refresh()
+        return self._records
+
+    @property
+    def version(self):
+        self._refresh()
+        return self.generation
+
+    def arrays(self):
+        """
+        Zero-copy column views of the current generation, in cell order.
+        """
+        records = self.records()
+        return {name: records[name] for name in ("cell", "lat", "lon", "fetched_at", "aqi", "forecast_start", "forecast")}
+
+    def _find(self, cell: str):
+        records = self.records()
+        key = cell.encode()[:CELL_BYTES]
+        i = int(np.searchsorted(self._cells, key))
+        if i >= len(records) or self._cells[i] != key:
+            return None
+        return records[i]
+
+    def get(self, cell: str):
+        """
+        The snapshot dict of a cell, as SnapshotStore.get returns it.
+        """
+        record = self._find(cell)
+        if record is None:
+            return None
+        start = self._blob_offset + int(record["data_offset"])
+        return {
+            "cell": cell,
+            "lat": float(record["lat"]),
+            "lon": float(record["lon"]),
+            "fetched_at": float(record["fetched_at"]),
+            "data": json.loads(self._map[start:start + int(record["data_length"])]),
+        }
+
+    def forecast(self, cell: str):
+        """
+        (start epoch, hourly AQI view) of a cell, or None without a forecast.
+        """
+        record = self._find(cell)
+        if record is None or np.isnan(record["forecast_start"]):
+            return None
+        return float(record["forecast_start"]), record["forecast"]
+
+    def all(self):
+        return [self.get(cell.decode()) for cell in self.records()["cell"]]
+
+    def __len__(self):
+        return len(self.records())
@@ -0,0 +1,134 @@
+# backend/services/snapshot_store.py
+import time
+
+SNAPSHOT_COLLECTION = "aqi_snapshots"
+
+
+class SnapshotStore:
+    """
+    Latest normalized current-conditions snapshot per grid cell, as produced
+    by the ingestion sweep. Each snapshot is the get_current_aqi dict plus
+    the cell, its centre and the time it was fetched. Cells may also carry
+    an hourly AQI forecast.
+
+    In a serve.py worker the store is attached to the shared snapshot
+    segment and reads go there instead of to the in-process dict.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._forecasts = {}
+        self._version = 0
+        self._reader = None
+
+    def attach(self, reader):
+        """
+        Serves reads from a SegmentReader written by another process.
+        """
+        self._reader = reader
+
+    @property
+    def version(self):
+        if self._reader is not None:
+            return self._reader.version
+        return self._version
+
+    def put(self, cell: str, data: dict, lat: float, lon: float, fetched_at: float = None):
+        self._snapshots[cell] = {
+            "cell": cell,
+            "lat": lat,
+            "lon": lon,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+            "data": data,
+        }
+        self._version += 1
+
+    def put_forecast(self, cell: str, start: float, values):
+        """
+        Hourly AQI values for a cell, values[i] being the hour at start + i*3600.
+        """
+        self._forecasts[cell] = (start, values)
+        self._version += 1
+
+    def load(self, snapshots: list):
+        """
+        Replaces the store's contents, e.g. with snapshots read from Firestore
+        (which may carry the cell's forecast as forecast_start / forecast).
+        """
+        import numpy as np
+
+        self._snapshots, self._forecasts = {}, {}
+        for snapshot in snapshots:
+            if not snapshot.get("cell"):
+                continue
+            snapshot = dict(snapshot)
+            start, forecast = snapshot.pop("forecast_start", None), snapshot.pop("forecast", None)
+            self._snapshots[snapshot["cell"]] = snapshot
+            if start is not None and forecast:
+                values = np.array([np.nan if v is None else v for v in forecast], dtype=np.float32)
+                self._forecasts[snapshot["cell"]] = (start, values)
+        self._version += 1
+
+    def get(self, cell: str, max_age: float = None):
+        if self._reader is not None:
+            snapshot = self._reader.get(cell)
+        else:
+            snapshot = self._snapshots.get(cell)
+        if snapshot is None:
+            return None
+        if max_age is not None and time.time() - snapshot["fetched_at"] > max_age:
+            return None
+        return snapshot
+
+    def forecast(self, cell: str):
+        if self._reader is not None:
+            return self._reader.forecast(cell)
+        return self._forecasts.get(cell)
+
+    def all(self):
+        if self._reader is not None:
+            return self._reader.all()
+        return list(self._snapshots.values())
+
+    def arrays(self):
+        """
+        Column arrays over every cell: cell (bytes), lat, lon, fetched_at,
+        aqi, and forecast_start / forecast (NaN where a cell has none).
+        Views into the shared segment when attached.
+        """
+        if self._reader is not None:
+            return self._reader.arrays()
+
+        import numpy as np
+
+        values = list(self._snapshots.values())
+        forecasts = [self._forecasts.get(s["cell"]) for s in values]
+        hours = max((len(f[1]) for f in forecasts if f is not None), default=1)
+        forecast = np.full((len(values), hours), np.nan, dtype=np.float32)
+        for i, f in enumerate(forecasts):
+            if f is not None:
+                forecast[i, :len(f[1])] = f[1]
+        return {
+            "cell": np.array([s["cell"] for s in values], dtype="S12"),
+            "lat": np.array([s["lat"] for s in values], dtype=np.float64),
+            "lon": np.array([s["lon"] for s in values], dtype=np.float64),
+            "fetched_at": np.array([s["fetched_at"] for s in values], dtype=np.float64),
+            "aqi": np.array([_aqi(s["data"]) for s in values], dtype=np.float32),
+            "forecast_start": np.array([np.nan if f is None else f[0] for f in forecasts], dtype=np.float64),
+            "forecast": forecast,
+        }
+
+    def __len__(self):
+        if self._reader is not None:
+            return len(self._reader)
+        return len(self._snapshots)
+
+
+def _aqi(data: dict):
+    try:
+        return float(data.get("aqi"))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+snapshots = SnapshotStore()
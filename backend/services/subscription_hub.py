@@ -0,0 +1,276 @@
+# backend/services/subscription_hub.py
+import asyncio
+import json
+import time
+
+from core.config import (
+    AQI_CACHE_GEOHASH_PRECISION,
+    SUBSCRIPTION_CONCURRENCY,
+    SUBSCRIPTION_HEARTBEAT,
+    SUBSCRIPTION_MAX_CELLS,
+    SUBSCRIPTION_MAX_CONNECTIONS,
+    SUBSCRIPTION_POLL_INTERVAL,
+)
+from core.geo import geohash_center, geohash_encode, is_geohash
+from core.log import get_logger
+from services.aqi_cache import get_current_aqi_cached
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+logger = get_logger(__name__)
+
+
+def parse_subscription_cells(cells: str = None, points: str = None, precision: int = AQI_CACHE_GEOHASH_PRECISION):
+    """
+    Cells to subscribe to from comma-separated geohashes and/or
+    "lat,lon;lat,lon" points, snapped to the current-conditions cache grid.
+    Raises ValueError for malformed input.
+    """
+    wanted = []
+    for code in (cells or "").split(","):
+        code = code.strip().lower()
+        if not code:
+            continue
+        if len(code) < precision or not is_geohash(code):
+            raise ValueError(f"Invalid cell {code!r}; expected a geohash of at least {precision} characters")
+        wanted.append(code[:precision])
+    for point in (points or "").split(";"):
+        if not point.strip():
+            continue
+        try:
+            lat, lon = (float(part) for part in point.split(","))
+        except ValueError:
+            raise ValueError(f"Invalid point {point!r}; expected lat,lon")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Point {point!r} is out of range")
+        wanted.append(geohash_encode(lat, lon, precision))
+
+    wanted = list(dict.fromkeys(wanted))
+    if not wanted:
+        raise ValueError("Give at least one cell or point")
+    if len(wanted) > SUBSCRIPTION_MAX_CELLS:
+        raise ValueError(f"At most {SUBSCRIPTION_MAX_CELLS} cells per subscription")
+    return wanted
+
+
+def _frame(cell: str, data: dict):
+    return f"event: aqi\ndata: {json.dumps({'cell': cell, **data}, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    One connection's view of the hub. Only the newest pending update per
+    cell is kept, so a slow client costs at most one frame per cell and
+    simply skips superseded readings.
+    """
+
+    def __init__(self, uid: str, cells: list):
+        self.uid = uid
+        self.cells = tuple(cells)
+        self.closed = False
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, cell: str, data: dict, frame: str):
+        """
+        Queues a reading; returns True when it replaced an undelivered one.
+        """
+        replaced = cell in self._pending
+        self._pending[cell] = (data, frame)
+        self._ready.set()
+        return replaced
+
+    async def next(self, timeout: float):
+        """
+        Waits up to `timeout` seconds; returns [(cell, data, frame)], empty
+        on timeout.
+        """
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        updates = [(cell, data, frame) for cell, (data, frame) in self._pending.items()]
+        self._pending.clear()
+        return updates
+
+
+class SubscriptionHub:
+    """
+    Fans current conditions out to SSE subscribers. Each subscribed cell
+    is refreshed once per poll through the shared cache (so Google sees at
+    most one call per cell and cache period) and a frame is pushed only
+    when the reading's upstream dateTime or AQI changes.
+    """
+
+    def __init__(self, interval: float = SUBSCRIPTION_POLL_INTERVAL, concurrency: int = SUBSCRIPTION_CONCURRENCY,
+                 max_connections: int = SUBSCRIPTION_MAX_CONNECTIONS):
+        self.interval = interval
+        self.max_connections = max_connections
+        self._concurrency = concurrency
+        self._subscribers = {}
+        self._latest = {}
+        self._unseen = set()
+        self._connections = 0
+        self._wake = None
+        self._task = None
+        self._stats = {"subscribed": 0, "polls": 0, "refreshes": 0, "pushes": 0, "frames": 0, "conflated": 0, "rejected": 0, "last_poll_seconds": None}
+
+    async def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def admit(self, uid: str, cells: list):
+        """
+        Reserves a connection slot and returns the (not yet registered)
+        Subscription, or None (counted) when the worker already holds
+        max_connections. The slot is freed by unsubscribe().
+        """
+        if self._connections >= self.max_connections:
+            self._stats["rejected"] += 1
+            return None
+        self._connections += 1
+        return Subscription(uid, cells)
+
+    def subscribe(self, subscription: Subscription):
+        """
+        Registers an admitted connection and queues the latest known reading
+        of each cell; cells nobody watched yet are fetched right away.
+        """
+        self._stats["subscribed"] += 1
+        for cell in subscription.cells:
+            self._subscribers.setdefault(cell, set()).add(subscription)
+            latest = self._latest.get(cell)
+            if latest is not None:
+                subscription.offer(cell, latest[1], latest[2])
+            else:
+                self._unseen.add(cell)
+        if self._unseen and self._wake is not None:
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Frees the connection's slot; safe to call more than once, and for a
+        subscription that was admitted but never started streaming.
+        """
+        if subscription.closed:
+            return
+        subscription.closed = True
+        self._connections -= 1
+        for cell in subscription.cells:
+            watchers = self._subscribers.get(cell)
+            if watchers is None:
+                continue
+            watchers.discard(subscription)
+            if not watchers:
+                del self._subscribers[cell]
+                self._latest.pop(cell, None)
+
+    async def _run(self):
+        # Full sweeps every interval; in between, newly watched cells are
+        # fetched as soon as someone subscribes to them.
+        next_sweep = 0.0
+        while True:
+            cells = None
+            if time.monotonic() < next_sweep:
+                cells = list(self._unseen)
+            else:
+                next_sweep = time.monotonic() + self.interval
+            self._unseen.clear()
+            try:
+                await self.poll(cells)
+            except Exception as e:
+                logger.warning("Subscription poll failed: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_sweep - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def poll(self, cells: list = None):
+        """
+        Refreshes the given cells (default: every watched cell) once,
+        bounded by the hub's concurrency.
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def refresh(cell):
+            async with semaphore:
+                await self._refresh(cell)
+
+        cells = list(self._subscribers) if cells is None else cells
+        await asyncio.gather(*(refresh(cell) for cell in cells))
+        self._stats["polls"] += 1
+        self._stats["last_poll_seconds"] = round(time.perf_counter() - started, 3)
+
+    async def _refresh(self, cell: str):
+        lat, lon = geohash_center(cell)
+        data = await get_current_aqi_cached(lat, lon)
+        self._stats["refreshes"] += 1
+        if not data or "aqi" not in data:
+            return
+
+        signature = (data.get("timestamp"), data.get("aqi"))
+        latest = self._latest.get(cell)
+        if latest is not None and latest[0] == signature:
+            return
+        watchers = self._subscribers.get(cell)
+        if not watchers:
+            return
+
+        # Encoded once per change, shared by every subscriber of the cell.
+        frame = _frame(cell, data)
+        self._latest[cell] = (signature, data, frame)
+        self._stats["pushes"] += 1
+        self._stats["frames"] += len(watchers)
+        for subscription in watchers:
+            if subscription.offer(cell, data, frame):
+                self._stats["conflated"] += 1
+
+    def stats(self):
+        return {
+            **self._stats,
+            "connections": self._connections,
+            "cells": len(self._subscribers),
+            "max_connections": self.max_connections,
+        }
+
+
+hub = SubscriptionHub()
+
+
+async def event_stream(subscription: Subscription, on_update=None, heartbeat: float = SUBSCRIPTION_HEARTBEAT):
+    """
+    SSE body for one admitted connection: a frame per changed reading and a
+    comment line as keep-alive. `on_update(uid, data)` runs for each
+    delivered reading. The subscription is dropped when the client
+    disconnects.
+    """
+    uid = subscription.uid
+    try:
+        hub.subscribe(subscription)
+        yield "retry: 5000\n\n"
+        while True:
+            updates = await subscription.next(heartbeat)
+            if not updates:
+                yield ": keep-alive\n\n"
+                continue
+            for cell, data, frame in updates:
+                if on_update is not None:
+                    await on_update(uid, data)
+                yield frame
+    finally:
+        hub.unsubscribe(subscription)
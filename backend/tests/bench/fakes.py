@@ -0,0 +1,270 @@
+"""
+In-memory Firestore fake, auth bypass and app wiring for offline benchmarks.
+
+install() must run before the app's lifespan starts: it points the
+Firestore client the dependency container creates at one shared
+FakeFirestore and routes upstream HTTP to the stub Air Quality app
+(or, with UPSTREAM_MODE=replay, to a capture log).
+"""
+import copy
+import itertools
+import os
+import uuid
+
+import httpx
+
+BENCH_TOKEN_PREFIX = "bench-"
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path: str):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def set(self, data: dict, merge: bool = False):
+        current = self.db.read(self.path)
+        if merge and current is not None:
+            current.update(copy.deepcopy(data))
+        else:
+            self.db.store(self.path, copy.deepcopy(data))
+        self.db.writes += 1
+
+    def get(self, transaction=None):
+        self.db.reads += 1
+        return FakeSnapshot(self, self.db.read(self.path))
+
+    def delete(self):
+        self.db.remove(self.path)
+        self.db.writes += 1
+
+
+class FakeQuery:
+    """
+    Supports the query surface the app uses: where(filter=FieldFilter),
+    order_by, limit, select, start_after(dict) and stream().
+    """
+
+    def __init__(self, db, parent: str = None, group: str = None, filters=(), orders=(), limit=None, fields=None, after=None):
+        self.db = db
+        self._parent = parent
+        self._group = group
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._fields = fields
+        self._after = after
+
+    def _copy(self, **changes):
+        state = {
+            "parent": self._parent, "group": self._group, "filters": self._filters, "orders": self._orders,
+            "limit": self._limit, "fields": self._fields, "after": self._after,
+        }
+        state.update(changes)
+        return FakeQuery(self.db, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, values: dict):
+        return self._copy(after=values)
+
+    def _candidates(self):
+        if self._group is None:
+            children = self.db.collections.get(self._parent, {})
+            return [(f"{self._parent}/{doc_id}", data) for doc_id, data in children.items()]
+        return [
+            (f"{parent}/{doc_id}", data)
+            for parent, children in self.db.collections.items()
+            if parent.rsplit("/", 1)[-1] == self._group
+            for doc_id, data in children.items()
+        ]
+
+    def stream(self, transaction=None):
+        ops = {
+            "==": lambda a, b: a == b, "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+            ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+        }
+        rows = [
+            (path, data) for path, data in self._candidates()
+            if all(field in data and ops[op](data[field], value) for field, op, value in self._filters)
+        ]
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: row[1].get(field), reverse=direction == "DESCENDING")
+
+        if self._after and self._orders:
+            field, direction = self._orders[0]
+            cursor = self._after[field]
+            after = (lambda v: v < cursor) if direction == "DESCENDING" else (lambda v: v > cursor)
+            rows = [row for row in rows if after(row[1].get(field))]
+
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        self.db.reads += max(1, len(rows))
+
+        for path, data in rows:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeSnapshot(FakeDocument(self.db, path), data)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path: str):
+        super().__init__(db, parent=path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str = None):
+        return FakeDocument(self.db, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self._ops = []
+
+    def set(self, reference, data, merge: bool = False):
+        self._ops.append(lambda: reference.set(data, merge=merge))
+
+    def delete(self, reference):
+        self._ops.append(reference.delete)
+
+    def commit(self):
+        for op in self._ops:
+            op()
+        self.db.commits += 1
+        self._ops = []
+
+
+class FakeFirestore:
+    """
+    Documents held per parent collection path, with read/write/commit
+    counters so benchmarks can report Firestore operations per request.
+    """
+
+    def __init__(self):
+        self.collections = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def read(self, path: str):
+        parent, doc_id = path.rsplit("/", 1)
+        return self.collections.get(parent, {}).get(doc_id)
+
+    def store(self, path: str, data: dict):
+        parent, doc_id = path.rsplit("/", 1)
+        self.collections.setdefault(parent, {})[doc_id] = data
+
+    def remove(self, path: str):
+        parent, doc_id = path.rsplit("/", 1)
+        self.collections.get(parent, {}).pop(doc_id, None)
+
+    def collection(self, name: str):
+        return FakeCollection(self, name)
+
+    def document(self, path: str):
+        return FakeDocument(self, path)
+
+    def collection_group(self, name: str):
+        return FakeQuery(self, group=name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def counters(self):
+        documents = sum(len(children) for children in self.collections.values())
+        return {"documents": documents, "reads": self.reads, "writes": self.writes, "commits": self.commits}
+
+
+def bench_token(uid: str):
+    return f"{BENCH_TOKEN_PREFIX}{uid}"
+
+
+def _bypass_verify_token(token: str):
+    if token and token.startswith(BENCH_TOKEN_PREFIX):
+        return token[len(BENCH_TOKEN_PREFIX):]
+    return None
+
+
+_db = None
+
+
+def install(stub_app=None):
+    """
+    Wires the app for offline runs: fake Firestore, stub upstream over an
+    in-process ASGI transport and a bench API key. Returns the FakeFirestore.
+    """
+    global _db
+    if _db is not None:
+        return _db
+
+    os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import firebase_admin.firestore
+    import google.cloud.firestore
+
+    _db = FakeFirestore()
+    firebase_admin.firestore.client = lambda *args, **kwargs: _db
+    google.cloud.firestore.Client = lambda *args, **kwargs: _db
+
+    from core import http_client
+    from core.upstream_capture import wrap_transport
+    from tests.bench.stub_aq import create_stub_app
+
+    stub_app = stub_app or create_stub_app()
+    # UPSTREAM_MODE still applies: record the stub's traffic or replay a capture.
+    http_client._create_client = lambda: httpx.AsyncClient(transport=wrap_transport(httpx.ASGITransport(app=stub_app)))
+    return _db
+
+
+def load_app():
+    """
+    Imports the API after install() and swaps token verification for the
+    bench bypass (tokens of the form "bench-<uid>").
+    """
+    install()
+    import main
+
+    main.verify_token = _bypass_verify_token
+    return main
+
+
+_coordinates = itertools.count()
+
+
+def pune_point(spread: float = 0.2):
+    """
+    Deterministic walk over points around Pune.
+    """
+    i = next(_coordinates)
+    return 18.43 + (i * 0.0137) % spread, 73.73 + (i * 0.0291) % spread
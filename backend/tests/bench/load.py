@@ -0,0 +1,154 @@
+"""
+End-to-end load scenarios: drives every public endpoint of the API
+in-process (ASGI transport, no sockets) against the stub upstream and
+the fake Firestore, and reports latency percentiles and throughput.
+"""
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from tests.bench.fakes import bench_token, load_app, pune_point
+
+
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, errors: int, elapsed: float):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p90_ms": round(_percentile(ordered, 90) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def _window(hours: int = 24):
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    end = start + timedelta(hours=hours)
+    return start.strftime("%Y-%m-%dT%H:%M:%SZ"), end.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _scenarios(users: int):
+    """
+    name -> callable(i) returning (method, url, params, json body).
+    """
+    start, end = _window(24)
+
+    def token(i):
+        return bench_token(f"user{i % users}")
+
+    def point_params(i):
+        lat, lon = pune_point()
+        return {"lat": lat, "lon": lon, "token": token(i)}
+
+    return {
+        "current": lambda i: ("GET", "/aqi/current", point_params(i), None),
+        "forecast": lambda i: ("GET", "/aqi/forecast", {**point_params(i), "start_time": start, "end_time": end}, None),
+        "forecast_columnar": lambda i: (
+            "GET", "/aqi/forecast", {**point_params(i), "start_time": start, "end_time": end, "format": "columnar"}, None,
+        ),
+        "forecast_stream": lambda i: (
+            "GET", "/aqi/forecast", {**point_params(i), "start_time": start, "end_time": end, "stream": "true"}, None,
+        ),
+        "history": lambda i: ("GET", "/aqi/history", {"token": token(i), "limit": 50}, None),
+        "history_hourly": lambda i: ("GET", "/aqi/history", {"token": token(i), "aggregate": "hourly", "limit": 24}, None),
+        "predict": lambda i: ("GET", "/aqi/predict", {"token": token(i)}, None),
+        "batch": lambda i: (
+            "POST", "/aqi/batch", {"token": token(i)},
+            {"points": [dict(zip(("lat", "lon"), pune_point())) for _ in range(20)]},
+        ),
+        "safe_windows": lambda i: (
+            "POST", "/aqi/safe-windows", {"token": token(i)},
+            {
+                "locations": [dict(zip(("lat", "lon"), pune_point())) for _ in range(5)],
+                "start_time": start, "end_time": end, "duration_minutes": 45, "top_k": 3,
+            },
+        ),
+        "heatmap": lambda i: (
+            "GET", "/aqi/heatmap", {"token": token(i), "bbox": "18.45,73.75,18.62,73.98", "resolution": 1.0}, None,
+        ),
+        "nearby": lambda i: ("GET", "/aqi/nearby", {**point_params(i), "k": 5}, None),
+    }
+
+
+async def _seed(main, users: int, readings: int = 200):
+    """
+    Gives every bench user some history and model state, and fills the
+    snapshot store the heatmap reads from.
+    """
+    from core.geo import geohash_cells_in_bbox, geohash_center
+    from services.snapshot_store import snapshots
+    from tests.bench.stub_aq import _reading
+
+    now = datetime.utcnow()
+    items = []
+    for u in range(users):
+        for h in range(readings):
+            when = now - timedelta(hours=readings - h)
+            items.append((f"user{u}", {
+                "aqi": 50 + (h * 7 + u) % 30, "category": "Good air quality", "dominant_pollutant": "pm25",
+                "lat": 18.52, "lon": 73.85, "timestamp": when.isoformat(),
+            }))
+    main.container.history_repository.write_batch(items)
+    for uid, entry in items:
+        await main.container.model_states.record(uid, entry)
+
+    current = datetime.now(timezone.utc)
+    for cell in geohash_cells_in_bbox(18.43, 73.73, 18.64, 74.00, 5):
+        lat, lon = geohash_center(cell)
+        reading = _reading(lat, lon, current, 6)
+        index = reading["indexes"][0]
+        snapshots.put(cell, {"aqi": index["aqi"], "category": index["category"], "dominant_pollutant": "pm25"}, lat, lon)
+
+
+async def _run_scenario(client, build, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, params, body = build(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, params=params, json=body)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_load_async(requests: int = 500, concurrency: int = 20, users: int = 50, only: list = None):
+    main = load_app()
+    scenarios = _scenarios(users)
+    if only:
+        scenarios = {name: build for name, build in scenarios.items() if name in only}
+
+    results = {}
+    async with main.lifespan(main.app):
+        await _seed(main, users)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name, build in scenarios.items():
+                # Short warm-up so lazy imports and first-hit caches don't skew percentiles.
+                await _run_scenario(client, build, min(20, requests), min(4, concurrency))
+                results[name] = await _run_scenario(client, build, requests, concurrency)
+    return results
+
+
+def run_load(requests: int = 500, concurrency: int = 20, users: int = 50, only: list = None):
+    return asyncio.run(run_load_async(requests, concurrency, users, only))
@@ -0,0 +1,122 @@
+"""
+Micro-benchmarks for the CPU-bound hot paths: upstream payload parsing
+(current conditions and forecast pages), the end-to-end decode, parse and
+serialize of a route's body, and the forecasting engine.
+"""
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from tests.bench.stub_aq import _reading
+
+
+def measure(fn, repeat: int = 7, number: int = None, budget: float = 0.2):
+    """
+    Times fn() `number` times per round for `repeat` rounds and returns
+    per-call seconds {p50, min, max, calls}. `number` is calibrated so a
+    round takes roughly `budget` seconds when not given.
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= budget / 10 or number >= 1_000_000:
+                break
+            number *= 10
+        number = max(1, int(budget * number / max(elapsed, 1e-9)))
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return {"p50": statistics.median(rounds), "min": min(rounds), "max": max(rounds), "calls": number * repeat}
+
+
+def _current_payload(pollutants: int = 6):
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return {"regionCode": "in", **_reading(18.52, 73.85, now, pollutants)}
+
+
+def _forecast_page(hours: int = 24, pollutants: int = 6):
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return [_reading(18.52, 73.85, start + timedelta(hours=h), pollutants) for h in range(hours)]
+
+
+def _responder(response_model):
+    """
+    What FastAPI does with a route's return value under `response_model`:
+    validate and serialize through pydantic-core, then render the JSON body.
+    """
+    from fastapi.utils import create_model_field
+    from starlette.responses import JSONResponse
+
+    field = create_model_field("response", response_model, mode="serialization")
+
+    def respond(content):
+        value, errors = field.validate(content, {}, loc=("response",))
+        if errors:
+            raise ValueError(errors)
+        return JSONResponse(field.serialize(value)).body
+
+    return respond
+
+
+def _history(records: int = 168):
+    start = datetime.utcnow() - timedelta(hours=records)
+    return [
+        {"aqi": 50 + (h * 7) % 23, "timestamp": (start + timedelta(hours=h)).isoformat()}
+        for h in range(records)
+    ]
+
+
+def run_micro(quick: bool = False):
+    """
+    Runs every micro-benchmark; returns {name: stats}.
+    """
+    import numpy as np
+
+    from models.forecast_model import batch_forecast, simple_aqi_forecast
+    from models.aqi_model import CurrentAQIResponse, ForecastResponse
+    from models.forecast_series import ForecastSeriesBuilder
+    from models.google_aq_model import decode_current_conditions, decode_forecast_page
+    from services.aqi_fetcher import parse_current_conditions
+    from services.aqi_forecast_fetcher import parse_forecast_point
+
+    repeat = 3 if quick else 7
+    budget = 0.02 if quick else 0.2
+    current = _current_payload()
+    page = _forecast_page(96)
+    history = _history(168)
+    current_body = json.dumps(current).encode()
+    page_body = json.dumps({"regionCode": "in", "forecasts": page}).encode()
+    respond_current = _responder(CurrentAQIResponse)
+    respond_forecast = _responder(ForecastResponse)
+
+    def forecast_response():
+        decoded = decode_forecast_page(page_body)
+        points = [parse_forecast_point(f) for f in decoded["forecasts"]]
+        return respond_forecast({
+            "status": "ok", "lat": 18.52, "lon": 73.85, "start_time": points[0]["timestamp"],
+            "end_time": points[-1]["timestamp"], "count": len(points), "forecast_series": points,
+            "regionCode": decoded.get("regionCode"),
+        })
+
+    times = np.tile(np.arange(168, dtype=np.float64) * 3600 + 1.7e9, (1000, 1))
+    values = 50 + 10 * np.sin(times / 3600 / 24 * 2 * np.pi)
+
+    cases = {
+        "parse_current_conditions": lambda: parse_current_conditions(18.52, 73.85, current),
+        "parse_forecast_96h": lambda: [parse_forecast_point(f) for f in page],
+        "current_response": lambda: respond_current(parse_current_conditions(18.52, 73.85, decode_current_conditions(current_body))),
+        "forecast_response_96h": forecast_response,
+        "forecast_series_builder_96h": lambda: ForecastSeriesBuilder().extend(page).build(),
+        "simple_aqi_forecast_168": lambda: simple_aqi_forecast(history, 6),
+        "batch_forecast_1000x168": lambda: batch_forecast(times, values, hours_ahead=24),
+    }
+    return {name: measure(fn, repeat=repeat, budget=budget) for name, fn in cases.items()}
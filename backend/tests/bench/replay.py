@@ -0,0 +1,115 @@
+"""
+Reruns captured upstream traffic through the API, offline.
+
+    cd backend
+    UPSTREAM_MODE=record uvicorn main:app                   # capture a day against Google
+    python -m tests.bench.replay upstream_capture.jsonl.gz --speed 60
+
+Every recorded upstream call (first forecast pages only) is turned back
+into the API request behind it: /aqi/current or /aqi/forecast for the same
+point and window, sent at its recorded offset divided by --speed. Upstream
+answers come from the log (UPSTREAM_MODE=replay) with their recorded
+latency, also divided by --speed, so caching and concurrency changes can
+be compared on real payloads. --speed 0 sends everything at once.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+from tests.bench.load import summarize
+
+ENDPOINTS = {"currentConditions:lookup": "current", "forecast:lookup": "forecast"}
+
+
+def plan_requests(records, users: int = 50):
+    """
+    (offset seconds, scenario, params) per replayable upstream call, in
+    recorded order.
+    """
+    from tests.bench.fakes import bench_token
+
+    plan, first = [], None
+    for i, record in enumerate(records):
+        scenario = ENDPOINTS.get(urlsplit(record["url"]).path.rsplit("/", 1)[-1])
+        if scenario is None:
+            continue
+        payload = json.loads(record["request"])
+        if payload.get("pageToken"):
+            continue
+        first = record["at"] if first is None else first
+        params = {
+            "lat": payload["location"]["latitude"],
+            "lon": payload["location"]["longitude"],
+            "token": bench_token(f"user{i % users}"),
+        }
+        if scenario == "forecast":
+            params.update(start_time=payload["period"]["startTime"], end_time=payload["period"]["endTime"])
+        plan.append((record["at"] - first, scenario, params))
+    return plan
+
+
+async def replay_async(path: str, speed: float = 1.0, concurrency: int = 50, users: int = 50):
+    import httpx
+
+    from tests.bench.fakes import load_app
+
+    main = load_app()
+    from core.upstream_capture import capture_stats, read_capture
+
+    plan = plan_requests(read_capture(path), users)
+    latencies = {scenario: [] for scenario in ENDPOINTS.values()}
+    errors = {scenario: 0 for scenario in ENDPOINTS.values()}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            started = time.perf_counter()
+
+            async def send(offset, scenario, params):
+                if speed > 0:
+                    await asyncio.sleep(max(0.0, offset / speed - (time.perf_counter() - started)))
+                async with semaphore:
+                    sent = time.perf_counter()
+                    response = await client.get(f"/aqi/{scenario}", params=params)
+                    await response.aread()
+                    latencies[scenario].append(time.perf_counter() - sent)
+                # Upstream failures reach the forecast route's body, not its status.
+                if response.status_code >= 400 or "error" in response.json():
+                    errors[scenario] += 1
+
+            await asyncio.gather(*(send(*item) for item in plan))
+            elapsed = time.perf_counter() - started
+            cache = (await client.get("/aqi/cache/stats")).json()
+
+    return {
+        "requests": len(plan),
+        "seconds": round(elapsed, 3),
+        "scenarios": {name: summarize(values, errors[name], elapsed) for name, values in latencies.items() if values},
+        "upstream": capture_stats(),
+        "cache": {"hits": cache["hits"], "misses": cache["misses"]},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured upstream traffic through the API.")
+    parser.add_argument("capture", help="log written with UPSTREAM_MODE=record")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression; 0 = no waiting")
+    parser.add_argument("--concurrency", type=int, default=50, help="max in-flight API requests")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    # Read by core.config when the app is imported.
+    os.environ["UPSTREAM_MODE"] = "replay"
+    os.environ["UPSTREAM_CAPTURE_PATH"] = args.capture
+    os.environ["UPSTREAM_REPLAY_SPEED"] = str(args.speed)
+
+    result = asyncio.run(replay_async(args.capture, args.speed, args.concurrency, args.users))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Offline benchmark runner.
+
+    cd backend
+    python -m tests.bench.run --update-baseline    # record reference numbers on this machine
+    python -m tests.bench.run                      # micro + load, compare to baseline
+    python -m tests.bench.run --quick --only current forecast
+    python -m tests.bench.run --latency-ms 40 --error-rate 0.02
+
+Timings only compare on the machine that recorded them, so the baseline is
+local and not committed: record one on the base revision, then run the
+change against it. Exits 1 when --fail-on-regression is set and any metric
+is worse than the baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# (section, metric, higher_is_better)
+TRACKED = [
+    ("micro", "p50", False),
+    ("load", "p50_ms", False),
+    ("load", "p99_ms", False),
+    ("load", "rps", True),
+]
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25):
+    """
+    Returns a list of {section, name, metric, baseline, current, change}
+    rows, flagging `regressed` where the metric is worse than the baseline
+    by more than `tolerance` (a fraction).
+    """
+    rows = []
+    for section, metric, higher_is_better in TRACKED:
+        for name, current in results.get(section, {}).items():
+            reference = baseline.get(section, {}).get(name, {}).get(metric)
+            value = current.get(metric)
+            if reference in (None, 0) or value is None:
+                continue
+            change = (value - reference) / reference
+            worse = -change if higher_is_better else change
+            rows.append({
+                "section": section,
+                "name": name,
+                "metric": metric,
+                "baseline": reference,
+                "current": value,
+                "change": round(change, 4),
+                "regressed": worse > tolerance,
+            })
+    return rows
+
+
+def _format_seconds(value: float):
+    if value < 1e-3:
+        return f"{value * 1e6:.1f} µs"
+    if value < 1:
+        return f"{value * 1e3:.2f} ms"
+    return f"{value:.2f} s"
+
+
+def report(results: dict, rows: list):
+    lines = []
+    if results.get("micro"):
+        lines.append("Micro-benchmarks (per call)")
+        for name, stats in results["micro"].items():
+            lines.append(f"  {name:<32} p50 {_format_seconds(stats['p50']):>10}   min {_format_seconds(stats['min']):>10}")
+    if results.get("load"):
+        lines.append("Load scenarios")
+        lines.append(f"  {'scenario':<20} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+        for name, stats in results["load"].items():
+            lines.append(
+                f"  {name:<20} {stats['requests']:>6} {stats['errors']:>5} "
+                f"{stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['rps']:>9.1f}"
+            )
+    if rows:
+        lines.append("Against baseline")
+        for row in rows:
+            flag = "REGRESSED" if row["regressed"] else ""
+            lines.append(
+                f"  {row['section']}/{row['name']:<28} {row['metric']:<7} "
+                f"{row['change'] * 100:+7.1f}%  {flag}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer rounds and requests, for smoke runs")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--only", nargs="*", help="load scenarios to run")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub upstream error rate")
+    parser.add_argument("--pollutants", type=int, default=6, help="pollutants per stub reading")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", dest="json_out", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    from tests.bench import fakes
+    from tests.bench.stub_aq import StubConfig, create_stub_app
+
+    fakes.install(create_stub_app(StubConfig(
+        latency_ms=args.latency_ms, error_rate=args.error_rate, pollutants=args.pollutants,
+    )))
+
+    results = {
+        "meta": {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "stub_latency_ms": args.latency_ms,
+            "stub_error_rate": args.error_rate,
+        },
+    }
+    if not args.skip_micro:
+        from tests.bench.micro import run_micro
+        results["micro"] = run_micro(quick=args.quick)
+    if not args.skip_load:
+        from tests.bench.load import run_load
+        requests = args.requests or (100 if args.quick else 500)
+        results["load"] = run_load(requests, args.concurrency, only=args.only)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows = compare(results, baseline, args.tolerance)
+    print(report(results, rows))
+    if not baseline and not args.update_baseline:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"results": results, "comparison": rows}, f, indent=2)
+
+    if args.fail_on_regression and any(row["regressed"] for row in rows):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
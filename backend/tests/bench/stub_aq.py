@@ -0,0 +1,183 @@
+"""
+Local stand-in for the Google Air Quality API (currentConditions:lookup and
+forecast:lookup) with configurable latency, error rate and payload size.
+
+In-process:   create_stub_app(StubConfig(latency_ms=40)) + httpx.ASGITransport
+Standalone:   python -m tests.bench.stub_aq --port 8099 --latency-ms 40
+              then run the API with GOOGLE_AQ_BASE_URL=http://127.0.0.1:8099/v1
+"""
+import argparse
+import asyncio
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+POLLUTANTS = [
+    ("co", "CO", "PARTS_PER_BILLION"),
+    ("no2", "NO2", "PARTS_PER_BILLION"),
+    ("o3", "O3", "PARTS_PER_BILLION"),
+    ("pm10", "PM10", "MICROGRAMS_PER_CUBIC_METER"),
+    ("pm25", "PM2.5", "MICROGRAMS_PER_CUBIC_METER"),
+    ("so2", "SO2", "PARTS_PER_BILLION"),
+]
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    pollutants: int = 6          # pollutant entries per reading (payload size), when requested
+    max_forecast_hours: int = 96
+    default_page_size: int = 24
+    seed: int = 7
+
+
+def _aqi(lat: float, lon: float, when: datetime):
+    # Smooth, deterministic field: spatial gradient plus a daily cycle.
+    base = 60 + 15 * math.sin(lat * 40) * math.cos(lon * 40)
+    return int(max(1, min(100, base + 12 * math.sin(2 * math.pi * when.hour / 24))))
+
+
+def _category(aqi: int):
+    if aqi >= 80:
+        return "Excellent air quality"
+    if aqi >= 60:
+        return "Good air quality"
+    if aqi >= 40:
+        return "Moderate air quality"
+    if aqi >= 20:
+        return "Low air quality"
+    return "Poor air quality"
+
+
+def _reading(lat: float, lon: float, when: datetime, pollutants: int):
+    aqi = _aqi(lat, lon, when)
+    names = [POLLUTANTS[i % len(POLLUTANTS)] for i in range(pollutants)]
+    return {
+        "dateTime": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "indexes": [{
+            "code": "uaqi",
+            "displayName": "Universal AQI",
+            "aqi": aqi,
+            "aqiDisplay": str(aqi),
+            "color": {"red": 0.4, "green": 0.8, "blue": 0.2},
+            "category": _category(aqi),
+            "dominantPollutant": "pm25",
+        }],
+        "pollutants": [
+            {
+                "code": code if i < len(POLLUTANTS) else f"{code}_{i}",
+                "displayName": display,
+                "fullName": display,
+                "concentration": {"value": round(100 - aqi + i * 3.1, 2), "units": units},
+            }
+            for i, (code, display, units) in enumerate(names)
+        ],
+    }
+
+
+def _pollutant_count(body: dict, config: StubConfig):
+    # Like Google, pollutants only come back when the request asks for them.
+    return config.pollutants if "POLLUTANT_CONCENTRATION" in (body.get("extraComputations") or []) else 0
+
+
+def _parse_time(value: str, default: datetime):
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def create_stub_app(config: StubConfig = None):
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Stub Google Air Quality API")
+    app.state.config = config
+    app.state.calls = {"current": 0, "forecast": 0, "errors": 0}
+
+    async def _delay_or_fail(kind: str):
+        app.state.calls[kind] += 1
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config.error_rate and rng.random() < config.error_rate:
+            app.state.calls["errors"] += 1
+            return JSONResponse({"error": {"code": config.error_status, "message": "stub failure"}}, config.error_status)
+        return None
+
+    @app.post("/v1/currentConditions:lookup")
+    async def current_conditions(request: Request):
+        failure = await _delay_or_fail("current")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        location = body.get("location", {})
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        reading = _reading(location.get("latitude", 0.0), location.get("longitude", 0.0), now, _pollutant_count(body, config))
+        return {"regionCode": "in", **reading}
+
+    @app.post("/v1/forecast:lookup")
+    async def forecast(request: Request):
+        failure = await _delay_or_fail("forecast")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        location = body.get("location", {})
+        period = body.get("period", {})
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        start = _parse_time(period.get("startTime"), now)
+        end = _parse_time(period.get("endTime"), start + timedelta(hours=24))
+        hours = max(0, min(config.max_forecast_hours, int((end - start).total_seconds() // 3600)))
+
+        page_size = int(body.get("pageSize") or config.default_page_size)
+        offset = int(body.get("pageToken") or 0)
+        stop = min(hours, offset + page_size)
+        lat, lon = location.get("latitude", 0.0), location.get("longitude", 0.0)
+        pollutants = _pollutant_count(body, config)
+        payload = {
+            "forecasts": [
+                _reading(lat, lon, start + timedelta(hours=h), pollutants) for h in range(offset, stop)
+            ],
+            "regionCode": "in",
+        }
+        if stop < hours:
+            payload["nextPageToken"] = str(stop)
+        return payload
+
+    @app.get("/stats")
+    def stats():
+        return app.state.calls
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--pollutants", type=int, default=6)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        pollutants=args.pollutants,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Forecast alert rules evaluated per cell, with and without pollutant data.
+Run with: python -m pytest tests/test_alert_engine.py
+"""
+
+import asyncio
+
+from core.timeutil import to_rfc3339
+from models.forecast_series import ForecastSeriesBuilder
+from services.alert_engine import AlertEngine, MemoryAlertSink
+
+HOUR = 3600
+NOW = 1_800_000_000 - 1_800_000_000 % HOUR
+LAT, LON = 18.52, 73.85
+
+
+def _series(pm25=None, aqi=70, hours=6):
+    forecasts = []
+    for hour in range(hours):
+        forecast = {
+            "dateTime": to_rfc3339(NOW + hour * HOUR),
+            "indexes": [{"code": "uaqi", "aqi": aqi, "category": "Good"}],
+        }
+        if pm25 is not None:
+            forecast["pollutants"] = [{"code": "pm25", "concentration": {"value": pm25, "units": "MICROGRAMS_PER_CUBIC_METER"}}]
+        forecasts.append(forecast)
+    return ForecastSeriesBuilder().extend(forecasts).build()
+
+
+def _engine(series):
+    calls = []
+
+    async def fetch(lat, lon, start_time, end_time):
+        calls.append((lat, lon))
+        return {"series": series, "count": len(series)}
+
+    engine = AlertEngine(None, sink=MemoryAlertSink(), fetch=fetch)
+    engine.is_leader = True
+    return engine, calls
+
+
+def _add_pm25_rule(engine, threshold=35):
+    return asyncio.run(engine.add_rule("alice", LAT, LON, threshold, pollutant="pm25", lead_hours=4))
+
+
+def test_pollutant_rule_fires_on_concentrations():
+    engine, _ = _engine(_series(pm25=60))
+    rule = _add_pm25_rule(engine)
+
+    notifications = asyncio.run(engine.sweep(now=NOW))
+    assert [n["rule_id"] for n in notifications] == [rule["id"]]
+    assert notifications[0]["metric"] == "pm25" and notifications[0]["value"] == 60
+
+
+def test_pollutant_rule_without_concentrations_never_fires():
+    # What upstream returns when the request omits POLLUTANT_CONCENTRATION.
+    engine, _ = _engine(_series(pm25=None))
+    _add_pm25_rule(engine)
+
+    assert asyncio.run(engine.sweep(now=NOW)) == []
+    assert engine.stats()["missing_metric"] == 1
+
+
+def test_offered_forecast_is_evaluated_and_reused_by_the_sweep():
+    engine, calls = _engine(_series(pm25=10))
+    rule = _add_pm25_rule(engine)
+
+    asyncio.run(engine.offer_forecast(rule["cell"], _series(pm25=60), fetched_at=NOW))
+    assert [n["rule_id"] for n in engine.sink.sent] == [rule["id"]]
+
+    asyncio.run(engine.sweep(now=NOW))
+    assert calls == []
+    assert engine.stats()["reused"] == 1
+
+
+def test_offers_for_cells_without_rules_are_ignored():
+    engine, _ = _engine(_series(pm25=60))
+    asyncio.run(engine.offer_forecast("tek92", _series(pm25=60), fetched_at=NOW))
+    assert engine.stats()["offered"] == 0
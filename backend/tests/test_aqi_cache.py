@@ -0,0 +1,115 @@
+"""
+Cell-level current-conditions cache: hits, expiry, coalesced fills and
+per-caller locations.
+Run with: python -m pytest tests/test_aqi_cache.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core.geo import geohash_center, geohash_encode
+from core.single_flight import SingleFlight
+from core.ttl_cache import TTLCache
+from services import aqi_cache
+from services.snapshot_store import SnapshotStore
+
+# Two callers a few metres apart, in the same precision-6 cell.
+ALICE = (18.52040, 73.85670)
+BOB = (18.52050, 73.85680)
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    async def __call__(self, lat, lon):
+        self.calls.append((lat, lon))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            return {"error": "Upstream unavailable"}
+        return {"aqi": 40 + len(self.calls), "timestamp": "2026-01-01T00:00:00Z", "location": f"{lat},{lon}"}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = Upstream()
+    monkeypatch.setattr(aqi_cache, "get_current_aqi", fake)
+    monkeypatch.setattr(aqi_cache, "_local", TTLCache(100, 900))
+    monkeypatch.setattr(aqi_cache, "_last_good", TTLCache(100, 21600))
+    monkeypatch.setattr(aqi_cache, "_fills", SingleFlight(error_ttl=0))
+    monkeypatch.setattr(aqi_cache, "_stats", {"shared_hits": 0, "snapshot_hits": 0, "upstream_fetches": 0, "stale_served": 0})
+    monkeypatch.setattr(aqi_cache, "snapshots", SnapshotStore())
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start of a cache bucket, so entries live for the full AQI_CACHE_TTL.
+    fake = Clock(1_800_000_000 - 1_800_000_000 % aqi_cache.AQI_CACHE_BUCKET_SECONDS)
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+def _get(point):
+    return asyncio.run(aqi_cache.get_current_aqi_cached(*point))
+
+
+def test_second_caller_in_cell_is_a_hit(upstream, clock):
+    first = _get(ALICE)
+    clock.now += 60
+    second = _get(BOB)
+
+    assert len(upstream.calls) == 1
+    assert second["aqi"] == first["aqi"]
+    assert second["cell"] == first["cell"] == geohash_encode(*ALICE, 6)
+    assert second["cache_age"] == 60.0
+    assert aqi_cache.cache_stats()["misses"] == 1
+
+
+def test_entry_expires_after_ttl(upstream, clock):
+    _get(ALICE)
+    clock.now += aqi_cache.AQI_CACHE_TTL + 1
+    refreshed = _get(ALICE)
+
+    assert len(upstream.calls) == 2
+    assert refreshed["cache_age"] == 0
+
+
+def test_concurrent_misses_fill_once(upstream, clock):
+    async def main():
+        return await asyncio.gather(*(aqi_cache.get_current_aqi_cached(*point) for point in (ALICE, BOB) * 5))
+
+    results = asyncio.run(main())
+    assert len(upstream.calls) == 1
+    assert len({result["aqi"] for result in results}) == 1
+
+
+def test_fill_uses_cell_centre_and_callers_keep_their_location(upstream, clock):
+    first = _get(ALICE)
+    second = _get(BOB)
+
+    assert upstream.calls == [geohash_center(first["cell"])]
+    assert first["location"] == f"{ALICE[0]},{ALICE[1]}"
+    assert second["location"] == f"{BOB[0]},{BOB[1]}"
+
+
+def test_stale_reading_served_when_upstream_fails(upstream, clock):
+    _get(ALICE)
+    clock.now += aqi_cache.AQI_CACHE_TTL + 1
+    upstream.fail = True
+    stale = _get(BOB)
+
+    assert stale["stale"] is True
+    assert stale["upstream_error"] == "Upstream unavailable"
+    assert stale["location"] == f"{BOB[0]},{BOB[1]}"
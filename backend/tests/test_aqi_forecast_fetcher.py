@@ -0,0 +1,65 @@
+"""
+Forecast lookups: what is sent to Google and how pages are decoded.
+Run with: python -m pytest tests/test_aqi_forecast_fetcher.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from core import http_client
+from core.single_flight import SingleFlight
+from services import aqi_forecast_fetcher
+
+START, END = "2026-01-01T00:00:00Z", "2026-01-01T02:00:00Z"
+
+
+def _page(hours: int = 2):
+    return {
+        "forecasts": [
+            {
+                "dateTime": f"2026-01-01T{hour:02d}:00:00Z",
+                "indexes": [{"code": "uaqi", "aqi": 50 + hour, "category": "Good", "dominantPollutant": "pm25"}],
+                "pollutants": [
+                    {"code": "pm25", "displayName": "PM2.5", "concentration": {"value": 12.5 + hour, "units": "MICROGRAMS_PER_CUBIC_METER"}},
+                ],
+            }
+            for hour in range(hours)
+        ],
+        "regionCode": "in",
+    }
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    sent = []
+
+    def handler(request: httpx.Request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json=_page())
+
+    monkeypatch.setattr(aqi_forecast_fetcher, "GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(aqi_forecast_fetcher, "_flights", SingleFlight())
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return sent
+
+
+def test_forecast_request_asks_for_pollutant_concentrations(upstream):
+    asyncio.run(aqi_forecast_fetcher.fetch_aqi_forecast(18.52, 73.85, START, END))
+
+    payload = upstream[0]
+    assert payload["extraComputations"] == ["POLLUTANT_CONCENTRATION"]
+    assert payload["universalAqi"] is True
+    assert payload["location"] == {"latitude": 18.52, "longitude": 73.85}
+    assert payload["period"] == {"startTime": START, "endTime": END}
+
+
+def test_columnar_series_carries_pollutant_columns(upstream):
+    result = asyncio.run(aqi_forecast_fetcher.fetch_aqi_forecast_series(18.53, 73.86, START, END))
+
+    assert upstream[0]["extraComputations"] == ["POLLUTANT_CONCENTRATION"]
+    series = result["series"]
+    assert series.codes == ["pm25"]
+    assert series.pollutant("pm25").tolist() == [12.5, 13.5]
@@ -0,0 +1,72 @@
+"""
+History page cursors: round trips per backend, rejection of foreign or
+tampered ones.
+Run with: python -m pytest tests/test_history_cursor.py
+"""
+
+import pytest
+
+from services.history_repository import (
+    FirestoreHistoryRepository,
+    SQLiteHistoryRepository,
+    encode_cursor,
+)
+from tests.bench.fakes import FakeFirestore
+
+
+def _entries(n=5):
+    return [("alice", {"aqi": 40 + i, "timestamp": f"2026-01-01T{i:02d}:00:00+00:00"}) for i in range(n)]
+
+
+@pytest.fixture
+def firestore_repo():
+    repo = FirestoreHistoryRepository(FakeFirestore())
+    repo.write_batch(_entries())
+    return repo
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    repo = SQLiteHistoryRepository(str(tmp_path / "history.sqlite3"))
+    repo.write_batch(_entries())
+    return repo
+
+
+@pytest.mark.parametrize("name", ["firestore_repo", "sqlite_repo"])
+def test_cursor_walks_every_page(name, request):
+    repo = request.getfixturevalue(name)
+    seen, cursor = [], None
+    while True:
+        page = repo.query_page("alice", cursor=cursor, limit=2)
+        seen.extend(record["aqi"] for record in page["records"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [float(aqi) for aqi in seen] == [44, 43, 42, 41, 40]
+
+
+def test_cursor_from_other_backend_is_rejected(firestore_repo, sqlite_repo):
+    from_sqlite = sqlite_repo.query_page("alice", limit=2)["next_cursor"]
+    from_firestore = firestore_repo.query_page("alice", limit=2)["next_cursor"]
+
+    with pytest.raises(ValueError):
+        firestore_repo.query_page("alice", cursor=from_sqlite, limit=2)
+    with pytest.raises(ValueError):
+        sqlite_repo.query_page("alice", cursor=from_firestore, limit=2)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor({"bucket": 1}),
+    encode_cursor({"ts": "2026-01-01", "extra": 1}),
+    encode_cursor({"ts": 5}),
+])
+def test_tampered_raw_cursor_is_rejected(firestore_repo, cursor):
+    with pytest.raises(ValueError):
+        firestore_repo.query_page("alice", cursor=cursor, limit=2)
+
+
+def test_raw_cursor_is_rejected_for_aggregates(sqlite_repo):
+    cursor = sqlite_repo.query_page("alice", limit=2)["next_cursor"]
+    with pytest.raises(ValueError):
+        sqlite_repo.query_page("alice", cursor=cursor, limit=2, resolution="hourly")
@@ -0,0 +1,107 @@
+"""
+Write-behind history pipeline against the in-memory Firestore fake.
+Run with: python -m pytest tests/test_history_writer.py
+"""
+
+import asyncio
+
+from services.history_writer import HistoryWriter
+from tests.bench.fakes import FakeFirestore
+
+
+class FailingRepository:
+    def write_batch(self, items):
+        raise RuntimeError("firestore unavailable")
+
+
+def _entry(i):
+    return {"aqi": 40 + i, "timestamp": f"2026-01-01T{i:02d}:00:00+00:00"}
+
+
+def _run(writer, scenario):
+    async def main():
+        await writer.start()
+        await scenario()
+        await writer.stop()
+
+    asyncio.run(main())
+
+
+def test_flushes_full_batches_and_drains_on_stop():
+    db = FakeFirestore()
+    writer = HistoryWriter(db, batch_size=2, flush_interval=60)
+
+    async def scenario():
+        for i in range(5):
+            assert await writer.put("alice", _entry(i))
+
+    _run(writer, scenario)
+
+    stats = writer.stats()
+    assert stats["written"] == 5 and stats["failed"] == 0
+    assert stats["batches"] == 3
+    assert len(db.collections["users/alice/aqi_history"]) == 5
+    assert db.commits == 3
+
+
+def test_flushes_partial_batch_after_interval():
+    db = FakeFirestore()
+    writer = HistoryWriter(db, batch_size=100, flush_interval=0.05)
+
+    async def scenario():
+        await writer.put("alice", _entry(0))
+        await asyncio.sleep(0.3)
+        assert writer.written == 1
+
+    _run(writer, scenario)
+    assert writer.batches == 1
+
+
+def test_latest_document_write_per_path_wins():
+    db = FakeFirestore()
+    writer = HistoryWriter(db, batch_size=10, flush_interval=60)
+
+    async def scenario():
+        await writer.put_document("users/alice/model_state/aqi", {"n": 1})
+        await writer.put_document("users/alice/model_state/aqi", {"n": 2})
+
+    _run(writer, scenario)
+    assert db.read("users/alice/model_state/aqi") == {"n": 2}
+    assert db.writes == 1
+
+
+def test_failed_commits_are_counted_not_raised():
+    writer = HistoryWriter(FakeFirestore(), repository=FailingRepository(), batch_size=2, flush_interval=60)
+
+    async def scenario():
+        for i in range(3):
+            await writer.put("alice", _entry(i))
+
+    _run(writer, scenario)
+    stats = writer.stats()
+    assert stats["failed"] == 3
+    assert stats["written"] == 0 and stats["batches"] == 0
+
+
+def test_drop_newest_when_queue_is_full():
+    writer = HistoryWriter(FakeFirestore(), max_queue=2, drop_policy="drop_newest")
+
+    async def scenario():
+        # The background task hasn't run yet, so the queue only fills.
+        results = [await writer.put("alice", _entry(i)) for i in range(3)]
+        assert results == [True, True, False]
+
+    _run(writer, scenario)
+    assert writer.dropped == 1 and writer.written == 2
+
+
+def test_put_after_stop_is_dropped():
+    writer = HistoryWriter(FakeFirestore())
+
+    async def main():
+        await writer.start()
+        await writer.stop()
+        assert not await writer.put("alice", _entry(0))
+
+    asyncio.run(main())
+    assert writer.dropped == 1 and writer.enqueued == 0
@@ -0,0 +1,48 @@
+"""
+Import-time budget for the API module.
+Run with: python -m pytest tests/test_import_time.py
+
+Importing `main` must not create clients, need credentials or pull in
+the heavy SDKs; those belong to the startup hook (core/container.py).
+"""
+
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds for `import main` in a fresh interpreter, best of a few runs.
+IMPORT_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.5"))
+
+# Modules that should only load once the app starts or a route needs them.
+DEFERRED_MODULES = ["numpy", "firebase_admin", "google.cloud.firestore", "grpc", "google.auth"]
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+
+def _import_main():
+    env = {**os.environ, "GOOGLE_APPLICATION_CREDENTIALS": "", "LOG_LEVEL": "WARNING"}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(modules=DEFERRED_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(" ")
+    return float(elapsed), [m for m in loaded.split(",") if m]
+
+
+def test_import_defers_heavy_modules():
+    _, loaded = _import_main()
+    assert loaded == [], f"imported at module load: {loaded}"
+
+
+def test_import_within_budget():
+    best = min(_import_main()[0] for _ in range(3))
+    assert best < IMPORT_BUDGET, f"import main took {best:.3f}s (budget {IMPORT_BUDGET}s)"
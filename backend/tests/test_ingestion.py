@@ -0,0 +1,54 @@
+"""
+Ingestion sweeps: what the lease holder persists and what followers load.
+Run with: python -m pytest tests/test_ingestion.py
+"""
+
+import asyncio
+import math
+
+from core.timeutil import to_epoch, to_rfc3339
+from models.forecast_series import ForecastSeriesBuilder
+from services.ingestion import IngestionScheduler
+from services.snapshot_store import SnapshotStore
+from tests.bench.fakes import FakeFirestore
+
+BBOX = "18.52,73.85,18.525,73.855"
+
+
+async def _current(lat, lon):
+    return {"aqi": 55, "category": "Good", "timestamp": "2026-01-01T00:00:00Z"}
+
+
+async def _forecast(lat, lon, start_time, end_time):
+    # Upstream skips the second hour, which stays NaN on the hourly grid.
+    hours = [0, 2]
+    start = int(to_epoch(start_time))
+    forecasts = [
+        {"dateTime": to_rfc3339(start + hour * 3600), "indexes": [{"code": "uaqi", "aqi": 60 + hour}]}
+        for hour in hours
+    ]
+    series = ForecastSeriesBuilder().extend(forecasts).build()
+    return {"series": series, "count": len(series)}
+
+
+def _scheduler(db, store):
+    return IngestionScheduler(
+        db, store=store, bbox=BBOX, precision=6, rate=0, forecast_hours=3,
+        fetch=_current, fetch_forecast=_forecast,
+    )
+
+
+def test_followers_load_forecasts_with_the_snapshots():
+    db = FakeFirestore()
+    leader_store, follower_store = SnapshotStore(), SnapshotStore()
+    asyncio.run(_scheduler(db, leader_store).sweep())
+    _scheduler(db, follower_store)._load_snapshots()
+
+    cells = [snapshot["cell"] for snapshot in leader_store.all()]
+    assert cells and sorted(cells) == sorted(s["cell"] for s in follower_store.all())
+    for cell in cells:
+        start, values = follower_store.forecast(cell)
+        assert start == leader_store.forecast(cell)[0]
+        assert values.dtype.name == "float32"
+        assert values[0] == 60 and math.isnan(values[1]) and values[2] == 62
+        assert "forecast" not in follower_store.get(cell)
@@ -0,0 +1,37 @@
+"""
+Per-user online model states: concurrent readings and write-back.
+Run with: python -m pytest tests/test_model_state_store.py
+"""
+
+import asyncio
+
+from services.model_state_store import STATE_DOCUMENT, ModelStateStore
+from tests.bench.fakes import FakeFirestore
+
+
+class Writer:
+    def __init__(self):
+        self.documents = []
+
+    async def put_document(self, path, data):
+        await asyncio.sleep(0)
+        self.documents.append((path, data))
+        return True
+
+
+def _entry(hour):
+    return {"aqi": 40 + hour, "timestamp": f"2026-01-01T{hour:02d}:00:00+00:00"}
+
+
+def test_concurrent_records_are_all_folded_in():
+    writer = Writer()
+    store = ModelStateStore(FakeFirestore(), writer)
+
+    async def main():
+        await asyncio.gather(*(store.record("alice", _entry(hour)) for hour in range(8)))
+        return await store.get("alice")
+
+    state = asyncio.run(main())
+    assert state["n"] == 8
+    assert writer.documents[-1] == (STATE_DOCUMENT.format(uid="alice"), state)
+    assert store._locks == {}
@@ -0,0 +1,28 @@
+"""
+Safe-window scoring against AQI floors and pollutant ceilings.
+Run with: python -m pytest tests/test_safe_window_model.py
+"""
+
+import numpy as np
+
+from models.safe_window_model import best_windows
+
+HOUR = 3600
+TIMES = np.arange(6, dtype=np.float64)[None, :] * HOUR
+AQI = np.full((1, 6), 80.0)
+
+
+def test_pollutant_ceiling_excludes_polluted_steps():
+    pm25 = np.array([[10.0, 10.0, 50.0, 10.0, 10.0, 10.0]])
+    windows = best_windows(TIMES, AQI, 2 * HOUR, min_aqi=60, limits=[(pm25, 35)])
+    assert {w["start"] for w in windows} == {0, 3 * HOUR}
+
+
+def test_missing_concentration_is_not_safe_under_a_limit():
+    # A forecast without pollutant concentrations can't satisfy a pm25 limit.
+    missing = np.full((1, 6), np.nan)
+    assert best_windows(TIMES, AQI, 2 * HOUR, min_aqi=60, limits=[(missing, 35)]) == []
+
+
+def test_without_limits_aqi_alone_decides():
+    assert len(best_windows(TIMES, AQI, 2 * HOUR, min_aqi=60)) == 3
@@ -0,0 +1,113 @@
+"""
+Request coalescing and the negative cache of core/single_flight.py.
+Run with: python -m pytest tests/test_single_flight.py
+"""
+
+import asyncio
+
+import pytest
+
+from core.single_flight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, result=None, error=None, delay=0.01):
+        self.result = {"aqi": 42} if result is None else result
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_fetch():
+    flights, upstream = SingleFlight(), Upstream()
+
+    async def main():
+        return await asyncio.gather(*(flights.do("cell", upstream) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert all(result == {"aqi": 42} for result in results)
+    assert flights.stats() == {"in_flight": 0, "calls": 1, "coalesced": 9, "negative_hits": 0}
+
+
+def test_distinct_keys_and_later_calls_fetch_again():
+    flights, upstream = SingleFlight(), Upstream()
+
+    async def main():
+        await asyncio.gather(flights.do("a", upstream), flights.do("b", upstream))
+        await flights.do("a", upstream)
+
+    asyncio.run(main())
+    assert upstream.calls == 3
+
+
+def test_error_results_are_replayed_within_error_ttl():
+    flights, upstream = SingleFlight(error_ttl=60), Upstream(result={"error": "quota"})
+
+    async def main():
+        first = await flights.do("cell", upstream)
+        second = await flights.do("cell", upstream)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second == {"error": "quota"}
+    assert upstream.calls == 1
+    assert flights.negative_hits == 1
+
+
+def test_exceptions_are_replayed_within_error_ttl():
+    flights, upstream = SingleFlight(error_ttl=60), Upstream(error=RuntimeError("down"))
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await flights.do("cell", upstream)
+
+    asyncio.run(main())
+    assert upstream.calls == 1
+    assert flights.negative_hits == 1
+
+
+def test_failures_expire_after_error_ttl():
+    flights, upstream = SingleFlight(error_ttl=0.05), Upstream(result={"error": "quota"})
+
+    async def main():
+        await flights.do("cell", upstream)
+        await asyncio.sleep(0.1)
+        await flights.do("cell", upstream)
+
+    asyncio.run(main())
+    assert upstream.calls == 2
+    assert flights.negative_hits == 0
+
+
+def test_failures_not_cached_without_error_ttl():
+    flights, upstream = SingleFlight(), Upstream(result={"error": "quota"})
+
+    async def main():
+        await flights.do("cell", upstream)
+        await flights.do("cell", upstream)
+
+    asyncio.run(main())
+    assert upstream.calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch():
+    flights, upstream = SingleFlight(), Upstream(delay=0.05)
+
+    async def main():
+        impatient = asyncio.ensure_future(flights.do("cell", upstream))
+        patient = asyncio.ensure_future(flights.do("cell", upstream))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == {"aqi": 42}
+    assert upstream.calls == 1